@@ -1,12 +1,29 @@
 
 # accounts/admin.py
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.forms import UserChangeForm
 from django.db.models import Count
+from .ledger import ACCOUNT_FIELDS, POINTS, adjust_balances, ledger_balance_expressions
 from .models import CustomUser, Referral
 
+# Ledger-only balances that can still be edited on the change form
+LEDGER_FORM_FIELDS = {POINTS: 'points_balance'}
+
+
+class CustomUserChangeForm(UserChangeForm):
+    points_balance = forms.IntegerField()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for account, field in LEDGER_FORM_FIELDS.items():
+            self.initial[field] = self.instance.ledger[account]
+
+
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
+    form = CustomUserChangeForm
     list_display = ['username', 'email', 'is_student', 'university', 'likes_balance', 'points_balance', 'likes_given_count', 'likes_received_count', 'unlikes_given_count', 'unlikes_received_count', 'referral_code', 'is_verified']
     list_filter = ['is_student', 'is_verified', 'university']
     readonly_fields = ['date_joined', 'last_login']
@@ -22,9 +39,25 @@ class CustomUserAdmin(UserAdmin):
             likes_given_count=Count('likes_given'),
             likes_received_count=Count('likes_received'),
             unlikes_given_count=Count('unlikes_given'),
-            unlikes_received_count=Count('unlikes_received')
+            unlikes_received_count=Count('unlikes_received'),
+            **ledger_balance_expressions()
         )
         return queryset
+
+    def save_model(self, request, obj, form, change):
+        # Balance columns are only written through the ledger, so record
+        # edits made here as admin adjustments
+        deltas = {}
+        if change:
+            for account, field in ACCOUNT_FIELDS.items():
+                if field in form.changed_data:
+                    deltas[account] = form.cleaned_data[field] - form.initial[field]
+                    setattr(obj, field, form.initial[field])
+            for account, field in LEDGER_FORM_FIELDS.items():
+                if field in form.changed_data:
+                    deltas[account] = form.cleaned_data[field] - form.initial[field]
+        super().save_model(request, obj, form, change)
+        adjust_balances(obj, 'admin', guard=False, **deltas)
     
     def likes_given_count(self, obj):
         return obj.likes_given_count
@@ -0,0 +1,240 @@
+# accounts/ledger.py
+"""
+Append-only ledger of balance changes.
+
+Every change to a user's likes, points or received likes is written as a
+LedgerEntry (user, account, delta, reason).
+
+Points and received likes live only in the ledger. Crediting them is a
+plain INSERT, so a popular user receiving many likes at once never queues
+on their own user row. Their balance is read as the BalanceSnapshot plus
+the short tail of entries after it (ledger_balances(), or
+ledger_balance_expressions() to annotate a user query), rather than as a
+sum over the user's whole history. take_snapshots() rolls the snapshots
+forward (run it periodically with manage.py snapshot_balances). The rare
+guarded points debit (claiming a reward) locks the user row and checks
+snapshot + tail before inserting.
+
+likes_balance stays a column on CustomUser because every like spends from
+it and needs a row to guard on (likes_balance >= n). It is moved with a
+conditional F() update in the same transaction as its ledger entry, so it
+is a materialized view of the ledger. rebuild_balances() rewrites it from
+snapshot + tail in bulk (manage.py rebuild_balances). Nothing writes it
+except through this module.
+"""
+from datetime import timedelta
+import logging
+
+from django.db import transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger('accounts')
+
+LIKES = 'likes'
+POINTS = 'points'
+RECEIVED_LIKES = 'received_likes'
+
+# Snapshots never cover entries this recent (see take_snapshots)
+SNAPSHOT_LAG = timedelta(minutes=5)
+
+ACCOUNTS = (LIKES, POINTS, RECEIVED_LIKES)
+
+# Ledger accounts materialized in a CustomUser column -> the column
+ACCOUNT_FIELDS = {
+    LIKES: 'likes_balance',
+}
+
+
+class InsufficientBalance(ValueError):
+    """A debit would take a balance below zero"""
+
+
+def ledger_entries(user_id, reason, **deltas):
+    """Unsaved LedgerEntry rows for the non-zero deltas, keyed by account name"""
+    from .models import LedgerEntry
+    return [
+        LedgerEntry(user_id=user_id, account=account, delta=delta, reason=reason)
+        for account, delta in deltas.items() if delta
+    ]
+
+
+def record_entries(entries):
+    """Append entries to the ledger with one INSERT"""
+    from .models import LedgerEntry
+    if entries:
+        LedgerEntry.objects.bulk_create(entries)
+
+
+def mirror_deltas(user, **deltas):
+    """Apply deltas to an in-memory user so callers see the new balances"""
+    balances = user.__dict__.get('ledger')
+    for account, delta in deltas.items():
+        if not delta:
+            continue
+        if account in ACCOUNT_FIELDS:
+            user.add_to_counter(ACCOUNT_FIELDS[account], delta)
+        if balances is not None:
+            balances[account] += delta
+
+
+def adjust_balances(user, reason, guard=True, **deltas):
+    """
+    Apply deltas (likes=..., points=..., received_likes=...) to user's
+    balances and record them in the ledger, atomically.
+
+    With guard, a negative delta only applies if the balance covers it;
+    otherwise InsufficientBalance is raised and nothing changes. Only
+    likes (one conditional UPDATE) and guarded debits of ledger-only
+    accounts (a lock on the user row) touch the user row; everything else
+    is just the ledger INSERT.
+    """
+    from .models import CustomUser
+
+    deltas = {account: delta for account, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    columns = {account: delta for account, delta in deltas.items() if account in ACCOUNT_FIELDS}
+    debits = {
+        account: delta for account, delta in deltas.items()
+        if guard and delta < 0 and account not in ACCOUNT_FIELDS
+    }
+
+    with transaction.atomic():
+        if debits:
+            # Credits are inserted without the lock, so they can only raise the balance checked here
+            CustomUser.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True).get()
+            balances = ledger_balances(user.pk)
+            if any(balances[account] < -delta for account, delta in debits.items()):
+                raise InsufficientBalance(f"Insufficient balance for {reason} - User: {user.pk}, Change: {deltas}")
+        if columns:
+            rows = CustomUser.objects.filter(pk=user.pk)
+            if guard:
+                rows = rows.filter(**{
+                    f'{ACCOUNT_FIELDS[account]}__gte': -delta for account, delta in columns.items() if delta < 0
+                })
+            updated = rows.update(**{
+                ACCOUNT_FIELDS[account]: F(ACCOUNT_FIELDS[account]) + delta for account, delta in columns.items()
+            })
+            if not updated:
+                raise InsufficientBalance(f"Insufficient balance for {reason} - User: {user.pk}, Change: {deltas}")
+        record_entries(ledger_entries(user.pk, reason, **deltas))
+
+    mirror_deltas(user, **deltas)
+    logger.info(f"Balances adjusted - User: {user.pk}, Reason: {reason}, Change: {deltas}")
+
+
+def take_likes(user, reason, amount):
+    """
+    Debit up to amount from user's likes_balance without taking it below
+    zero, and return how many likes were taken
+    """
+    from .models import CustomUser
+
+    with transaction.atomic():
+        # Locked, so the guarded debit below is for exactly what is there
+        available = CustomUser.objects.select_for_update().filter(
+            pk=user.pk
+        ).values_list('likes_balance', flat=True).get()
+        taken = max(min(available, amount), 0)
+        if taken:
+            adjust_balances(user, reason, likes=-taken)
+    return taken
+
+
+def _tail_sum(entries, account):
+    """Sum of the entries of account after the user's snapshot (correlated on the outer user)"""
+    from .models import BalanceSnapshot
+
+    last_entry = BalanceSnapshot.objects.filter(user=OuterRef('user'), account=account).values('last_entry_id')
+    tail = entries.filter(
+        user=OuterRef('pk'), account=account, id__gt=Coalesce(Subquery(last_entry[:1]), Value(0)),
+    ).order_by().values('user').annotate(total=Sum('delta')).values('total')
+    return Coalesce(Subquery(tail, output_field=IntegerField()), Value(0))
+
+
+def _snapshot_balance(account):
+    from .models import BalanceSnapshot
+
+    snapshot = BalanceSnapshot.objects.filter(user=OuterRef('pk'), account=account).values('balance')
+    return Coalesce(Subquery(snapshot[:1], output_field=IntegerField()), Value(0))
+
+
+def ledger_balance_expressions():
+    """{account: expression} giving each user's ledger balance (snapshot + tail) in a user query"""
+    from .models import LedgerEntry
+    return {
+        f'ledger_{account}': _snapshot_balance(account) + _tail_sum(LedgerEntry.objects.all(), account)
+        for account in ACCOUNTS
+    }
+
+
+def ledger_balances(user_id):
+    """{account: balance} derived from the ledger for one user (one query)"""
+    from .models import CustomUser
+    row = CustomUser.objects.filter(pk=user_id).values(**ledger_balance_expressions()).first() or {}
+    return {account: row.get(f'ledger_{account}', 0) for account in ACCOUNTS}
+
+
+def take_snapshots(user_ids, lag=SNAPSHOT_LAG):
+    """
+    Roll the snapshots of user_ids forward to the latest ledger entry older
+    than lag. Entries inside the lag window are left in the tail, so an
+    entry whose transaction commits after a newer one is never skipped.
+    """
+    from .models import BalanceSnapshot, CustomUser, LedgerEntry
+
+    with transaction.atomic():
+        last_entry_id = LedgerEntry.objects.filter(created_at__lte=timezone.now() - lag).order_by(
+            '-id'
+        ).values_list('id', flat=True).first() or 0
+        entries = LedgerEntry.objects.filter(id__lte=last_entry_id)
+        rows = CustomUser.objects.filter(pk__in=user_ids).values('pk', **{
+            f'ledger_{account}': _snapshot_balance(account) + _tail_sum(entries, account) for account in ACCOUNTS
+        })
+        snapshots = [
+            BalanceSnapshot(
+                user_id=row['pk'], account=account, balance=row[f'ledger_{account}'], last_entry_id=last_entry_id
+            )
+            for row in rows for account in ACCOUNTS
+        ]
+        BalanceSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['user', 'account'],
+            update_fields=['balance', 'last_entry_id', 'taken_at'],
+        )
+    return len(snapshots)
+
+
+def rebuild_balances(user_ids, dry_run=False):
+    """
+    Rewrite the materialized balance columns of user_ids from the ledger. Returns
+    {user_id: {field: (stored, ledger)}} for the users that disagreed.
+    """
+    from .models import CustomUser
+
+    fields = list(ACCOUNT_FIELDS.values())
+    with transaction.atomic():
+        expressions = ledger_balance_expressions()
+        rows = CustomUser.objects.select_for_update().filter(pk__in=user_ids).values('pk', *fields, **{
+            f'ledger_{account}': expressions[f'ledger_{account}'] for account in ACCOUNT_FIELDS
+        })
+        drift = {}
+        users = []
+        for row in rows:
+            changed = {
+                field: (row[field], row[f'ledger_{account}'])
+                for account, field in ACCOUNT_FIELDS.items() if row[field] != row[f'ledger_{account}']
+            }
+            if changed:
+                drift[row['pk']] = changed
+                users.append(CustomUser(pk=row['pk'], **{
+                    field: row[f'ledger_{account}'] for account, field in ACCOUNT_FIELDS.items()
+                }))
+
+        if users and not dry_run:
+            CustomUser.objects.bulk_update(users, fields)
+    return drift
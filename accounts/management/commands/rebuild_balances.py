@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.ledger import rebuild_balances
+
+
+class Command(BaseCommand):
+    help = 'Rewrite likes_balance on every user from the balance ledger'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Users rebuilt per batch (default: 2000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the users whose balances disagree with the ledger without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        batch_size = max(1, options['batch_size'])
+
+        checked = rebuilt = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            checked += len(batch)
+
+            drift = rebuild_balances(batch, dry_run=options['dry_run'])
+            for user_id, fields in drift.items():
+                changes = ', '.join(f'{field} {stored} -> {ledger}' for field, (stored, ledger) in fields.items())
+                self.stdout.write(f'User {user_id}: {changes}')
+            rebuilt += len(drift)
+
+        verb = 'Would rebuild' if options['dry_run'] else 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(f'{verb} balances for {rebuilt} of {checked} users'))
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from accounts.ledger import SNAPSHOT_LAG, take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Roll every user\'s balance snapshots forward so ledger balances only need to sum a short tail'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Users snapshotted per batch (default: 5000)',
+        )
+        parser.add_argument(
+            '--lag-seconds',
+            type=int,
+            default=int(SNAPSHOT_LAG.total_seconds()),
+            help=f'Leave entries newer than this in the tail (default: {int(SNAPSHOT_LAG.total_seconds())})',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        batch_size = max(1, options['batch_size'])
+        lag = timedelta(seconds=options['lag_seconds'])
+
+        users = snapshots = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            users += len(batch)
+            snapshots += take_snapshots(batch, lag)
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {snapshots} snapshots for {users} users'))
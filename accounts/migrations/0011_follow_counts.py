@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:44
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def follow_count(Follow, field):
+    rows = Follow.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def populate_follow_counts(apps, schema_editor):
+    """Fill the new counters from the existing follow rows"""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    Follow = apps.get_model('social', 'Follow')
+    CustomUser.objects.update(
+        followers_count=follow_count(Follow, 'following'),
+        following_count=follow_count(Follow, 'follower'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_customuser_likes_spent_on_rewards'),
+        ('social', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='following_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(
+            populate_follow_counts,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+OPENING_BATCH_SIZE = 1000
+ACCOUNT_FIELDS = {
+    'likes': 'likes_balance',
+    'points': 'points_balance',
+    'received_likes': 'received_likes_count',
+}
+
+
+def record_opening_balances(apps, schema_editor):
+    """Open every existing user's ledger with their current balances"""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    LedgerEntry = apps.get_model('accounts', 'LedgerEntry')
+    entries = (
+        LedgerEntry(user_id=row['pk'], account=account, delta=row[field], reason='opening')
+        for row in CustomUser.objects.values('pk', *ACCOUNT_FIELDS.values()).iterator()
+        for account, field in ACCOUNT_FIELDS.items() if row[field]
+    )
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) == OPENING_BATCH_SIZE:
+            LedgerEntry.objects.bulk_create(batch)
+            batch = []
+    LedgerEntry.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_follow_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(choices=[('likes', 'Likes balance'), ('points', 'Points balance'), ('received_likes', 'Received likes')], max_length=20)),
+                ('balance', models.IntegerField(default=0)),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('taken_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'account')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account', models.CharField(choices=[('likes', 'Likes balance'), ('points', 'Points balance'), ('received_likes', 'Received likes')], max_length=20)),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('opening', 'Opening balance'), ('like', 'Like'), ('unlike', 'Unlike'), ('post_like', 'Post like'), ('comment_like', 'Comment like'), ('purchase', 'Purchase'), ('gift', 'Gift'), ('quiz', 'Quiz answer'), ('reward_claim', 'Reward claim'), ('referral', 'Referral'), ('refund', 'Refund'), ('admin', 'Admin adjustment')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'account', 'id'], name='accounts_le_user_id_cd0b51_idx')],
+            },
+        ),
+        migrations.RunPython(
+            record_opening_balances,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:13
+
+from django.db import migrations
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+ACCOUNT_FIELDS = {
+    'points': 'points_balance',
+    'received_likes': 'received_likes_count',
+}
+
+
+def ledger_balance(apps, account):
+    """A user's balance in account (snapshot + later entries), as accounts.ledger computes it"""
+    LedgerEntry = apps.get_model('accounts', 'LedgerEntry')
+    BalanceSnapshot = apps.get_model('accounts', 'BalanceSnapshot')
+
+    snapshot = BalanceSnapshot.objects.filter(user=OuterRef('pk'), account=account)
+    last_entry = BalanceSnapshot.objects.filter(user=OuterRef('user'), account=account).values('last_entry_id')
+    tail = LedgerEntry.objects.filter(
+        user=OuterRef('pk'), account=account, id__gt=Coalesce(Subquery(last_entry[:1]), Value(0)),
+    ).order_by().values('user').annotate(total=Sum('delta')).values('total')
+    return (
+        Coalesce(Subquery(snapshot.values('balance')[:1], output_field=IntegerField()), Value(0))
+        + Coalesce(Subquery(tail, output_field=IntegerField()), Value(0))
+    )
+
+
+def settle_dropped_columns(apps, schema_editor):
+    """
+    Before the columns go, book any difference between them and the ledger
+    as an admin adjustment, so the ledger carries on from what users saw
+    """
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    LedgerEntry = apps.get_model('accounts', 'LedgerEntry')
+
+    rows = CustomUser.objects.values(
+        'pk', *ACCOUNT_FIELDS.values(),
+        **{f'ledger_{account}': ledger_balance(apps, account) for account in ACCOUNT_FIELDS},
+    )
+    LedgerEntry.objects.bulk_create(
+        [
+            LedgerEntry(user_id=row['pk'], account=account, delta=row[field] - row[f'ledger_{account}'], reason='admin')
+            for row in rows.iterator()
+            for account, field in ACCOUNT_FIELDS.items() if row[field] != row[f'ledger_{account}']
+        ],
+        batch_size=1000,
+    )
+
+
+def restore_dropped_columns(apps, schema_editor):
+    """Refill the re-added columns from the ledger, which has been their only record since"""
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    CustomUser.objects.update(
+        **{field: ledger_balance(apps, account) for account, field in ACCOUNT_FIELDS.items()}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_balance_ledger'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            settle_dropped_columns,
+            restore_dropped_columns,
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='points_balance',
+        ),
+        migrations.RemoveField(
+            model_name='customuser',
+            name='received_likes_count',
+        ),
+    ]
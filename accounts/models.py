@@ -8,8 +8,11 @@ import random
 import logging
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils.functional import cached_property
 from datetime import datetime
 
+from .ledger import ACCOUNTS, ACCOUNT_FIELDS, adjust_balances, ledger_balances, ledger_entries, record_entries
+
 logger = logging.getLogger('accounts')
 
 
@@ -57,27 +60,100 @@ class CustomUser(AbstractUser):
     # Single balance for both likes and dislikes
     likes_balance = models.IntegerField(default=100)  # New users get 100 free likes
 
-    # Received counts (what others gave them)
-    received_likes_count = models.IntegerField(default=0)
+    # Received counts (what others gave them); received likes are kept in the
+    # balance ledger only (see received_likes_count below)
     received_unlikes_count = models.IntegerField(default=0)
 
+    # Follow counts, kept in step by social.views.follow_user/unfollow_user
+    # (recompute with: python manage.py repair_follow_counts)
+    followers_count = models.IntegerField(default=0)
+    following_count = models.IntegerField(default=0)
+
     # Likes spent on money rewards
     likes_spent_on_rewards = models.IntegerField(default=0)
 
-    points_balance = models.IntegerField(default=0)
-
     # Referral system fields
     referral_code = models.CharField(max_length=10, unique=True, blank=True)
     referred_by = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='referrals')
     referral_points_earned = models.IntegerField(default=0)
 
+    # Maintained in the database only (F() updates and accounts/ledger.py); see save()
+    COUNTER_FIELDS = (
+        'followers_count', 'following_count', 'likes_balance', 'received_unlikes_count',
+    )
+
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username']
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored names so profile search tokens are only rebuilt when they change
+        instance._loaded_names = (
+            instance.__dict__.get('username'),
+            instance.__dict__.get('first_name'),
+            instance.__dict__.get('last_name'),
+        )
+        instance._loaded_counters = instance._counter_values()
+        return instance
+
+    def _counter_values(self):
+        return {field: self.__dict__[field] for field in self.COUNTER_FIELDS if field in self.__dict__}
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_counters = self._counter_values()
+
+    def add_to_counter(self, field, delta):
+        """Mirror a counter change already written to the database on this instance"""
+        if field in self.__dict__:
+            self.__dict__[field] += delta
+            if field in getattr(self, '_loaded_counters', {}):
+                self._loaded_counters[field] = self.__dict__[field]
+
     def save(self, *args, **kwargs):
         if not self.referral_code:
             self.referral_code = self.generate_referral_code()
+        # Counters are only ever moved with F() updates, so a full save of a user
+        # loaded earlier must not write its stale copies back. Changing one on the
+        # instance and saving would be lost, so it is refused instead.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            loaded = getattr(self, '_loaded_counters', {})
+            changed = [field for field, value in loaded.items() if self.__dict__.get(field, value) != value]
+            if changed:
+                raise ValueError(
+                    f"{', '.join(changed)} cannot be changed with save(); "
+                    "use accounts.ledger.adjust_balances or an F() update"
+                )
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        written = self.COUNTER_FIELDS if self._state.adding else kwargs.get('update_fields') or ()
         super().save(*args, **kwargs)
+        self._loaded_counters = {
+            **getattr(self, '_loaded_counters', {}),
+            **{field: value for field, value in self._counter_values().items() if field in written},
+        }
+
+    @cached_property
+    def ledger(self):
+        """
+        {account: balance} from the balance ledger (snapshot + tail), taken
+        from a query annotated with ledger_balance_expressions() when
+        available, otherwise read once per instance
+        """
+        if all(f'ledger_{account}' in self.__dict__ for account in ACCOUNTS):
+            return {account: self.__dict__[f'ledger_{account}'] for account in ACCOUNTS}
+        return ledger_balances(self.pk)
+
+    @property
+    def points_balance(self):
+        return self.ledger['points']
+
+    @property
+    def received_likes_count(self):
+        return self.ledger['received_likes']
 
     def generate_referral_code(self):
         """Generate a unique referral code"""
@@ -114,6 +190,69 @@ class Referral(models.Model):
     def __str__(self):
         return f"{self.referrer.username} referred {self.referred_user.username}"
 
+class LedgerEntry(models.Model):
+    """One debit or credit to a user's balance; rows are only ever inserted (see accounts/ledger.py)"""
+    ACCOUNT_CHOICES = [
+        ('likes', 'Likes balance'),
+        ('points', 'Points balance'),
+        ('received_likes', 'Received likes'),
+    ]
+
+    REASON_CHOICES = [
+        ('opening', 'Opening balance'),
+        ('like', 'Like'),
+        ('unlike', 'Unlike'),
+        ('post_like', 'Post like'),
+        ('comment_like', 'Comment like'),
+        ('purchase', 'Purchase'),
+        ('gift', 'Gift'),
+        ('quiz', 'Quiz answer'),
+        ('reward_claim', 'Reward claim'),
+        ('referral', 'Referral'),
+        ('refund', 'Refund'),
+        ('admin', 'Admin adjustment'),
+    ]
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='ledger_entries')
+    account = models.CharField(max_length=20, choices=ACCOUNT_CHOICES)
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'account', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.account} {self.delta:+d} ({self.reason})"
+
+
+class BalanceSnapshot(models.Model):
+    """A user's balance in one ledger account up to and including last_entry_id"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='balance_snapshots')
+    account = models.CharField(max_length=20, choices=LedgerEntry.ACCOUNT_CHOICES)
+    balance = models.IntegerField(default=0)
+    last_entry_id = models.BigIntegerField(default=0)
+    taken_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'account']
+
+    def __str__(self):
+        return f"{self.user_id} {self.account} = {self.balance} @ {self.last_entry_id}"
+
+
+@receiver(post_save, sender=CustomUser)
+def record_opening_balances(sender, instance, created, raw=False, **kwargs):
+    """Start a new user's ledger with the balances the account was created with"""
+    if created and not raw:
+        record_entries(ledger_entries(
+            instance.pk, 'opening',
+            **{account: getattr(instance, field) for account, field in ACCOUNT_FIELDS.items()}
+        ))
+
+
 # Signal to award referral points when a referred user completes their profile
 @receiver(post_save, sender='profiles.Profile')
 def award_referral_points(sender, instance, created, **kwargs):
@@ -131,14 +270,13 @@ def award_referral_points(sender, instance, created, **kwargs):
 
             # Award points to referrer
             points_to_award = 15  # 15 points for successful referral
-            old_balance = referral.referrer.points_balance
             old_referral_points = referral.referrer.referral_points_earned
 
-            referral.referrer.points_balance += points_to_award
+            adjust_balances(referral.referrer, 'referral', points=points_to_award)
             referral.referrer.referral_points_earned += points_to_award
-            referral.referrer.save()
+            referral.referrer.save(update_fields=['referral_points_earned'])
 
-            logger.info(f"Referral points awarded - Referrer: {referral.referrer.id}, Points: {points_to_award}, OldBalance: {old_balance}, NewBalance: {referral.referrer.points_balance}, OldReferralPoints: {old_referral_points}, NewReferralPoints: {referral.referrer.referral_points_earned}")
+            logger.info(f"Referral points awarded - Referrer: {referral.referrer.id}, Points: {points_to_award}, NewBalance: {referral.referrer.points_balance}, OldReferralPoints: {old_referral_points}, NewReferralPoints: {referral.referrer.referral_points_earned}")
 
             # Update referral record
             referral.points_awarded = points_to_award
@@ -154,14 +292,11 @@ def award_referral_points(sender, instance, created, **kwargs):
                 logger.info(f"Creating new referral record - Referrer: {instance.user.referred_by.id}, ReferredUser: {instance.user.id}")
 
                 points_to_award = 15
-                old_balance = instance.user.referred_by.points_balance
-                old_referral_points = instance.user.referred_by.referral_points_earned
-
-                instance.user.referred_by.points_balance += points_to_award
+                adjust_balances(instance.user.referred_by, 'referral', points=points_to_award)
                 instance.user.referred_by.referral_points_earned += points_to_award
-                instance.user.referred_by.save()
+                instance.user.referred_by.save(update_fields=['referral_points_earned'])
 
-                logger.info(f"Referral points awarded (new record) - Referrer: {instance.user.referred_by.id}, Points: {points_to_award}, OldBalance: {old_balance}, NewBalance: {instance.user.referred_by.points_balance}")
+                logger.info(f"Referral points awarded (new record) - Referrer: {instance.user.referred_by.id}, Points: {points_to_award}, NewBalance: {instance.user.referred_by.points_balance}")
 
                 referral = Referral.objects.create(
                     referrer=instance.user.referred_by,
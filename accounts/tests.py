@@ -1,3 +1,105 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from likes.models import Like
+
+from .ledger import InsufficientBalance, adjust_balances, ledger_balances, rebuild_balances, take_likes, take_snapshots
+from .models import BalanceSnapshot, LedgerEntry
+
+User = get_user_model()
+
+
+class BalanceLedgerTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', likes_balance=10)
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', likes_balance=10)
+
+    def likes_column(self, user):
+        return User.objects.values_list('likes_balance', flat=True).get(pk=user.pk)
+
+    def test_every_change_is_in_the_ledger(self):
+        Like.objects.create(from_user=self.alice, to_user=self.bob, amount=3)
+        adjust_balances(self.alice, 'purchase', likes=20, points=50)
+        with self.assertRaises(InsufficientBalance):
+            adjust_balances(self.bob, 'reward_claim', points=-1000)
+
+        self.assertEqual(
+            list(LedgerEntry.objects.filter(user=self.alice).values_list('reason', 'account', 'delta')),
+            [('opening', 'likes', 10), ('like', 'likes', -3), ('like', 'points', 15),
+             ('purchase', 'likes', 20), ('purchase', 'points', 50)],
+        )
+        self.assertEqual(self.alice.likes_balance, 27)
+        for user in (self.alice, self.bob):
+            self.assertEqual(ledger_balances(user.pk)['likes'], self.likes_column(user))
+        bob = User.objects.get(pk=self.bob.pk)
+        self.assertEqual((bob.received_likes_count, bob.points_balance), (3, 30))
+
+    def test_credits_only_insert(self):
+        with CaptureQueriesContext(connection) as captured:
+            Like.objects.create(from_user=self.alice, to_user=self.bob, amount=2)
+            adjust_balances(self.bob, 'quiz', points=5)
+        user_updates = [
+            query['sql'] for query in captured.captured_queries
+            if query['sql'].startswith('UPDATE "accounts_customuser"')
+        ]
+        # Only the sender's guarded likes debit touches a user row
+        self.assertEqual(len(user_updates), 1)
+        self.assertIn('"likes_balance" >=', user_updates[0])
+        self.assertEqual(User.objects.get(pk=self.bob.pk).points_balance, 25)
+
+    def test_points_debit_is_guarded_by_the_ledger(self):
+        adjust_balances(self.bob, 'quiz', points=5)
+        with self.assertRaises(InsufficientBalance):
+            adjust_balances(self.bob, 'reward_claim', points=-6)
+        adjust_balances(self.bob, 'reward_claim', points=-5)
+        self.assertEqual(User.objects.get(pk=self.bob.pk).points_balance, 0)
+
+    def test_take_likes_stops_at_zero(self):
+        self.assertEqual(take_likes(self.alice, 'refund', 25), 10)
+        self.assertEqual(self.likes_column(self.alice), 0)
+        self.assertEqual(ledger_balances(self.alice.pk)['likes'], 0)
+        self.assertEqual(take_likes(self.alice, 'refund', 5), 0)
+
+    def test_save_refuses_counter_changes(self):
+        user = User.objects.get(pk=self.alice.pk)
+        adjust_balances(user, 'purchase', likes=5)
+        user.first_name = 'Alice'
+        user.save()  # the mirrored balance is already in the database
+
+        user.likes_balance += 5
+        with self.assertRaises(ValueError):
+            user.save()
+        self.assertEqual(self.likes_column(self.alice), 15)
+
+    def test_snapshot_plus_tail(self):
+        adjust_balances(self.alice, 'quiz', points=3)
+        self.assertEqual(take_snapshots([self.alice.pk], lag=timedelta(0)), 3)
+        self.assertEqual(BalanceSnapshot.objects.get(user=self.alice, account='points').balance, 3)
+
+        # Entries before the snapshot are no longer summed, later ones are
+        LedgerEntry.objects.filter(user=self.alice).delete()
+        adjust_balances(self.alice, 'quiz', points=5)
+        self.assertEqual(ledger_balances(self.alice.pk), {'likes': 10, 'points': 8, 'received_likes': 0})
+
+        # Entries inside the lag window stay in the tail
+        take_snapshots([self.alice.pk])
+        self.assertEqual(BalanceSnapshot.objects.get(user=self.alice, account='points').balance, 3)
+        self.assertEqual(ledger_balances(self.alice.pk)['points'], 8)
+
+    def test_rebuild_fixes_drift(self):
+        User.objects.filter(pk=self.bob.pk).update(likes_balance=999)
+        self.assertEqual(
+            rebuild_balances([self.alice.pk, self.bob.pk], dry_run=True),
+            {self.bob.pk: {'likes_balance': (999, 10)}},
+        )
+        self.assertEqual(self.likes_column(self.bob), 999)
 
-# Create your tests here.
+        call_command('rebuild_balances', stdout=StringIO())
+        self.assertEqual(self.likes_column(self.bob), 10)
+        self.assertEqual(rebuild_balances([self.bob.pk]), {})
@@ -15,7 +15,9 @@ from datetime import datetime, timedelta
 from django.utils import timezone
 
 from django.contrib.auth import get_user_model
-from profiles.models import Profile
+from accounts.ledger import ledger_balance_expressions, take_likes
+from profiles.ages import age_bucket_counts
+from profiles.models import Profile, ProfileInterest
 from notifications.models import Notification
 from likes.models import Like, Unlike
 from quiz.models import Question, Choice, UserQuizResponse, DailyQuiz
@@ -281,14 +283,8 @@ def platform_analytics(request):
     # Study year distribution
     study_year_distribution = Profile.objects.exclude(study_year__isnull=True).values('study_year').annotate(count=Count('id')).order_by('study_year')
 
-    # Age distribution (calculated from birth_date)
-    from django.db.models.functions import ExtractYear
-    age_ranges = {
-        '18-22': User.objects.filter(profile__birth_date__gte=today - timedelta(days=365*22), profile__birth_date__lt=today - timedelta(days=365*18)).count(),
-        '23-27': User.objects.filter(profile__birth_date__gte=today - timedelta(days=365*27), profile__birth_date__lt=today - timedelta(days=365*23)).count(),
-        '28-32': User.objects.filter(profile__birth_date__gte=today - timedelta(days=365*32), profile__birth_date__lt=today - timedelta(days=365*28)).count(),
-        '33+': User.objects.filter(profile__birth_date__lt=today - timedelta(days=365*33)).count(),
-    }
+    # Age distribution (one grouped query over exact birth-date bounds)
+    age_ranges = age_bucket_counts(Profile.objects.all())
 
     # School/University distribution (top 10)
     university_distribution = Profile.objects.exclude(school_name='').values('school_name').annotate(
@@ -335,14 +331,10 @@ def platform_analytics(request):
     abandonment_rate = round((old_incomplete / total_profiles * 100) if total_profiles > 0 else 0, 2)
 
     # Popular interests (top 20)
-    all_interests = []
-    for profile in Profile.objects.exclude(interests=''):
-        interests_list = [i.strip() for i in profile.interests.split(',') if i.strip()]
-        all_interests.extend(interests_list)
-
-    from collections import Counter
-    interest_counts = Counter(all_interests)
-    popular_interests = [{'interest': k, 'count': v} for k, v in interest_counts.most_common(20)]
+    interest_counts = ProfileInterest.objects.values('interest__name').annotate(
+        count=Count('id')
+    ).order_by('-count', 'interest__name')[:20]
+    popular_interests = [{'interest': item['interest__name'], 'count': item['count']} for item in interest_counts]
 
     # Study field distribution
     popular_fields = Profile.objects.exclude(study_field='').values('study_field').annotate(
@@ -370,7 +362,7 @@ def platform_analytics(request):
 
     # Top liked users
     top_liked_users = User.objects.annotate(
-        total_received=F('received_likes_count')
+        total_received=ledger_balance_expressions()['ledger_received_likes']
     ).order_by('-total_received')[:10]
 
     # Average likes per user
@@ -488,7 +480,9 @@ def platform_analytics(request):
         total_claims = RewardClaim.objects.count()
 
         # Points circulation
-        total_points_in_system = User.objects.aggregate(total=Sum('points_balance'))['total'] or 0
+        total_points_in_system = User.objects.annotate(
+            points=ledger_balance_expressions()['ledger_points']
+        ).aggregate(total=Sum('points'))['total'] or 0
         total_points_spent = RewardClaim.objects.aggregate(total=Sum('points_spent'))['total'] or 0
 
         # Popular rewards
@@ -1162,10 +1156,9 @@ def purchase_detail(request, purchase_id):
 
         elif action == 'refund':
             purchase.status = 'refunded'
-            # Deduct the likes from user balance
+            # Deduct the likes from user balance, as far as they have not been spent
             if purchase.package:
-                purchase.user.likes_balance = max(0, purchase.user.likes_balance - purchase.package.likes_count)
-            purchase.user.save()
+                take_likes(purchase.user, 'refund', purchase.package.likes_count)
             purchase.save()
             messages.success(request, 'Purchase refunded successfully!')
 
@@ -1,7 +1,7 @@
 
 # likes/admin.py
 from django.contrib import admin
-from .models import Like, Unlike
+from .models import Like, LikePair, Unlike
 
 @admin.register(Like)
 class LikeAdmin(admin.ModelAdmin):
@@ -10,6 +10,13 @@ class LikeAdmin(admin.ModelAdmin):
     search_fields = ['from_user__username', 'to_user__username']
     readonly_fields = ['created_at']
 
+@admin.register(LikePair)
+class LikePairAdmin(admin.ModelAdmin):
+    list_display = ['from_user', 'to_user', 'total_amount', 'like_count', 'is_mutual', 'last_liked_at']
+    list_filter = ['is_mutual', 'last_liked_at']
+    search_fields = ['from_user__username', 'to_user__username']
+    readonly_fields = ['first_liked_at', 'last_liked_at']
+
 @admin.register(Unlike)
 class UnlikeAdmin(admin.ModelAdmin):
     list_display = ['from_user', 'to_user', 'created_at']
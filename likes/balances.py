@@ -0,0 +1,58 @@
+# likes/balances.py
+"""
+Moving likes between users' banks.
+
+A transfer is one conditional UPDATE on the sender
+(likes_balance = likes_balance - n WHERE likes_balance >= n) and one INSERT
+of ledger entries (accounts/ledger.py), both inside the caller's
+transaction. Balances are never read into Python and written back, so
+concurrent likes from the same user can neither overdraw the bank nor lose
+each other's updates. The receiver's likes and both sides' points are
+ledger-only credits, so likes arriving at a popular user don't queue on
+their row; only received_unlikes_count, which is not in the ledger, is
+still an UPDATE on the receiver.
+"""
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+
+from accounts.ledger import InsufficientBalance, ledger_entries, mirror_deltas, record_entries
+
+logger = logging.getLogger('likes')
+
+
+def transfer_likes(sender, receiver, amount, reason, received_field='received_likes_count',
+                   sender_points=0, receiver_points=0):
+    """
+    Debit amount from sender's likes_balance and add it to receiver's
+    received_field, awarding points to either side, atomically. reason is
+    the ledger reason ('like', 'unlike', 'post_like', 'comment_like').
+
+    Raises InsufficientBalance (and changes nothing) if the sender cannot
+    afford it.
+    """
+    User = get_user_model()
+    with transaction.atomic():
+        debited = User.objects.filter(pk=sender.pk, likes_balance__gte=amount).update(
+            likes_balance=F('likes_balance') - amount,
+        )
+        if not debited:
+            available = User.objects.filter(pk=sender.pk).values_list('likes_balance', flat=True).first()
+            logger.warning(f"Insufficient likes balance - User: {sender.pk}, Required: {amount}, Available: {available}")
+            raise InsufficientBalance(f"Insufficient likes balance. Required: {amount}, Available: {available}")
+
+        # received_unlikes_count is not a ledger account
+        received_likes = amount if received_field == 'received_likes_count' else 0
+        if not received_likes:
+            User.objects.filter(pk=receiver.pk).update(**{received_field: F(received_field) + amount})
+            receiver.add_to_counter(received_field, amount)
+        record_entries(
+            ledger_entries(sender.pk, reason, likes=-amount, points=sender_points)
+            + ledger_entries(receiver.pk, reason, received_likes=received_likes, points=receiver_points)
+        )
+
+    mirror_deltas(sender, likes=-amount, points=sender_points)
+    mirror_deltas(receiver, received_likes=received_likes, points=receiver_points)
+    logger.info(f"Likes transferred - Sender: {sender.pk}, Receiver: {receiver.pk}, Amount: {amount}, Field: {received_field}, SenderPoints: {sender_points}, ReceiverPoints: {receiver_points}")
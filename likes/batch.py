@@ -0,0 +1,205 @@
+# likes/batch.py
+"""
+Applying a batch of likes and unlikes at once.
+
+A swipe client collects actions locally and submits them together. The
+whole batch is one transaction: the sender is debited for the total with a
+single conditional UPDATE (so the batch either fits the bank or changes
+nothing), received likes and points are credited through the ledger, the
+unliked users' received_unlikes_count is raised by one UPDATE, and the
+Like/Unlike rows, like pairs, ledger entries and notifications are each
+written with one bulk query. The number of queries does not grow with the batch size,
+apart from the likes an unlike removes.
+"""
+from collections import defaultdict
+import logging
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from accounts.ledger import InsufficientBalance, ledger_entries, mirror_deltas, record_entries
+
+logger = logging.getLogger('likes')
+
+MAX_BATCH_ACTIONS = 50
+
+LIKE = 'like'
+UNLIKE = 'unlike'
+
+
+def parse_actions(user, raw_actions):
+    """
+    Validate submitted actions ({'user_id', 'amount', 'action'} dicts) and
+    return them as (target_id, amount, action) tuples. Raises ValueError
+    with a message for the client if the batch is malformed.
+    """
+    if not isinstance(raw_actions, list) or not raw_actions:
+        raise ValueError('actions must be a non-empty list')
+    if len(raw_actions) > MAX_BATCH_ACTIONS:
+        raise ValueError(f'At most {MAX_BATCH_ACTIONS} actions can be sent at once')
+
+    actions = []
+    for raw in raw_actions:
+        try:
+            target_id = int(raw['user_id'])
+            amount = int(raw.get('amount', 1))
+            action = raw.get('action', LIKE)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise ValueError('Each action needs a user_id and an integer amount')
+        if action not in (LIKE, UNLIKE):
+            raise ValueError(f'Unknown action: {action}')
+        if amount < 1:
+            raise ValueError('Amount must be at least 1')
+        if target_id == user.pk:
+            raise ValueError('Cannot like or unlike yourself')
+        actions.append((target_id, amount, action))
+
+    liked = {target_id for target_id, _, action in actions if action == LIKE}
+    unliked = {target_id for target_id, _, action in actions if action == UNLIKE}
+    if liked & unliked:
+        raise ValueError('A user cannot be both liked and unliked in one batch')
+
+    targets = set(liked | unliked)
+    found = set(get_user_model().objects.filter(pk__in=targets).values_list('pk', flat=True))
+    if found != targets:
+        raise ValueError(f'Unknown users: {sorted(targets - found)}')
+    return actions
+
+
+def _count_unlikes(unlike_counts):
+    """One UPDATE adding each {user id: amount} to that user's received_unlikes_count"""
+    User = get_user_model()
+    User.objects.filter(pk__in=unlike_counts).update(
+        received_unlikes_count=F('received_unlikes_count') + Case(
+            *[When(pk=user_id, then=Value(amount)) for user_id, amount in unlike_counts.items()],
+            default=Value(0),
+        )
+    )
+
+
+def apply_like_batch(user, actions):
+    """
+    Apply parsed actions for user in one transaction. Returns one result
+    dict per action ({'user_id', 'action', 'amount', 'is_mutual'}).
+
+    Raises InsufficientBalance (and changes nothing) if the total amount is
+    more than user's likes_balance.
+    """
+    from notifications.models import Notification
+    from profiles.discover import record_like, record_unlike
+    from .models import Like, LikePair, Unlike
+    from .models import MUTUAL_LIKE_BONUS, RECEIVER_POINTS_PER_LIKE, SENDER_POINTS_PER_LIKE
+
+    User = get_user_model()
+    total = sum(amount for _, amount, _ in actions)
+    liked = {target_id for target_id, _, action in actions if action == LIKE}
+    unliked = {target_id for target_id, _, action in actions if action == UNLIKE}
+
+    with transaction.atomic():
+        # One balance check for the whole batch; it also locks the sender's row, so
+        # the sender's own pairs and unlikes read below cannot change until commit
+        debited = User.objects.filter(pk=user.pk, likes_balance__gte=total).update(
+            likes_balance=F('likes_balance') - total,
+        )
+        if not debited:
+            available = User.objects.filter(pk=user.pk).values_list('likes_balance', flat=True).first()
+            logger.warning(f"Insufficient likes balance - User: {user.pk}, Required: {total}, Available: {available}")
+            raise InsufficientBalance(f"Insufficient likes balance. Required: {total}, Available: {available}")
+
+        # The reverse pairs are the targets' rows, so they are locked separately: an
+        # unlike from a target cannot drop one mid-batch. A target's first like back
+        # has no row to lock yet, so if it commits concurrently with this batch
+        # neither side sees the other and the pair is not marked mutual.
+        reverse_pairs = dict(
+            LikePair.objects.select_for_update().filter(
+                from_user_id__in=liked, to_user=user
+            ).values_list('from_user_id', 'is_mutual')
+        )
+
+        sender_points = 0
+        unlike_amounts = defaultdict(int)
+        entries = []
+        likes = []
+        notifications = []
+        results = []
+        for target_id, amount, action in actions:
+            result = {'user_id': target_id, 'action': action, 'amount': amount, 'is_mutual': False}
+            if action == LIKE:
+                is_mutual = target_id in reverse_pairs
+                bonus = MUTUAL_LIKE_BONUS if is_mutual else 0
+                points = SENDER_POINTS_PER_LIKE * amount + bonus
+                target_points = RECEIVER_POINTS_PER_LIKE * amount + bonus
+                sender_points += points
+                entries += ledger_entries(user.pk, 'like', likes=-amount, points=points)
+                entries += ledger_entries(target_id, 'like', received_likes=amount, points=target_points)
+                likes.append(Like(from_user=user, to_user_id=target_id, amount=amount, is_mutual=is_mutual))
+                amount_text = f"{amount} Like{'s' if amount > 1 else ''}"
+                message = f"{user.username} gave you {amount_text}!"
+                result['is_mutual'] = is_mutual
+            else:
+                entries += ledger_entries(user.pk, 'unlike', likes=-amount)
+                unlike_amounts[target_id] += amount
+                amount_text = f"{amount} dislike{'s' if amount > 1 else ''}"
+                message = f"{user.username} sent you {amount_text}."
+            notifications.append(Notification(
+                sender=user, receiver_id=target_id, notification_type=f'{action}_received', message=message, status='read'
+            ))
+            results.append(result)
+
+        if unlike_amounts:
+            _count_unlikes(unlike_amounts)
+        record_entries(entries)
+
+        if likes:
+            Like.objects.bulk_create(likes)
+            existing = {pair.to_user_id: pair for pair in LikePair.objects.filter(from_user=user, to_user_id__in=liked)}
+            created = {}
+            for like in likes:
+                pair = existing.get(like.to_user_id) or created.get(like.to_user_id)
+                if pair is None:
+                    pair = created[like.to_user_id] = LikePair(
+                        from_user=user, to_user_id=like.to_user_id, first_liked_at=like.created_at
+                    )
+                pair.total_amount += like.amount
+                pair.like_count += 1
+                pair.last_liked_at = like.created_at
+                pair.is_mutual = pair.is_mutual or like.is_mutual
+            if existing:
+                LikePair.objects.bulk_update(
+                    existing.values(), ['total_amount', 'like_count', 'last_liked_at', 'is_mutual']
+                )
+            if created:
+                LikePair.objects.bulk_create(created.values())
+
+            # Pairs that just became mutual flag the other side once
+            newly_mutual = [target_id for target_id, is_mutual in reverse_pairs.items() if not is_mutual]
+            if newly_mutual:
+                LikePair.objects.filter(from_user_id__in=newly_mutual, to_user=user).update(is_mutual=True)
+                Like.objects.filter(from_user_id__in=newly_mutual, to_user=user, is_mutual=False).update(is_mutual=True)
+
+        if unliked:
+            for target_id, amount in Unlike.objects.filter(
+                from_user=user, to_user_id__in=unliked
+            ).values_list('to_user_id', 'amount'):
+                unlike_amounts[target_id] += amount
+            Unlike.objects.bulk_create(
+                [Unlike(from_user=user, to_user_id=target_id, amount=amount) for target_id, amount in unlike_amounts.items()],
+                update_conflicts=True,
+                unique_fields=['from_user', 'to_user'],
+                update_fields=['amount'],
+            )
+            # Remove any existing likes between these users
+            Like.objects.filter(from_user=user, to_user_id__in=unliked).delete()
+
+        Notification.objects.bulk_create(notifications)
+
+    # bulk_create skips the post_save handlers that keep discover's cache in step
+    for like in likes:
+        record_like(user.pk, like.to_user_id)
+    for target_id in unliked:
+        record_unlike(user.pk, target_id)
+
+    mirror_deltas(user, likes=-total, points=sender_points)
+    logger.info(f"Like batch applied - User: {user.pk}, Actions: {len(actions)}, Likes: {len(likes)}, Unlikes: {len(unliked)}, Total: {total}")
+    return results
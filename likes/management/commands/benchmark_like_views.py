@@ -0,0 +1,155 @@
+from contextvars import ContextVar
+import statistics
+import time
+from types import ModuleType
+from unittest import mock
+
+from asgiref.sync import SyncToAsync, async_to_sync, sync_to_async
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.shortcuts import get_object_or_404, redirect
+from django.test import AsyncClient, override_settings
+from django.urls import include, path
+
+from likes.balances import InsufficientBalance
+from likes.models import Like
+from likes.views import give_like
+from notifications.models import Notification
+
+User = get_user_model()
+
+# Set while a view body runs, so its hops can be told apart from the middleware's
+in_view = ContextVar('in_view', default=False)
+
+
+class Rollback(Exception):
+    pass
+
+
+@login_required
+async def previous_give_like(request, user_id):
+    """The previous give_like: every step is its own sync_to_async hop"""
+    @sync_to_async
+    def get_target_user(user_id):
+        return get_object_or_404(User, id=user_id)
+
+    @sync_to_async
+    def get_user_balance(user):
+        user.refresh_from_db()
+        return user.likes_balance
+
+    @sync_to_async
+    def create_like_and_notification(from_user, target_user, amount):
+        like = Like.objects.create(from_user=from_user, to_user=target_user, amount=amount)
+        Notification.objects.create(
+            sender=from_user,
+            receiver=target_user,
+            notification_type='like_received',
+            message=f"{from_user.username} gave you {amount} Like{'s' if amount > 1 else ''}!",
+            status='read'
+        )
+        return like
+
+    target_user = await get_target_user(user_id)
+    amount = int(request.POST.get('amount', 1))
+    if await get_user_balance(request.user) < amount:
+        return redirect('payments:packages')
+    try:
+        await create_like_and_notification(request.user, target_user, amount)
+    except InsufficientBalance:
+        return redirect('payments:packages')
+    messages.success(request, f'You gave {amount} Like to {target_user.username}!')
+    return redirect('profiles:discover')
+
+
+def measured(view):
+    async def wrapper(request, *args, **kwargs):
+        token = in_view.set(True)
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            in_view.reset(token)
+    return wrapper
+
+
+# Both views behind the project's own URLs, so they go through the same ASGI stack
+urlconf = ModuleType('benchmark_like_urls')
+urlconf.urlpatterns = [
+    path('benchmark/previous-like/<int:user_id>/', measured(previous_give_like)),
+    path('benchmark/like/<int:user_id>/', measured(give_like)),
+    path('', include('mooibanana_project.urls')),
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark thread hops and latency per like for the previous and current async give_like (rows are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--likes',
+            type=int,
+            default=200,
+            help='Likes sent per view (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        count = max(1, options['likes'])
+        self.hops = {'view': 0, 'request': 0}
+
+        original_call = SyncToAsync.__call__
+        hops = self.hops
+
+        async def counted_call(self, *args, **kwargs):
+            hops['request'] += 1
+            if in_view.get():
+                hops['view'] += 1
+            return await original_call(self, *args, **kwargs)
+
+        paths = [
+            ('previous', '/benchmark/previous-like/{}/'),
+            ('async ORM', '/benchmark/like/{}/'),
+        ]
+        self.stdout.write(f'{count} likes per view through the ASGI request handler')
+        self.stdout.write(
+            f'{"view":>10} {"view hops":>10} {"request hops":>13} {"median (ms)":>12} {"p95 (ms)":>9}'
+        )
+        with override_settings(ROOT_URLCONF=urlconf), mock.patch.object(SyncToAsync, '__call__', counted_call):
+            for name, url in paths:
+                timings = self.run(url, count)
+                timings.sort()
+                self.stdout.write(
+                    f'{name:>10} {self.hops["view"] / count:>10.1f} {self.hops["request"] / count:>13.1f} '
+                    f'{statistics.median(timings) * 1000:>12.2f} {timings[int(len(timings) * 0.95) - 1] * 1000:>9.2f}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark completed'))
+
+    def run(self, url, count):
+        """Send count likes through url inside a transaction that is always rolled back"""
+        try:
+            with transaction.atomic():
+                sender = User.objects.create_user(
+                    username='like-benchmark', email='like-benchmark@example.com', likes_balance=count
+                )
+                receiver = User.objects.create_user(username='like-benchmark-to', email='like-benchmark-to@example.com')
+                client = AsyncClient()
+                client.force_login(sender)
+                timings = async_to_sync(self.send_likes)(client, url.format(receiver.pk), count)
+                if Like.objects.filter(from_user=sender).count() != count:
+                    raise RuntimeError(f'{url} did not create {count} likes')
+                raise Rollback
+        except Rollback:
+            pass
+        return timings
+
+    async def send_likes(self, client, url, count):
+        timings = []
+        self.hops.update(view=0, request=0)
+        for _ in range(count):
+            start = time.perf_counter()
+            await client.post(url, {'amount': 1})
+            timings.append(time.perf_counter() - start)
+        return timings
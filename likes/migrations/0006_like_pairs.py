@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+
+
+def populate_like_pairs(apps, schema_editor):
+    """Fold the existing likes into one pair row per (from_user, to_user)"""
+    Like = apps.get_model('likes', 'Like')
+    LikePair = apps.get_model('likes', 'LikePair')
+    rows = list(Like.objects.order_by().values('from_user', 'to_user').annotate(
+        total_amount=Sum('amount'),
+        like_count=Count('id'),
+        first_liked_at=Min('created_at'),
+        last_liked_at=Max('created_at'),
+    ))
+    pairs = {(row['from_user'], row['to_user']) for row in rows}
+    LikePair.objects.bulk_create([
+        LikePair(
+            from_user_id=row['from_user'],
+            to_user_id=row['to_user'],
+            total_amount=row['total_amount'],
+            like_count=row['like_count'],
+            first_liked_at=row['first_liked_at'],
+            last_liked_at=row['last_liked_at'],
+            is_mutual=(row['to_user'], row['from_user']) in pairs,
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('likes', '0005_remove_like_like_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikePair',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(default=0, help_text='Sum of the amounts of the likes')),
+                ('like_count', models.PositiveIntegerField(default=0, help_text='Number of likes sent')),
+                ('first_liked_at', models.DateTimeField()),
+                ('last_liked_at', models.DateTimeField()),
+                ('is_mutual', models.BooleanField(default=False)),
+                ('from_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='like_pairs_given', to=settings.AUTH_USER_MODEL)),
+                ('to_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='like_pairs_received', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('from_user', 'to_user'), name='likes_likepair_unique_pair')],
+            },
+        ),
+        migrations.RunPython(
+            populate_like_pairs,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -1,14 +1,23 @@
 # likes/models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete
 from django.dispatch import receiver
 import logging
 
+from .balances import transfer_likes
+from .pairs import add_like_to_pair, remove_like_from_pair, reverse_pair_state
+
 logger = logging.getLogger('likes')
 
 User = get_user_model()
 
+# Points awarded per like given and received, plus a fixed bonus to both users for a mutual like
+SENDER_POINTS_PER_LIKE = 5
+RECEIVER_POINTS_PER_LIKE = 10
+MUTUAL_LIKE_BONUS = 25
+
 class Like(models.Model):
     from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes_given')
     to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes_received')
@@ -24,60 +33,52 @@ class Like(models.Model):
         return f"{self.from_user.username} gave {self.amount} like(s) to {self.to_user.username}"
 
     def save(self, *args, **kwargs):
-        # Check if user has enough bank balance before saving
-        if not self.pk:  # Only check on creation
-            logger.info(f"Creating like - From: {self.from_user.id}, To: {self.to_user.id}, Amount: {self.amount}")
-
-            if self.from_user.likes_balance < self.amount:
-                logger.warning(f"Insufficient likes balance - User: {self.from_user.id}, Required: {self.amount}, Available: {self.from_user.likes_balance}")
-                raise ValueError(f"Insufficient likes balance. Required: {self.amount}, Available: {self.from_user.likes_balance}")
-
-            # Deduct from bank
-            old_from_balance = self.from_user.likes_balance
-            self.from_user.likes_balance -= self.amount
+        if self.pk:
+            return super().save(*args, **kwargs)
 
-            # Update receiver's received count
-            old_to_received = self.to_user.received_likes_count
-            self.to_user.received_likes_count += self.amount
+        with transaction.atomic():
+            # The like is mutual if the other user has liked this one (one pair lookup)
+            reverse_is_mutual = reverse_pair_state(self.from_user_id, self.to_user_id)
+            self.is_mutual = self.is_mutual or reverse_is_mutual is not None
 
-            # Save the users with updated balances
-            self.from_user.save()
-            self.to_user.save()
-
-            logger.info(f"Like balances updated - Sender: {self.from_user.id}, OldBalance: {old_from_balance}, NewBalance: {self.from_user.likes_balance}, Receiver: {self.to_user.id}, OldReceived: {old_to_received}, NewReceived: {self.to_user.received_likes_count}")
-
-        # Check if this creates a mutual like (if both users have liked each other)
-        if Like.objects.filter(from_user=self.to_user, to_user=self.from_user).exists():
-            self.is_mutual = True
-            # Update all reverse likes as mutual as well
-            Like.objects.filter(from_user=self.to_user, to_user=self.from_user).update(is_mutual=True)
-            logger.info(f"Mutual like detected - User1: {self.from_user.id}, User2: {self.to_user.id}")
-
-        super().save(*args, **kwargs)
+            logger.info(f"Creating like - From: {self.from_user.id}, To: {self.to_user.id}, Amount: {self.amount}")
 
-@receiver(post_save, sender=Like)
-def award_points_for_like(sender, instance, created, **kwargs):
-    if created:
-        # Award points based on like amount - 5 points per like for sender, 10 for receiver
-        sender_points = 5 * instance.amount
-        receiver_points = 10 * instance.amount
+            # Move the likes and award points in one conditional update per user;
+            # raises InsufficientBalance if the bank does not cover the amount
+            bonus = MUTUAL_LIKE_BONUS if reverse_is_mutual is not None else 0
+            transfer_likes(
+                self.from_user, self.to_user, self.amount, 'like',
+                sender_points=SENDER_POINTS_PER_LIKE * self.amount + bonus,
+                receiver_points=RECEIVER_POINTS_PER_LIKE * self.amount + bonus,
+            )
+
+            super().save(*args, **kwargs)
+            add_like_to_pair(self, reverse_is_mutual)
+
+
+class LikePair(models.Model):
+    """All the likes one user has sent another, maintained by likes/pairs.py"""
+    from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='like_pairs_given')
+    to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='like_pairs_received')
+    total_amount = models.PositiveIntegerField(default=0, help_text="Sum of the amounts of the likes")
+    like_count = models.PositiveIntegerField(default=0, help_text="Number of likes sent")
+    first_liked_at = models.DateTimeField()
+    last_liked_at = models.DateTimeField()
+    is_mutual = models.BooleanField(default=False)
 
-        old_sender_points = instance.from_user.points_balance
-        old_receiver_points = instance.to_user.points_balance
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['from_user', 'to_user'], name='likes_likepair_unique_pair'),
+        ]
 
-        instance.from_user.points_balance += sender_points
-        instance.to_user.points_balance += receiver_points
+    def __str__(self):
+        return f"{self.from_user.username} gave {self.total_amount} like(s) to {self.to_user.username}"
 
-        # Bonus for mutual likes (fixed bonus regardless of amount)
-        if instance.is_mutual:
-            instance.from_user.points_balance += 25
-            instance.to_user.points_balance += 25
-            logger.info(f"Mutual like bonus awarded - User1: {instance.from_user.id}, User2: {instance.to_user.id}, Bonus: 25 points each")
 
-        instance.from_user.save()
-        instance.to_user.save()
+@receiver(post_delete, sender=Like)
+def remove_deleted_like_from_pair(sender, instance, **kwargs):
+    remove_like_from_pair(instance)
 
-        logger.info(f"Like points awarded - Sender: {instance.from_user.id}, Points: {sender_points}, OldPoints: {old_sender_points}, NewPoints: {instance.from_user.points_balance}, Receiver: {instance.to_user.id}, Points: {receiver_points}, OldPoints: {old_receiver_points}, NewPoints: {instance.to_user.points_balance}")
 
 class Unlike(models.Model):
     from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='unlikes_given')
@@ -89,29 +90,21 @@ class Unlike(models.Model):
         unique_together = ['from_user', 'to_user']
 
     def save(self, *args, **kwargs):
-        # Check if user has enough bank balance before saving
-        # Unlikes now use the same likes_balance
-        if not self.pk:  # Only check on creation
-            logger.info(f"Creating unlike - From: {self.from_user.id}, To: {self.to_user.id}, Amount: {self.amount}")
-
-            if self.from_user.likes_balance < self.amount:
-                logger.warning(f"Insufficient balance for unlike - User: {self.from_user.id}, Required: {self.amount}, Available: {self.from_user.likes_balance}")
-                raise ValueError(f"Insufficient balance. Required: {self.amount}, Available: {self.from_user.likes_balance}")
-
-            # Deduct from likes bank and update receiver's count
-            old_from_balance = self.from_user.likes_balance
-            old_to_received = self.to_user.received_unlikes_count
-
-            self.from_user.likes_balance -= self.amount
-            self.to_user.received_unlikes_count += self.amount
-
-            # Save the users with updated balances
-            self.from_user.save()
-            self.to_user.save()
-
-            logger.info(f"Unlike balances updated - Sender: {self.from_user.id}, OldBalance: {old_from_balance}, NewBalance: {self.from_user.likes_balance}, Receiver: {self.to_user.id}, OldReceived: {old_to_received}, NewReceived: {self.to_user.received_unlikes_count}")
-
-        super().save(*args, **kwargs)
+        # Unlikes use the same likes_balance
+        if self.pk:
+            return super().save(*args, **kwargs)
+
+        logger.info(f"Creating unlike - From: {self.from_user.id}, To: {self.to_user.id}, Amount: {self.amount}")
+        with transaction.atomic():
+            transfer_likes(self.from_user, self.to_user, self.amount, 'unlike', received_field='received_unlikes_count')
+            super().save(*args, **kwargs)
+
+    def add_amount(self, amount):
+        """Charge the sender for amount more unlikes on this row"""
+        with transaction.atomic():
+            transfer_likes(self.from_user, self.to_user, amount, 'unlike', received_field='received_unlikes_count')
+            Unlike.objects.filter(pk=self.pk).update(amount=F('amount') + amount)
+        self.amount += amount
 
     def __str__(self):
         return f"{self.from_user.username} gave {self.amount} unlike(s) to {self.to_user.username}"
@@ -0,0 +1,89 @@
+# likes/pairs.py
+"""
+Per-pair like aggregates.
+
+Like keeps one row per like sent, so a user can have many rows towards the
+same person. LikePair folds them into one row per (from_user, to_user) with
+the total amount, the number of likes, the first/last like time and the
+mutual flag, kept up to date in the same transaction as the Like rows. Pair
+lookups and mutual checks are then a single unique-index hit however many
+likes the two users have exchanged.
+"""
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+logger = logging.getLogger('likes')
+
+
+def reverse_pair_state(from_user_id, to_user_id):
+    """
+    Whether to_user has liked from_user: None if never, otherwise the
+    reverse pair's is_mutual flag
+    """
+    from .models import LikePair
+    return LikePair.objects.filter(
+        from_user_id=to_user_id, to_user_id=from_user_id
+    ).values_list('is_mutual', flat=True).first()
+
+
+def add_like_to_pair(like, reverse_is_mutual):
+    """
+    Fold a newly saved like into its pair (update, or insert if this is the
+    pair's first like). If the like makes the pair mutual for the first
+    time, flag the reverse pair and its likes too; reverse_is_mutual is the
+    value reverse_pair_state() returned before the like was saved.
+    """
+    from .models import Like, LikePair
+
+    pair = LikePair.objects.filter(from_user_id=like.from_user_id, to_user_id=like.to_user_id)
+    changes = {
+        'total_amount': F('total_amount') + like.amount,
+        'like_count': F('like_count') + 1,
+        'last_liked_at': like.created_at,
+    }
+    if like.is_mutual:
+        changes['is_mutual'] = True
+
+    with transaction.atomic():
+        if not pair.update(**changes):
+            try:
+                with transaction.atomic():
+                    LikePair.objects.create(
+                        from_user_id=like.from_user_id,
+                        to_user_id=like.to_user_id,
+                        total_amount=like.amount,
+                        like_count=1,
+                        first_liked_at=like.created_at,
+                        last_liked_at=like.created_at,
+                        is_mutual=like.is_mutual,
+                    )
+            except IntegrityError:
+                # A concurrent like inserted the pair first
+                pair.update(**changes)
+
+        if like.is_mutual and not reverse_is_mutual:
+            LikePair.objects.filter(
+                from_user_id=like.to_user_id, to_user_id=like.from_user_id
+            ).update(is_mutual=True)
+            Like.objects.filter(
+                from_user_id=like.to_user_id, to_user_id=like.from_user_id, is_mutual=False
+            ).update(is_mutual=True)
+            logger.info(f"Mutual like detected - User1: {like.from_user_id}, User2: {like.to_user_id}")
+
+
+def remove_like_from_pair(like):
+    """
+    Take a deleted like out of its pair, dropping the pair (and the reverse
+    pair's mutual flag) once no likes are left
+    """
+    from .models import LikePair
+
+    pair = LikePair.objects.filter(from_user_id=like.from_user_id, to_user_id=like.to_user_id)
+    with transaction.atomic():
+        pair.update(total_amount=F('total_amount') - like.amount, like_count=F('like_count') - 1)
+        if pair.filter(like_count__lte=0).delete()[0]:
+            LikePair.objects.filter(
+                from_user_id=like.to_user_id, to_user_id=like.from_user_id
+            ).update(is_mutual=False)
@@ -1,3 +1,225 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection, connections
+from django.test import AsyncClient, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.ledger import ledger_balances
+from notifications.models import Notification
+
+from .balances import InsufficientBalance
+from .batch import apply_like_batch, parse_actions
+from .models import Like, LikePair, Unlike
+
+User = get_user_model()
+
+
+class LikeTransferTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', likes_balance=10)
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', likes_balance=10)
+
+    def balances(self, user):
+        user = User.objects.get(pk=user.pk)
+        return user.likes_balance, user.received_likes_count, user.received_unlikes_count, user.points_balance
+
+    def test_like_moves_balance_and_points_without_saving_users(self):
+        with CaptureQueriesContext(connection) as captured:
+            Like.objects.create(from_user=self.alice, to_user=self.bob, amount=3)
+        # One conditional debit; the credits are ledger inserts and neither user is read back or saved whole
+        user_queries = [query['sql'] for query in captured if 'accounts_customuser' in query['sql']]
+        self.assertEqual(len(user_queries), 1)
+        self.assertIn('"likes_balance" >= 3', user_queries[0])
+        self.assertEqual(self.balances(self.alice), (7, 0, 0, 15))
+        self.assertEqual(self.balances(self.bob), (10, 3, 0, 30))
+
+        # A like back is mutual and earns both users the bonus
+        like = Like.objects.create(from_user=self.bob, to_user=self.alice, amount=1)
+        self.assertTrue(like.is_mutual)
+        self.assertEqual(self.balances(self.alice), (7, 1, 0, 15 + 10 + 25))
+        self.assertEqual(self.balances(self.bob), (9, 3, 0, 30 + 5 + 25))
+
+    def test_insufficient_balance_changes_nothing(self):
+        with self.assertRaises(InsufficientBalance):
+            Like.objects.create(from_user=self.alice, to_user=self.bob, amount=11)
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(self.balances(self.alice), (10, 0, 0, 0))
+        self.assertEqual(self.balances(self.bob), (10, 0, 0, 0))
+
+    def test_adding_to_an_unlike_is_charged(self):
+        unlike = Unlike.objects.create(from_user=self.alice, to_user=self.bob, amount=2)
+        unlike.add_amount(3)
+        self.assertEqual(Unlike.objects.get().amount, 5)
+        self.assertEqual(self.balances(self.alice)[0], 5)
+        self.assertEqual(self.balances(self.bob)[2], 5)
+
+
+class LikePairTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', likes_balance=20)
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', likes_balance=20)
+
+    def test_likes_fold_into_one_pair(self):
+        first = Like.objects.create(from_user=self.alice, to_user=self.bob, amount=2)
+        with CaptureQueriesContext(connection) as captured:
+            last = Like.objects.create(from_user=self.alice, to_user=self.bob, amount=3)
+        # The mutual check is a pair lookup, not a scan of the like table
+        self.assertFalse(any('FROM "likes_like"' in query['sql'] for query in captured))
+
+        pair = LikePair.objects.get()
+        self.assertEqual((pair.total_amount, pair.like_count, pair.is_mutual), (5, 2, False))
+        self.assertEqual((pair.first_liked_at, pair.last_liked_at), (first.created_at, last.created_at))
+
+    def test_like_back_makes_both_pairs_mutual(self):
+        Like.objects.create(from_user=self.alice, to_user=self.bob)
+        Like.objects.create(from_user=self.alice, to_user=self.bob)
+        like = Like.objects.create(from_user=self.bob, to_user=self.alice)
+
+        self.assertTrue(like.is_mutual)
+        self.assertEqual(LikePair.objects.filter(is_mutual=True).count(), 2)
+        self.assertFalse(Like.objects.filter(is_mutual=False).exists())
+
+    def test_deleting_likes_updates_the_pair(self):
+        Like.objects.create(from_user=self.alice, to_user=self.bob, amount=2)
+        Like.objects.create(from_user=self.alice, to_user=self.bob, amount=3)
+        Like.objects.create(from_user=self.bob, to_user=self.alice)
+
+        Like.objects.filter(from_user=self.alice).first().delete()
+        pair = LikePair.objects.get(from_user=self.alice)
+        self.assertEqual((pair.total_amount, pair.like_count), (3, 1))
+
+        Like.objects.filter(from_user=self.alice).delete()
+        self.assertFalse(LikePair.objects.filter(from_user=self.alice).exists())
+        self.assertFalse(LikePair.objects.get(from_user=self.bob).is_mutual)
+
+
+class LikeBatchTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', likes_balance=20)
+        self.others = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', likes_balance=5)
+            for i in range(6)
+        ]
+
+    def post(self, actions):
+        self.client.force_login(self.alice)
+        return self.client.post(
+            reverse('likes:give_likes_batch'), data=json.dumps({'actions': actions}), content_type='application/json'
+        )
+
+    def test_batch_matches_single_actions(self):
+        Like.objects.create(from_user=self.others[0], to_user=self.alice)
+        Unlike.objects.create(from_user=self.alice, to_user=self.others[2], amount=1)
+        Like.objects.create(from_user=self.alice, to_user=self.others[3])
+
+        response = self.post([
+            {'user_id': self.others[0].pk, 'amount': 2},
+            {'user_id': self.others[1].pk},
+            {'user_id': self.others[1].pk, 'amount': 3},
+            {'user_id': self.others[2].pk, 'amount': 2, 'action': 'unlike'},
+            {'user_id': self.others[3].pk, 'action': 'unlike'},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['new_balance'], 20 - 1 - 1 - 9)
+        self.assertEqual([result['is_mutual'] for result in data['results']], [True, False, False, False, False])
+
+        self.assertEqual(Unlike.objects.get(to_user=self.others[2]).amount, 3)
+        self.assertFalse(Like.objects.filter(from_user=self.alice, to_user=self.others[3]).exists())
+        self.assertEqual(LikePair.objects.get(from_user=self.alice, to_user=self.others[1]).total_amount, 4)
+        self.assertTrue(LikePair.objects.get(from_user=self.others[0]).is_mutual)
+        self.assertEqual(Notification.objects.filter(sender=self.alice).count(), 5)
+        for user in [self.alice] + self.others:
+            stored = User.objects.values_list('likes_balance', flat=True).get(pk=user.pk)
+            self.assertEqual(ledger_balances(user.pk)['likes'], stored)
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        def queries(targets):
+            actions = parse_actions(self.alice, [{'user_id': user.pk} for user in targets])
+            with CaptureQueriesContext(connection) as captured:
+                apply_like_batch(self.alice, actions)
+            return len(captured)
+
+        self.assertEqual(queries(self.others[:2]), queries(self.others[2:]))
+
+    def test_insufficient_balance_applies_nothing(self):
+        response = self.post([{'user_id': user.pk, 'amount': 4} for user in self.others])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(User.objects.get(pk=self.alice.pk).likes_balance, 20)
+
+    def test_invalid_batches_are_rejected(self):
+        for actions in (
+            [],
+            [{'user_id': self.alice.pk}],
+            [{'user_id': 999999}],
+            [{'user_id': self.others[0].pk, 'amount': 0}],
+            [{'user_id': self.others[0].pk}, {'user_id': self.others[0].pk, 'action': 'unlike'}],
+        ):
+            self.assertEqual(self.post(actions).status_code, 400)
+
+
+class AsyncLikeViewTest(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', likes_balance=3)
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com')
+        self.client = AsyncClient()
+        self.client.force_login(self.alice)
+
+    async def test_like_then_unlike(self):
+        response = await self.client.post(reverse('likes:give_like', args=[self.bob.pk]), {'amount': 2})
+        self.assertRedirects(response, reverse('profiles:discover'), fetch_redirect_response=False)
+        self.assertEqual(await Like.objects.filter(from_user=self.alice, amount=2).acount(), 1)
+
+        response = await self.client.post(reverse('likes:give_unlike', args=[self.bob.pk]), {'amount': 5})
+        self.assertRedirects(response, reverse('payments:packages'), fetch_redirect_response=False)
+
+        await self.client.post(reverse('likes:give_unlike', args=[self.bob.pk]))
+        self.assertFalse(await Like.objects.filter(from_user=self.alice).aexists())
+        self.assertEqual(
+            [n.notification_type async for n in Notification.objects.filter(sender=self.alice).order_by('id')],
+            ['like_received', 'unlike_received'],
+        )
+        self.assertEqual(await User.objects.values_list('likes_balance', flat=True).aget(pk=self.alice.pk), 0)
+
+
+class ConcurrentLikeTest(TransactionTestCase):
+    """Many simultaneous likes from one sender must neither overdraw nor lose updates"""
+
+    def test_one_sender_many_threads(self):
+        sender = User.objects.create_user(username='sender', email='sender@example.com', likes_balance=25)
+        receivers = [
+            User.objects.create_user(username=f'receiver{i}', email=f'receiver{i}@example.com')
+            for i in range(4)
+        ]
+
+        def tap(i):
+            try:
+                while True:
+                    try:
+                        Like.objects.create(from_user=User.objects.get(pk=sender.pk), to_user=receivers[i % 4])
+                        return True
+                    except InsufficientBalance:
+                        return False
+                    except OperationalError:
+                        # SQLite allows a single writer and reports the others as locked; try again
+                        time.sleep(0.001)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(tap, range(40)))
+
+        sender.refresh_from_db()
+        self.assertEqual(results.count(True), 25)
+        self.assertEqual(sender.likes_balance, 0)
+        self.assertEqual(Like.objects.count(), 25)
+        self.assertEqual(
+            sum(ledger_balances(r.pk)['received_likes'] for r in receivers),
+            25,
+        )
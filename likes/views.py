@@ -1,76 +1,81 @@
 
 # likes/views.py
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import ListView
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.http import JsonResponse
+from django.views.decorators.http import require_POST
 from django.db.models import Q
+from .balances import InsufficientBalance
+from .batch import apply_like_batch, parse_actions
 from .models import Like, Unlike
 from chat.models import Match, ChatRoom
 from notifications.models import Notification
 from asgiref.sync import sync_to_async
-import asyncio
+import json
 
 User = get_user_model()
 
+@sync_to_async
+@transaction.atomic
+def create_like_and_notification(from_user, target_user, amount):
+    """Create the like and the receiver's notification in one sync block and one transaction"""
+    like = Like.objects.create(
+        from_user=from_user,
+        to_user=target_user,
+        amount=amount
+    )
+
+    # Create notification for the user who received the like
+    amount_text = f"{amount} Like{'s' if amount > 1 else ''}"
+    Notification.objects.create(
+        sender=from_user,
+        receiver=target_user,
+        notification_type='like_received',
+        message=f"{from_user.username} gave you {amount_text}!",
+        status='read'
+    )
+    return like
+
+
+def get_amount(request):
+    """The amount posted with a like/unlike form (default and minimum 1)"""
+    try:
+        return max(1, int(request.POST.get('amount', 1)))
+    except (ValueError, TypeError):
+        return 1
+
+
 @login_required
 async def give_like(request, user_id):
-    """Async version of give_like for better performance"""
+    """
+    Like a user. The target is read with the async ORM and the writes run in
+    a single sync block. benchmark_like_views measures 5 hops to the sync
+    thread per like (6 before): three in login_required (its user check and
+    the session and user lookups of request.auser()), then the target lookup
+    and the write block.
+    """
     if request.method == 'POST':
-        # Async database operations
-        @sync_to_async
-        def get_target_user(user_id):
-            return get_object_or_404(User, id=user_id)
-
-        @sync_to_async
-        def get_user_balance(user):
-            # Refresh from database to get latest balance
-            user.refresh_from_db()
-            return user.likes_balance
-
-        @sync_to_async
-        def create_like_and_notification(from_user, target_user, amount):
-            # Create the like with specified amount
-            like = Like.objects.create(
-                from_user=from_user,
-                to_user=target_user,
-                amount=amount
-            )
-
-            # Create notification for the user who received the like
-            amount_text = f"{amount} Like{'s' if amount > 1 else ''}"
-            Notification.objects.create(
-                sender=from_user,
-                receiver=target_user,
-                notification_type='like_received',
-                message=f"{from_user.username} gave you {amount_text}!",
-                status='read'
-            )
-            return like
-
-        target_user = await get_target_user(user_id)
-
-        # Get the amount from the form (default to 1 if not provided)
-        try:
-            amount = int(request.POST.get('amount', 1))
-            if amount < 1:
-                amount = 1
-        except (ValueError, TypeError):
-            amount = 1
-
-        # Check if user has enough likes (async database access)
-        user_balance = await get_user_balance(request.user)
-        if user_balance < amount:
-            messages.error(request, f'You need {amount} likes! You only have {user_balance}. Buy more likes.')
+        user = await request.auser()
+        target_user = await aget_object_or_404(User, id=user_id)
+        amount = get_amount(request)
+
+        # The user was loaded from the database for this request, so its balance is current
+        # enough to fail early; Like.save() deducts it atomically and refuses if a concurrent
+        # request spent it since
+        if user.likes_balance < amount:
+            messages.error(request, f'You need {amount} likes! You only have {user.likes_balance}. Buy more likes.')
             return redirect('payments:packages')
 
-        # Create like and notification concurrently
-        like = await create_like_and_notification(request.user, target_user, amount)
-
-        # Balance deduction is handled in the Like model save() method
+        try:
+            like = await create_like_and_notification(user, target_user, amount)
+        except InsufficientBalance:
+            messages.error(request, f'You need {amount} likes! Buy more likes.')
+            return redirect('payments:packages')
 
         # For now, just show like success message
         amount_text = f"{amount} Like{'s' if amount > 1 else ''}"
@@ -83,6 +88,38 @@ async def give_like(request, user_id):
 
     return redirect('profiles:discover')
 
+@login_required
+@require_POST
+def give_likes_batch(request):
+    """
+    Apply a list of likes/unlikes in one request. Expects a JSON body
+    {"actions": [{"user_id": 5, "amount": 2, "action": "like"}, ...]}
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+        actions = parse_actions(request.user, payload.get('actions') if isinstance(payload, dict) else None)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    try:
+        results = apply_like_batch(request.user, actions)
+    except InsufficientBalance:
+        # The balance loaded with the request may be stale; report the current one
+        request.user.refresh_from_db(fields=['likes_balance'])
+        return JsonResponse({
+            'success': False,
+            'error': f'Insufficient likes. You have {request.user.likes_balance} likes available.'
+        }, status=400)
+
+    # Refresh user to get updated balance
+    request.user.refresh_from_db(fields=['likes_balance'])
+
+    return JsonResponse({
+        'success': True,
+        'new_balance': request.user.likes_balance,
+        'results': results,
+    })
+
 class MyLikesView(LoginRequiredMixin, ListView):
     template_name = 'likes/my_likes.html'
     context_object_name = 'likes'
@@ -100,82 +137,65 @@ class MyLikesView(LoginRequiredMixin, ListView):
 #             Q(user1=self.request.user) | Q(user2=self.request.user)
 #         ).select_related('user1__profile', 'user2__profile')
 
+@sync_to_async
+@transaction.atomic
+def process_unlike(from_user, target_user, amount):
+    """Charge the unlike, notify the receiver and drop any likes between the users, in one transaction"""
+    # Check if user has already unliked this person
+    existing_unlike = Unlike.objects.filter(
+        from_user=from_user,
+        to_user=target_user
+    ).first()
+
+    if existing_unlike:
+        # Add to the existing unlike (charged like a new one)
+        existing_unlike.add_amount(amount)
+        action, total_amount = 'updated', existing_unlike.amount
+    else:
+        # Create new unlike
+        Unlike.objects.create(
+            from_user=from_user,
+            to_user=target_user,
+            amount=amount
+        )
+        action, total_amount = 'created', amount
+
+    # Create notification for the user who received the unlike
+    amount_text = f"{amount} dislike{'s' if amount > 1 else ''}"
+    Notification.objects.create(
+        sender=from_user,
+        receiver=target_user,
+        notification_type='unlike_received',
+        message=f"{from_user.username} sent you {amount_text}.",
+        status='read'
+    )
+
+    # Remove any existing likes between these users
+    Like.objects.filter(
+        from_user=from_user,
+        to_user=target_user
+    ).delete()
+    return action, total_amount
+
+
 @login_required
 async def give_unlike(request, user_id):
-    """Async version of give_unlike for better performance"""
+    """Unlike a user: async ORM reads and a single sync block for the writes, as in give_like"""
     if request.method == 'POST':
-        # Async database operations
-        @sync_to_async
-        def get_target_user(user_id):
-            return get_object_or_404(User, id=user_id)
-
-        @sync_to_async
-        def get_user_balance(user):
-            # Refresh from database to get latest balance
-            user.refresh_from_db()
-            return user.likes_balance
-
-        @sync_to_async
-        def process_unlike(from_user, target_user, amount):
-            # Check if user has already unliked this person
-            existing_unlike = Unlike.objects.filter(
-                from_user=from_user,
-                to_user=target_user
-            ).first()
-
-            if existing_unlike:
-                # Update the existing unlike amount
-                existing_unlike.amount += amount
-                existing_unlike.save()
-                return 'updated', existing_unlike.amount
-            else:
-                # Create new unlike
-                Unlike.objects.create(
-                    from_user=from_user,
-                    to_user=target_user,
-                    amount=amount
-                )
-                return 'created', amount
-
-        @sync_to_async
-        def create_notification_and_cleanup(from_user, target_user, amount):
-            # Create notification for the user who received the unlike
-            amount_text = f"{amount} dislike{'s' if amount > 1 else ''}"
-            Notification.objects.create(
-                sender=from_user,
-                receiver=target_user,
-                notification_type='unlike_received',
-                message=f"{from_user.username} sent you {amount_text}.",
-                status='read'
-            )
-
-            # Remove any existing likes between these users
-            Like.objects.filter(
-                from_user=from_user,
-                to_user=target_user
-            ).delete()
-
-        target_user = await get_target_user(user_id)
-
-        # Get the amount from the form (default to 1 if not provided)
-        try:
-            amount = int(request.POST.get('amount', 1))
-            if amount < 1:
-                amount = 1
-        except (ValueError, TypeError):
-            amount = 1
-
-        # Check if user has enough balance (unlikes now use likes_balance) (async database access)
-        user_balance = await get_user_balance(request.user)
-        if user_balance < amount:
-            messages.error(request, f'You need {amount} in your balance! You only have {user_balance}. Buy more packages.')
-            return redirect('payments:packages')
+        user = await request.auser()
+        target_user = await aget_object_or_404(User, id=user_id)
+        amount = get_amount(request)
 
-        # Process unlike and create notification concurrently
-        action, total_amount = await process_unlike(request.user, target_user, amount)
-        await create_notification_and_cleanup(request.user, target_user, amount)
+        # Unlikes use the same likes_balance; Unlike.save()/add_amount() deduct it atomically
+        if user.likes_balance < amount:
+            messages.error(request, f'You need {amount} in your balance! You only have {user.likes_balance}. Buy more packages.')
+            return redirect('payments:packages')
 
-        # Balance deduction is handled in the Unlike model save() method
+        try:
+            action, total_amount = await process_unlike(user, target_user, amount)
+        except InsufficientBalance:
+            messages.error(request, f'You need {amount} in your balance! Buy more packages.')
+            return redirect('payments:packages')
 
         amount_text = f"{amount} unlike{'s' if amount > 1 else ''}"
         if action == 'updated':
@@ -185,4 +205,4 @@ async def give_unlike(request, user_id):
 
         return redirect('profiles:discover')
 
-    return redirect('profiles:discover')
\ No newline at end of file
+    return redirect('profiles:discover')
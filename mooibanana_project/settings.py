@@ -299,6 +299,9 @@ STORAGES = {
 # Fallback for older Django versions
 DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
+# Background threads rendering image size variants (0 = process inline after commit)
+IMAGE_PIPELINE_WORKERS = config('IMAGE_PIPELINE_WORKERS', default=2, cast=int)
+
 # AWS CloudWatch Configuration (Optional)
 AWS_CLOUDWATCH_ENABLED = config('AWS_CLOUDWATCH_ENABLED', default=False, cast=bool)
 AWS_REGION_NAME = config('AWS_REGION_NAME', default='us-east-1')
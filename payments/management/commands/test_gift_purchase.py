@@ -1,7 +1,8 @@
 # payments/management/commands/test_gift_purchase.py
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from payments.models import LikePackage, Purchase
+from accounts.ledger import adjust_balances
+from payments.models import Package, Purchase
 from django.utils import timezone
 
 User = get_user_model()
@@ -17,7 +18,7 @@ class Command(BaseCommand):
         try:
             buyer = User.objects.get(email=options['buyer_email'])
             recipient = User.objects.get(email=options['recipient_email'])
-            package = LikePackage.objects.first()
+            package = Package.objects.first()
             
             if not package:
                 self.stdout.write(self.style.ERROR('No packages found'))
@@ -29,13 +30,13 @@ class Command(BaseCommand):
 
         # Record initial balances
         buyer_initial_likes = buyer.likes_balance
-        buyer_initial_super = buyer.super_likes_balance
+        buyer_initial_points = buyer.points_balance
         recipient_initial_likes = recipient.likes_balance
-        recipient_initial_super = recipient.super_likes_balance
+        recipient_initial_points = recipient.points_balance
         
         self.stdout.write(f'Initial balances:')
-        self.stdout.write(f'Buyer ({buyer.username}): {buyer_initial_likes} likes, {buyer_initial_super} super likes')
-        self.stdout.write(f'Recipient ({recipient.username}): {recipient_initial_likes} likes, {recipient_initial_super} super likes')
+        self.stdout.write(f'Buyer ({buyer.username}): {buyer_initial_likes} likes, {buyer_initial_points} points')
+        self.stdout.write(f'Recipient ({recipient.username}): {recipient_initial_likes} likes, {recipient_initial_points} points')
         
         # Simulate gift purchase completion
         purchase = Purchase.objects.create(
@@ -47,19 +48,17 @@ class Command(BaseCommand):
             paystack_reference=f'test_gift_{buyer.id}_{recipient.id}'
         )
         
-        # Simulate the gift logic
-        recipient.likes_balance += package.regular_likes
-        recipient.save()
+        # Simulate the gift logic (as in the payment views): likes to the recipient, points to the buyer
+        adjust_balances(recipient, 'gift', likes=package.likes_count)
+        if package.points_reward > 0:
+            adjust_balances(buyer, 'purchase', points=package.points_reward)
         
-        buyer.super_likes_balance += package.super_likes
-        buyer.save()
-        
-        # Refresh from database
-        buyer.refresh_from_db()
-        recipient.refresh_from_db()
+        # Reload, so the balances are read back from the database and the ledger
+        buyer = User.objects.get(pk=buyer.pk)
+        recipient = User.objects.get(pk=recipient.pk)
         
         self.stdout.write(f'\nAfter gift purchase of {package.name}:')
-        self.stdout.write(f'Buyer ({buyer.username}): {buyer.likes_balance} likes (+{buyer.likes_balance - buyer_initial_likes}), {buyer.super_likes_balance} super likes (+{buyer.super_likes_balance - buyer_initial_super})')
-        self.stdout.write(f'Recipient ({recipient.username}): {recipient.likes_balance} likes (+{recipient.likes_balance - recipient_initial_likes}), {recipient.super_likes_balance} super likes (+{recipient.super_likes_balance - recipient_initial_super})')
+        self.stdout.write(f'Buyer ({buyer.username}): {buyer.likes_balance} likes (+{buyer.likes_balance - buyer_initial_likes}), {buyer.points_balance} points (+{buyer.points_balance - buyer_initial_points})')
+        self.stdout.write(f'Recipient ({recipient.username}): {recipient.likes_balance} likes (+{recipient.likes_balance - recipient_initial_likes}), {recipient.points_balance} points (+{recipient.points_balance - recipient_initial_points})')
         
         self.stdout.write(self.style.SUCCESS('\nGift purchase test completed!'))
@@ -15,6 +15,7 @@ from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from .models import Package, Purchase
+from accounts.ledger import adjust_balances
 import hashlib
 import hmac
 
@@ -505,17 +506,13 @@ def paystack_callback(request):
                                 package = purchase.package
 
                                 # Give likes to recipient (all packages now use likes_balance)
-                                old_balance = recipient.likes_balance
-                                recipient.likes_balance += package.likes_count
-                                recipient.save()
-                                logger.info(f"Gift likes credited - Recipient: {recipient.id}, Amount: {package.likes_count}, OldBalance: {old_balance}, NewBalance: {recipient.likes_balance}")
+                                adjust_balances(recipient, 'gift', likes=package.likes_count)
+                                logger.info(f"Gift likes credited - Recipient: {recipient.id}, Amount: {package.likes_count}, NewBalance: {recipient.likes_balance}")
 
                                 # Award points to buyer (not recipient)
                                 if package.points_reward > 0:
-                                    old_points = purchase.user.points_balance
-                                    purchase.user.points_balance += package.points_reward
-                                    purchase.user.save()
-                                    logger.info(f"Points awarded to buyer - User: {purchase.user.id}, Points: {package.points_reward}, OldPoints: {old_points}, NewPoints: {purchase.user.points_balance}")
+                                    adjust_balances(purchase.user, 'purchase', points=package.points_reward)
+                                    logger.info(f"Points awarded to buyer - User: {purchase.user.id}, Points: {package.points_reward}, NewPoints: {purchase.user.points_balance}")
 
                                 # Create notification
                                 if Notification:
@@ -542,18 +539,12 @@ def paystack_callback(request):
                             # Regular purchase - add to buyer (all packages now add to likes_balance)
                             package = purchase.package
 
-                            old_balance = purchase.user.likes_balance
-                            purchase.user.likes_balance += package.likes_count
-
-                            # Award points to buyer
+                            # Add likes and award points to buyer
+                            adjust_balances(purchase.user, 'purchase', likes=package.likes_count, points=package.points_reward)
                             if package.points_reward > 0:
-                                old_points = purchase.user.points_balance
-                                purchase.user.points_balance += package.points_reward
-                                logger.info(f"Points awarded - User: {purchase.user.id}, Points: {package.points_reward}, OldPoints: {old_points}, NewPoints: {purchase.user.points_balance}")
-
-                            purchase.user.save()
+                                logger.info(f"Points awarded - User: {purchase.user.id}, Points: {package.points_reward}, NewPoints: {purchase.user.points_balance}")
 
-                            logger.info(f"Likes balance updated - User: {purchase.user.id}, Amount: {package.likes_count}, OldBalance: {old_balance}, NewBalance: {purchase.user.likes_balance}")
+                            logger.info(f"Likes balance updated - User: {purchase.user.id}, Amount: {package.likes_count}, NewBalance: {purchase.user.likes_balance}")
                             logger.info(f"Purchase transaction completed - Purchase: {purchase.id}, User: {purchase.user.id}, Package: {package.id}")
 
                             # Create success message
@@ -622,17 +613,13 @@ def stripe_success(request):
                             package = purchase.package
 
                             # Give likes to recipient (all packages now use likes_balance)
-                            old_balance = recipient.likes_balance
-                            recipient.likes_balance += package.likes_count
-                            recipient.save()
-                            logger.info(f"Stripe gift likes credited - Recipient: {recipient.id}, Amount: {package.likes_count}, OldBalance: {old_balance}, NewBalance: {recipient.likes_balance}")
+                            adjust_balances(recipient, 'gift', likes=package.likes_count)
+                            logger.info(f"Stripe gift likes credited - Recipient: {recipient.id}, Amount: {package.likes_count}, NewBalance: {recipient.likes_balance}")
 
                             # Award points to buyer (not recipient)
                             if package.points_reward > 0:
-                                old_points = purchase.user.points_balance
-                                purchase.user.points_balance += package.points_reward
-                                purchase.user.save()
-                                logger.info(f"Points awarded to buyer - User: {purchase.user.id}, Points: {package.points_reward}, OldPoints: {old_points}, NewPoints: {purchase.user.points_balance}")
+                                adjust_balances(purchase.user, 'purchase', points=package.points_reward)
+                                logger.info(f"Points awarded to buyer - User: {purchase.user.id}, Points: {package.points_reward}, NewPoints: {purchase.user.points_balance}")
 
                             if Notification:
                                 notification = Notification.objects.create(
@@ -657,18 +644,12 @@ def stripe_success(request):
                         # Regular purchase - add to buyer (all packages now add to likes_balance)
                         package = purchase.package
 
-                        old_balance = purchase.user.likes_balance
-                        purchase.user.likes_balance += package.likes_count
-
-                        # Award points to buyer
+                        # Add likes and award points to buyer
+                        adjust_balances(purchase.user, 'purchase', likes=package.likes_count, points=package.points_reward)
                         if package.points_reward > 0:
-                            old_points = purchase.user.points_balance
-                            purchase.user.points_balance += package.points_reward
-                            logger.info(f"Points awarded - User: {purchase.user.id}, Points: {package.points_reward}, OldPoints: {old_points}, NewPoints: {purchase.user.points_balance}")
+                            logger.info(f"Points awarded - User: {purchase.user.id}, Points: {package.points_reward}, NewPoints: {purchase.user.points_balance}")
 
-                        purchase.user.save()
-
-                        logger.info(f"Stripe likes balance updated - User: {purchase.user.id}, Amount: {package.likes_count}, OldBalance: {old_balance}, NewBalance: {purchase.user.likes_balance}")
+                        logger.info(f"Stripe likes balance updated - User: {purchase.user.id}, Amount: {package.likes_count}, NewBalance: {purchase.user.likes_balance}")
                         logger.info(f"Stripe purchase transaction completed - Purchase: {purchase.id}, User: {purchase.user.id}, Package: {package.id}")
 
                         points_msg = f' and {package.points_reward} points' if package.points_reward > 0 else ''
@@ -750,16 +731,12 @@ def paystack_webhook(request):
                             recipient = User.objects.get(id=metadata['recipient_id'])
 
                             # Give likes to recipient (all packages now use likes_balance)
-                            old_balance = recipient.likes_balance
-                            recipient.likes_balance += purchase.package.likes_count
-                            recipient.save()
-                            logger.info(f"Webhook gift likes credited - Recipient: {recipient.id}, Amount: {purchase.package.likes_count}, OldBalance: {old_balance}, NewBalance: {recipient.likes_balance}")
+                            adjust_balances(recipient, 'gift', likes=purchase.package.likes_count)
+                            logger.info(f"Webhook gift likes credited - Recipient: {recipient.id}, Amount: {purchase.package.likes_count}, NewBalance: {recipient.likes_balance}")
 
                             # Award points to buyer (not recipient)
                             if purchase.package.points_reward > 0:
-                                old_points = purchase.user.points_balance
-                                purchase.user.points_balance += purchase.package.points_reward
-                                purchase.user.save()
+                                adjust_balances(purchase.user, 'purchase', points=purchase.package.points_reward)
                                 logger.info(f"Webhook points awarded to buyer - User: {purchase.user.id}, Points: {purchase.package.points_reward}")
 
                             # Create notification for recipient about the gift
@@ -775,18 +752,12 @@ def paystack_webhook(request):
                             logger.error(f"Webhook gift recipient not found - Purchase: {purchase.id}, RecipientID: {metadata.get('recipient_id')}")
                     else:
                         # Regular purchase - all packages now add to likes_balance
-                        old_balance = purchase.user.likes_balance
-                        purchase.user.likes_balance += purchase.package.likes_count
-
-                        # Award points to buyer
+                        # Add likes and award points to buyer
+                        adjust_balances(purchase.user, 'purchase', likes=purchase.package.likes_count, points=purchase.package.points_reward)
                         if purchase.package.points_reward > 0:
-                            old_points = purchase.user.points_balance
-                            purchase.user.points_balance += purchase.package.points_reward
                             logger.info(f"Webhook points awarded - User: {purchase.user.id}, Points: {purchase.package.points_reward}")
 
-                        purchase.user.save()
-
-                        logger.info(f"Webhook likes balance updated - User: {purchase.user.id}, Amount: {purchase.package.likes_count}, OldBalance: {old_balance}, NewBalance: {purchase.user.likes_balance}")
+                        logger.info(f"Webhook likes balance updated - User: {purchase.user.id}, Amount: {purchase.package.likes_count}, NewBalance: {purchase.user.likes_balance}")
                         logger.info(f"Webhook purchase transaction completed - Purchase: {purchase.id}")
                 else:
                     logger.info(f"Paystack webhook - Purchase already completed: {purchase.id}")
@@ -235,6 +235,26 @@ class ImageOptimizer:
         except Exception as e:
             print(f"Error optimizing image {image_path}: {e}")
 
+    @staticmethod
+    def optimize_image_bytes(data, max_size=(1080, 1080), quality=85):
+        """
+        Return an optimized JPEG copy of encoded image data (storage-agnostic,
+        so it works for Cloudinary files that have no local path)
+        """
+        from io import BytesIO
+        from PIL import Image, ImageOps
+
+        with Image.open(BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
+                img.thumbnail(max_size, Image.Resampling.LANCZOS)
+
+            output = BytesIO()
+            img.save(output, 'JPEG', quality=quality, optimize=True)
+            return output.getvalue()
+
 
 class PerformanceMonitor:
     """
@@ -285,8 +305,12 @@ class CacheManager:
         """
         Invalidate all cache entries for a specific user
         """
+        from profiles.discover import discover_actions_version_key
+        from profiles.versions import next_version
+
+        # Discover actions live under versioned keys; moving the version retires them
+        next_version(discover_actions_version_key(user_id))
         cache_keys = [
-            f'user_likes_{user_id}',
             f'user_matches_{user_id}',
             f'user_requests_{user_id}',
             f'user_notifications_{user_id}',
@@ -334,7 +358,7 @@ PERFORMANCE OPTIMIZATION GUIDELINES:
    - Avoid blocking operations in the main thread
    - Use sync_to_async for database operations in async views
    - Examples:
-     * Distance calculations: Use calculate_distance_concurrent()
+     * Distance calculations: Use profiles.geo.ids_within_distance() (vectorized)
      * Bulk notifications: Use ConcurrentProcessor.process_bulk_notifications()
      * Async views: Decorated with @login_required async def view(request)
 
@@ -357,7 +381,7 @@ PERFORMANCE OPTIMIZATION GUIDELINES:
    - Use Django Debug Toolbar in development
 
 7. IMPLEMENTED OPTIMIZATIONS:
-   - ✓ Concurrent distance calculations in DiscoverView
+   - ✓ Vectorized distance calculations in DiscoverView
    - ✓ Async like/unlike operations
    - ✓ Async notification retrieval
    - ✓ ThreadPoolExecutor for batch processing
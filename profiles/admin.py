@@ -1,7 +1,7 @@
 
 # profiles/admin.py
 from django.contrib import admin
-from .models import Profile, ProfilePhoto
+from .models import Interest, Profile, ProfilePhoto
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
@@ -9,6 +9,11 @@ class ProfileAdmin(admin.ModelAdmin):
     list_filter = ['study_field', 'study_year', 'is_complete']
     search_fields = ['user__username', 'user__email', 'bio']
 
+@admin.register(Interest)
+class InterestAdmin(admin.ModelAdmin):
+    list_display = ['name']
+    search_fields = ['name']
+
 @admin.register(ProfilePhoto)
 class ProfilePhotoAdmin(admin.ModelAdmin):
     list_display = ['profile', 'uploaded_at']
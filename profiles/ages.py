@@ -0,0 +1,74 @@
+# profiles/ages.py
+"""
+Age filtering and age buckets from exact calendar birth-date bounds.
+
+Ages are never computed per row. A range of ages maps to a range of birth
+dates (someone is at least n years old if they were born on or before the
+same calendar day n years ago), so filters become index range scans on
+Profile.birth_date and a histogram becomes one grouped query.
+"""
+from datetime import date
+
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+# (label, youngest age, oldest age or None for open-ended)
+AGE_BUCKETS = [
+    ('18-22', 18, 22),
+    ('23-27', 23, 27),
+    ('28-32', 28, 32),
+    ('33+', 33, None),
+]
+
+
+def years_before(day, years):
+    """The same calendar day `years` earlier (29 February falls back to the 28th)"""
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        return day.replace(year=day.year - years, day=28)
+
+
+def birth_date_bounds(min_age=None, max_age=None, today=None):
+    """
+    Return (earliest, latest) birth dates, both inclusive, for people whose
+    age is between min_age and max_age today. Either bound is None if open.
+    """
+    today = today or date.today()
+    latest = years_before(today, min_age) if min_age is not None else None
+    earliest = None
+    if max_age is not None:
+        # Born the day after the (max_age + 1)th birthday cutoff at the earliest
+        earliest = date.fromordinal(years_before(today, max_age + 1).toordinal() + 1)
+    return earliest, latest
+
+
+def age_q(min_age=None, max_age=None, field='birth_date', today=None):
+    """Filter for ages between min_age and max_age (inclusive)"""
+    earliest, latest = birth_date_bounds(min_age, max_age, today)
+    query = Q()
+    if earliest is not None:
+        query &= Q(**{f'{field}__gte': earliest})
+    if latest is not None:
+        query &= Q(**{f'{field}__lte': latest})
+    return query
+
+
+def age_bucket_case(field='birth_date', today=None):
+    """Expression labelling each row with its AGE_BUCKETS label (None if outside every bucket)"""
+    return Case(
+        *[When(age_q(youngest, oldest, field, today), then=Value(label))
+          for label, youngest, oldest in AGE_BUCKETS],
+        default=None,
+        output_field=CharField(),
+    )
+
+
+def age_bucket_counts(queryset, field='birth_date', today=None):
+    """Return {bucket label: count} for a queryset in a single grouped query"""
+    counts = dict.fromkeys((label for label, _, _ in AGE_BUCKETS), 0)
+    rows = queryset.filter(**{f'{field}__isnull': False}).annotate(
+        age_bucket=age_bucket_case(field, today)
+    ).exclude(age_bucket=None).order_by().values('age_bucket').annotate(count=Count('pk'))
+    for row in rows:
+        counts[row['age_bucket']] = row['count']
+    return counts
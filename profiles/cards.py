@@ -0,0 +1,79 @@
+# profiles/cards.py
+"""
+Cached profile cards for discover.
+
+A card is the plain dict a discover grid cell (or the JSON feed) needs for
+one profile: names, study details, interests and photo URLs. Cards are
+cached per profile, dropped whenever the profile, its photos or its user
+change, and read for a whole page with one get_many, so rendering a page
+does not re-derive anything or query photos per card.
+
+CARD_VERSION is part of the key; bump it whenever the card layout changes.
+"""
+from datetime import date
+
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+
+CARD_VERSION = 2
+PROFILE_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def profile_card_cache_key(profile_id):
+    return f'profile_card_v{CARD_VERSION}_{profile_id}'
+
+
+def invalidate_profile_card(profile_id):
+    cache.delete(profile_card_cache_key(profile_id))
+
+
+def build_profile_card(profile):
+    photos = profile.get_all_photos()
+    return {
+        'id': profile.id,
+        'user': {'id': profile.user_id, 'username': profile.user.username},
+        'birth_date': profile.birth_date,
+        'bio': profile.bio,
+        'study_field': profile.study_field,
+        'study_field_display': profile.get_study_field_display(),
+        'study_year': profile.study_year,
+        'school_name': profile.school_name,
+        'city': profile.city,
+        'latitude': profile.latitude,
+        'longitude': profile.longitude,
+        'interests': profile.get_interests_list(),
+        'photos': photos,
+        'primary_photo': photos[0]['url'] if photos else None,
+        'primary_photo_variants': photos[0]['variants'] if photos else {},
+    }
+
+
+def _age(birth_date, today):
+    if not birth_date:
+        return None
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+
+def get_profile_cards(profiles):
+    """
+    Return cards for profiles in the same order, building and caching only
+    the ones that are missing. Age is filled in at read time so cards never
+    go stale on birthdays.
+    """
+    keys = {profile.id: profile_card_cache_key(profile.id) for profile in profiles}
+    cached = cache.get_many(keys.values())
+
+    missing = [profile for profile in profiles if keys[profile.id] not in cached]
+    if missing:
+        prefetch_related_objects(missing, 'photos')
+        built = {keys[profile.id]: build_profile_card(profile) for profile in missing}
+        cache.set_many(built, PROFILE_CARD_CACHE_TIMEOUT)
+        cached.update(built)
+
+    today = date.today()
+    cards = []
+    for profile in profiles:
+        card = dict(cached[keys[profile.id]])
+        card['age'] = _age(card['birth_date'], today)
+        cards.append(card)
+    return cards
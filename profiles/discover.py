@@ -0,0 +1,392 @@
+# profiles/discover.py
+"""
+Helpers for paging through discover results in a stable shuffled order.
+
+Every profile carries a fixed random_key. A per-session seed picks a starting
+point on that ring, and pages walk random_key upwards from the seed, wrapping
+around to the beginning once. Pages are fetched with keyset conditions on
+(random_key, id), so every page costs the same index range scan and no profile
+repeats within a session.
+
+The same module keeps a cached per-user record of who the user has already
+acted on (unliked, liked, followed), so a discover request reads one cache
+entry instead of three queries.
+
+Unfiltered discover pages are sliced from a cached per-user candidate pool:
+the (random_key, id, user_id) of every complete profile the user has not
+unliked, sorted in ring order. Profiles joining or leaving discover
+(completing their profile, being deleted) are numbered from a shared
+counter and stored one change per key; each pool replays the changes after
+the one it has seen on its next read, so no pool has to be thrown away when
+someone new signs up.
+
+A change never reads, modifies and writes back a cached value in place.
+Each user's actions and pool live under a versioned key (profiles/versions.py)
+that a change moves on once its transaction commits, so concurrent changes
+cannot overwrite each other and a rolled-back change never touches the
+cache.
+
+The record_* functions are called from the Like, Unlike, Follow and Profile
+signal handlers. Writes that skip those signals (bulk_create, queryset
+update()) have to call them by hand, as likes/batch.py does.
+"""
+import base64
+import json
+import random
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from .versions import current_version, next_version, patch_versioned
+
+DISCOVER_SEED_SESSION_KEY = 'discover_seed'
+
+# Patched incrementally, so it can live much longer than the usual 5 minutes
+DISCOVER_ACTIONS_CACHE_TIMEOUT = 60 * 60
+
+DISCOVER_POOL_CACHE_TIMEOUT = 60 * 60
+DISCOVER_POOL_SEQ_KEY = 'discover_pool_seq'
+
+# Pools that have fallen further behind than this many changes are rebuilt instead of replayed
+DISCOVER_POOL_LOG_LIMIT = 500
+
+
+def get_discover_seed(request, reshuffle=False):
+    """Return this session's shuffle seed, creating (or replacing) it if needed"""
+    seed = request.session.get(DISCOVER_SEED_SESSION_KEY)
+    if seed is None or reshuffle:
+        seed = random.random()
+        request.session[DISCOVER_SEED_SESSION_KEY] = seed
+    return seed
+
+
+def encode_cursor(phase, random_key, profile_id):
+    """Pack a keyset position into an opaque URL-safe token"""
+    raw = json.dumps([phase, random_key, profile_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Unpack a cursor token, returning None if it is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        phase, random_key, profile_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(phase), float(random_key), int(profile_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def _after(random_key, profile_id):
+    return Q(random_key__gt=random_key) | Q(random_key=random_key, id__gt=profile_id)
+
+
+def shuffled_page(queryset, seed, cursor, page_size):
+    """
+    Return (profiles, next_cursor) for one page of queryset in seeded order.
+
+    Phase 0 covers random_key >= seed, phase 1 wraps around to random_key < seed.
+    next_cursor is None once both phases are exhausted.
+    """
+    position = decode_cursor(cursor)
+    phase = position[0] if position else 0
+    ordered = queryset.order_by('random_key', 'id')
+
+    profiles = []
+    for current_phase in (0, 1):
+        if current_phase < phase:
+            continue
+
+        if current_phase == 0:
+            page_qs = ordered.filter(random_key__gte=seed)
+        else:
+            page_qs = ordered.filter(random_key__lt=seed)
+
+        if position and current_phase == phase:
+            page_qs = page_qs.filter(_after(position[1], position[2]))
+
+        # One extra row tells us whether there is a next page
+        wanted = page_size + 1 - len(profiles)
+        profiles.extend((current_phase, profile) for profile in page_qs[:wanted])
+        if len(profiles) > page_size:
+            break
+
+    has_next = len(profiles) > page_size
+    profiles = profiles[:page_size]
+
+    next_cursor = None
+    if has_next and profiles:
+        last_phase, last_profile = profiles[-1]
+        next_cursor = encode_cursor(last_phase, last_profile.random_key, last_profile.id)
+
+    return [profile for _, profile in profiles], next_cursor
+
+
+def discover_actions_version_key(user_id):
+    return f'discover_actions_version_{user_id}'
+
+
+def discover_actions_cache_key(user_id, version):
+    return f'discover_actions_{user_id}_{version}'
+
+
+def _id_array(ids):
+    """Compact sorted array of user ids (supports `in` and bisect lookups)"""
+    return array('q', sorted(set(ids)))
+
+
+def get_discover_actions(user_id):
+    """
+    Return what a user has already acted on, from cache when possible:
+
+        {'unliked': array of user ids,
+         'likes': {user id: number of likes given},
+         'following': array of user ids}
+    """
+    # Read the version before the database, so a change committing meanwhile
+    # moves readers on to a newer version instead of being lost
+    version = current_version(discover_actions_version_key(user_id))
+    key = discover_actions_cache_key(user_id, version)
+    actions = cache.get(key)
+    if actions is None:
+        from likes.models import LikePair, Unlike
+        from social.models import Follow
+
+        likes_given = LikePair.objects.filter(from_user_id=user_id).values_list('to_user_id', 'like_count')
+        actions = {
+            'unliked': _id_array(
+                Unlike.objects.filter(from_user_id=user_id).values_list('to_user_id', flat=True)
+            ),
+            'likes': dict(likes_given),
+            'following': _id_array(
+                Follow.objects.filter(follower_id=user_id).values_list('following_id', flat=True)
+            ),
+        }
+        cache.add(key, actions, DISCOVER_ACTIONS_CACHE_TIMEOUT)
+    return actions
+
+
+def _patch_discover_actions(user_id, patch):
+    patch_versioned(
+        discover_actions_version_key(user_id),
+        lambda version: discover_actions_cache_key(user_id, version),
+        DISCOVER_ACTIONS_CACHE_TIMEOUT,
+        patch,
+    )
+
+
+def _add_id(ids, user_id):
+    index = bisect_left(ids, user_id)
+    if index == len(ids) or ids[index] != user_id:
+        insort(ids, user_id)
+
+
+def _remove_id(ids, user_id):
+    index = bisect_left(ids, user_id)
+    if index < len(ids) and ids[index] == user_id:
+        del ids[index]
+
+
+def record_unlike(from_user_id, to_user_id, unliked=True):
+    """Update from_user's cached actions and pool once the unlike (or its removal) commits"""
+    def patch(actions):
+        if unliked:
+            _add_id(actions['unliked'], to_user_id)
+        else:
+            _remove_id(actions['unliked'], to_user_id)
+
+    def apply():
+        _patch_discover_actions(from_user_id, patch)
+        if unliked:
+            _patch_candidate_pool(from_user_id, lambda entries: _remove_user(entries, to_user_id))
+        else:
+            _patch_candidate_pool(from_user_id, lambda entries: _restore_user(entries, to_user_id))
+
+    transaction.on_commit(apply)
+
+
+def record_like(from_user_id, to_user_id, delta=1):
+    """Update from_user's cached like counts once the like (or its removal) commits"""
+    def patch(actions):
+        count = actions['likes'].get(to_user_id, 0) + delta
+        if count > 0:
+            actions['likes'][to_user_id] = count
+        else:
+            actions['likes'].pop(to_user_id, None)
+
+    transaction.on_commit(lambda: _patch_discover_actions(from_user_id, patch))
+
+
+def record_follow(follower_id, following_id, following=True):
+    """Update the follower's cached actions once the follow (or unfollow) commits"""
+    def patch(actions):
+        if following:
+            _add_id(actions['following'], following_id)
+        else:
+            _remove_id(actions['following'], following_id)
+
+    transaction.on_commit(lambda: _patch_discover_actions(follower_id, patch))
+
+
+def discover_pool_version_key(user_id):
+    return f'discover_pool_version_{user_id}'
+
+
+def discover_pool_cache_key(user_id, version):
+    return f'discover_pool_{user_id}_{version}'
+
+
+def discover_pool_change_key(seq):
+    return f'discover_pool_change_{seq}'
+
+
+def record_pool_change(profile_id, user_id, random_key, available):
+    """
+    Once the current transaction commits, log that a profile joined
+    (available=True) or left discover for everyone
+    """
+    def apply():
+        seq = next_version(DISCOVER_POOL_SEQ_KEY)
+        cache.set(
+            discover_pool_change_key(seq),
+            (available, (random_key, profile_id, user_id)),
+            DISCOVER_POOL_CACHE_TIMEOUT,
+        )
+
+    transaction.on_commit(apply)
+
+
+def _add_entry(entries, entry):
+    index = bisect_left(entries, entry)
+    if index == len(entries) or entries[index] != entry:
+        entries.insert(index, entry)
+
+
+def _remove_entry(entries, entry):
+    index = bisect_left(entries, entry)
+    if index < len(entries) and entries[index] == entry:
+        del entries[index]
+
+
+def _remove_user(entries, user_id):
+    for index, entry in enumerate(entries):
+        if entry[2] == user_id:
+            del entries[index]
+            return
+
+
+def _restore_user(entries, user_id):
+    from .models import Profile
+
+    entry = Profile.objects.filter(
+        user_id=user_id, is_complete=True
+    ).values_list('random_key', 'id', 'user_id').first()
+    if entry:
+        _add_entry(entries, entry)
+
+
+def _build_candidate_pool(user_id, unliked_ids):
+    from .models import Profile
+
+    return list(
+        Profile.objects.filter(
+            is_complete=True
+        ).exclude(
+            user_id=user_id
+        ).exclude(
+            user_id__in=list(unliked_ids)
+        ).order_by('random_key', 'id').values_list('random_key', 'id', 'user_id')
+    )
+
+
+def _pool_changes(after, head):
+    """The logged pool changes after seq `after` up to head, or None if any are missing"""
+    if not 0 <= head - after <= DISCOVER_POOL_LOG_LIMIT:
+        return None
+    keys = [discover_pool_change_key(seq) for seq in range(after + 1, head + 1)]
+    found = cache.get_many(keys)
+    if len(found) != len(keys):
+        return None
+    return [found[key] for key in keys]
+
+
+def get_candidate_pool(user_id, unliked_ids):
+    """
+    Return the sorted (random_key, profile id, user id) entries a user can be
+    shown on an unfiltered discover page, replaying any pool changes logged
+    since the cached copy was built.
+    """
+    # Read the log position and version before the database (see get_discover_actions);
+    # replaying a change the build already saw is harmless
+    head = current_version(DISCOVER_POOL_SEQ_KEY)
+    key = discover_pool_cache_key(user_id, current_version(discover_pool_version_key(user_id)))
+    pool = cache.get(key)
+
+    changes = None if pool is None else _pool_changes(pool['seq'], head)
+    if changes is None:
+        pool = {'seq': head, 'entries': _build_candidate_pool(user_id, unliked_ids)}
+        cache.set(key, pool, DISCOVER_POOL_CACHE_TIMEOUT)
+    elif changes:
+        for available, entry in changes:
+            if entry[2] == user_id:
+                continue
+            if not available:
+                _remove_entry(pool['entries'], entry)
+            elif not _contains(unliked_ids, entry[2]):
+                _add_entry(pool['entries'], entry)
+        pool['seq'] = head
+        cache.set(key, pool, DISCOVER_POOL_CACHE_TIMEOUT)
+
+    return pool['entries']
+
+
+def _contains(ids, user_id):
+    index = bisect_left(ids, user_id)
+    return index < len(ids) and ids[index] == user_id
+
+
+def _patch_candidate_pool(user_id, patch):
+    """Store patch(user's pool entries) under the pool's next version, if a pool is cached"""
+    patch_versioned(
+        discover_pool_version_key(user_id),
+        lambda version: discover_pool_cache_key(user_id, version),
+        DISCOVER_POOL_CACHE_TIMEOUT,
+        lambda pool: patch(pool['entries']),
+    )
+
+
+def pool_page(entries, seed, cursor, page_size):
+    """
+    Slice one page of profile ids out of a candidate pool in seeded order.
+
+    Takes the same cursors as shuffled_page and returns (profile ids, next_cursor).
+    """
+    position = decode_cursor(cursor)
+    split = bisect_left(entries, (seed,))
+
+    picked = []
+    for phase, start, end in ((0, split, len(entries)), (1, 0, split)):
+        if position and phase < position[0]:
+            continue
+        if position and phase == position[0]:
+            start = max(start, bisect_right(entries, (position[1], position[2], float('inf'))))
+
+        # One extra entry tells us whether there is a next page
+        wanted = page_size + 1 - len(picked)
+        picked.extend((phase, entry) for entry in entries[start:min(end, start + wanted)])
+        if len(picked) > page_size:
+            break
+
+    has_next = len(picked) > page_size
+    picked = picked[:page_size]
+
+    next_cursor = None
+    if has_next and picked:
+        last_phase, (last_key, last_id, _) = picked[-1]
+        next_cursor = encode_cursor(last_phase, last_key, last_id)
+
+    return [entry[1] for _, entry in picked], next_cursor
@@ -0,0 +1,139 @@
+# profiles/facets.py
+"""
+Facet counts for the discover filter form.
+
+count_facets() counts the profiles of a queryset per study field, city,
+school and age bucket with one grouped query; discover uses it on the
+filtered results, so the counts shown are the ones the active filters
+leave.
+
+With no filters, the counts cover every complete profile and come from a
+cached facet index instead. The index is patched whenever a profile is
+saved or deleted, so unfiltered discover requests cost a single cache read.
+The patch is applied once the saving transaction commits, under the next
+version of the index (profiles/versions.py), so concurrent saves cannot
+overwrite each other's counts.
+
+Age buckets move as birthdays pass, so the index is keyed by date and
+rebuilt once a day.
+"""
+from datetime import date
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .ages import AGE_BUCKETS, age_bucket_case, birth_date_bounds
+from .versions import current_version, next_version, patch_versioned
+
+FACET_FIELDS = ('study_field', 'city', 'school_name', 'birth_date')
+
+FACET_INDEX_CACHE_TIMEOUT = 60 * 60 * 24
+FACET_INDEX_VERSION_KEY = 'discover_facets_version'
+
+# Stands in for facet values that were deferred when the profile was loaded
+UNKNOWN = object()
+
+
+def facet_index_cache_key(version, today=None):
+    return f'discover_facets_{(today or date.today()).isoformat()}_{version}'
+
+
+def profile_facets(values):
+    """
+    Facet values for a profile's field dict, None if it is not shown in
+    discover, or UNKNOWN if some of the fields were not loaded.
+    """
+    if 'is_complete' not in values or any(field not in values for field in FACET_FIELDS):
+        return UNKNOWN
+    if not values['is_complete']:
+        return None
+    return tuple(values[field] for field in FACET_FIELDS)
+
+
+def age_bucket(birth_date, today=None):
+    """Label of the AGE_BUCKETS entry birth_date falls in, or None"""
+    if birth_date is None:
+        return None
+    for label, youngest, oldest in AGE_BUCKETS:
+        earliest, latest = birth_date_bounds(youngest, oldest, today)
+        if (earliest is None or birth_date >= earliest) and birth_date <= latest:
+            return label
+    return None
+
+
+def _empty_index():
+    return {'study_field': {}, 'city': {}, 'school_name': {}, 'age': {}}
+
+
+def _count(index, facets, delta, today=None):
+    study_field, city, school_name, birth_date = facets
+    for facet, value in (
+        ('study_field', study_field),
+        ('city', (city or '').strip()),
+        ('school_name', (school_name or '').strip()),
+        ('age', age_bucket(birth_date, today)),
+    ):
+        if not value:
+            continue
+        count = index[facet].get(value, 0) + delta
+        if count > 0:
+            index[facet][value] = count
+        else:
+            index[facet].pop(value, None)
+
+
+def count_facets(queryset, today=None):
+    """Count the profiles in queryset per facet value with one grouped query"""
+    index = _empty_index()
+    rows = queryset.annotate(
+        age_bucket=age_bucket_case(today=today)
+    ).order_by().values('study_field', 'city', 'school_name', 'age_bucket').annotate(count=Count('pk'))
+
+    for row in rows:
+        for facet, value in (
+            ('study_field', row['study_field']),
+            ('city', (row['city'] or '').strip()),
+            ('school_name', (row['school_name'] or '').strip()),
+            ('age', row['age_bucket']),
+        ):
+            if value:
+                index[facet][value] = index[facet].get(value, 0) + row['count']
+    return index
+
+
+def build_facet_index(today=None):
+    """Count complete profiles per facet value with one grouped query"""
+    from .models import Profile
+    return count_facets(Profile.objects.filter(is_complete=True), today)
+
+
+def get_facet_index():
+    # Read the version before the database, so a save committing meanwhile moves readers on
+    key = facet_index_cache_key(current_version(FACET_INDEX_VERSION_KEY))
+    index = cache.get(key)
+    if index is None:
+        index = build_facet_index()
+        cache.add(key, index, FACET_INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def record_facet_change(old_facets, new_facets):
+    """Move a profile's counts from its old facet values to its new ones once the save commits"""
+    if old_facets == new_facets:
+        return
+
+    def patch(index):
+        if old_facets is not None:
+            _count(index, old_facets, -1)
+        if new_facets is not None:
+            _count(index, new_facets, 1)
+
+    def apply():
+        if old_facets is UNKNOWN or new_facets is UNKNOWN:
+            # Nothing is stored under the next version, so the next read rebuilds
+            next_version(FACET_INDEX_VERSION_KEY)
+        else:
+            patch_versioned(FACET_INDEX_VERSION_KEY, facet_index_cache_key, FACET_INDEX_CACHE_TIMEOUT, patch)
+
+    transaction.on_commit(apply)
@@ -19,6 +19,7 @@ class ProfileForm(forms.ModelForm):
 
 class ProfileSearchForm(forms.Form):
     STUDY_CHOICES = [('', 'All Studies')] + Profile.STUDY_CHOICES
+    SORT_CHOICES = [('', 'Shuffled'), ('compatibility', 'Best match')]
 
     search_query = forms.CharField(
         max_length=100,
@@ -62,6 +63,12 @@ class ProfileSearchForm(forms.Form):
         })
     )
 
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
     max_distance = forms.IntegerField(
         required=False,
         min_value=1,
@@ -0,0 +1,202 @@
+# profiles/geo.py
+"""
+Geospatial helpers for location-based discovery.
+
+Profiles store a geohash of their coordinates so radius searches can narrow
+candidates to a handful of grid cells in SQL before any exact distance math.
+"""
+import math
+
+import numpy as np
+from django.db.models import Q
+
+# Radius of earth in kilometers
+EARTH_RADIUS_KM = 6371
+
+# Precision stored on Profile.geohash (7 characters is a ~150m x 150m cell)
+GEOHASH_PRECISION = 7
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate pair as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True  # Geohash bits alternate starting with longitude
+
+    while len(geohash) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits = bits << 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits = bits << 1
+                lat_range[1] = mid
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def geohash_cell_size(precision):
+    """Return (lat_degrees, lon_degrees) covered by one cell at this precision"""
+    total_bits = 5 * precision
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lon_bits)
+
+
+def degree_deltas(latitude, radius_km):
+    """
+    Return (lat_delta, lon_delta) in degrees that bound a circle of radius_km
+    around a point at this latitude. lon_delta is None when the circle reaches
+    a pole, where every longitude is in range.
+    """
+    angular_radius = radius_km / EARTH_RADIUS_KM
+    lat_delta = math.degrees(angular_radius)
+    if abs(float(latitude)) + lat_delta >= 90.0:
+        return lat_delta, None
+    lon_delta = math.degrees(math.asin(
+        min(math.sin(angular_radius) / math.cos(math.radians(float(latitude))), 1.0)
+    ))
+    return lat_delta, lon_delta
+
+
+def bounding_box_q(latitude, longitude, radius_km, lat_field='latitude', lon_field='longitude'):
+    """
+    Build latitude/longitude range filters for the box enclosing a circle of
+    radius_km, so the database can discard far-away rows via an index range scan.
+    """
+    latitude = float(latitude)
+    longitude = float(longitude)
+    lat_delta, lon_delta = degree_deltas(latitude, radius_km)
+
+    query = Q(**{
+        f'{lat_field}__gte': max(latitude - lat_delta, -90.0),
+        f'{lat_field}__lte': min(latitude + lat_delta, 90.0),
+    })
+    if lon_delta is None:
+        return query
+
+    min_lon = longitude - lon_delta
+    max_lon = longitude + lon_delta
+    if min_lon < -180.0:
+        # Box crosses the antimeridian, split it in two
+        query &= Q(**{f'{lon_field}__gte': min_lon + 360.0}) | Q(**{f'{lon_field}__lte': max_lon})
+    elif max_lon > 180.0:
+        query &= Q(**{f'{lon_field}__gte': min_lon}) | Q(**{f'{lon_field}__lte': max_lon - 360.0})
+    else:
+        query &= Q(**{f'{lon_field}__gte': min_lon, f'{lon_field}__lte': max_lon})
+    return query
+
+
+def covering_geohashes(latitude, longitude, radius_km):
+    """
+    Return the set of geohash prefixes whose cells cover a circle of radius_km
+    around the given point, or None if the radius is too large to narrow usefully.
+
+    The precision is chosen so a single cell is at least as large as the radius,
+    which keeps the covering set to at most a 3x3 block of prefixes.
+    """
+    latitude = float(latitude)
+    longitude = float(longitude)
+
+    lat_delta, lon_delta = degree_deltas(latitude, radius_km)
+    if lon_delta is None:
+        # The circle reaches a pole, so longitude can't narrow anything
+        return None
+
+    precision = 0
+    for candidate in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lon = geohash_cell_size(candidate)
+        if cell_lat >= lat_delta and cell_lon >= lon_delta:
+            precision = candidate
+            break
+
+    if precision == 0:
+        return None
+
+    # Sample the bounding box at half-cell steps so every cell it touches is hit
+    cell_lat, cell_lon = geohash_cell_size(precision)
+    min_lat = max(latitude - lat_delta, -90.0)
+    max_lat = min(latitude + lat_delta, 90.0)
+    min_lon = longitude - lon_delta
+    max_lon = longitude + lon_delta
+
+    prefixes = set()
+    lat = min_lat
+    while True:
+        lon = min_lon
+        while True:
+            wrapped_lon = ((lon + 180.0) % 360.0) - 180.0
+            prefixes.add(encode_geohash(min(lat, 90.0 - 1e-9), wrapped_lon, precision))
+            if lon >= max_lon:
+                break
+            lon = min(lon + cell_lon / 2, max_lon)
+        if lat >= max_lat:
+            break
+        lat = min(lat + cell_lat / 2, max_lat)
+
+    return prefixes
+
+
+def haversine_distances(origin_latitude, origin_longitude, latitudes, longitudes):
+    """
+    Calculate distances in kilometers from one origin to many points.
+
+    latitudes and longitudes are equal-length sequences (floats or Decimals);
+    the whole batch is computed in a single vectorized pass.
+    """
+    lat1 = math.radians(float(origin_latitude))
+    lon1 = math.radians(float(origin_longitude))
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    lon2 = np.radians(np.asarray(longitudes, dtype=np.float64))
+
+    # Haversine formula
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    return c * EARTH_RADIUS_KM
+
+
+def ids_within_distance(origin_latitude, origin_longitude, rows, max_distance):
+    """
+    Given (id, latitude, longitude) rows, return the ids within max_distance km
+    """
+    if not rows:
+        return []
+    ids, latitudes, longitudes = zip(*rows)
+    distances = haversine_distances(origin_latitude, origin_longitude, latitudes, longitudes)
+    ids = np.asarray(ids)
+    return ids[distances <= max_distance].tolist()
+
+
+def geohash_q(prefixes, field='geohash'):
+    """Build an OR-ed startswith filter for a set of geohash prefixes"""
+    query = Q()
+    for prefix in sorted(prefixes):
+        query |= Q(**{f'{field}__startswith': prefix})
+    return query
@@ -0,0 +1,204 @@
+# profiles/images.py
+"""
+Off-request image processing.
+
+Saving a model with a new image only queues a job; a small pool of worker
+threads picks it up after the transaction commits, renders thumbnail, card
+and full size variants in WebP and JPEG through the field's storage, and
+writes their URLs to the model's <field>_variants JSON column with a single
+UPDATE (no model save, so no save side effects run again).
+
+The variant files are deleted once the image they were made from is
+replaced or deleted (delete_files_on_commit), and variants rendered for an
+image that was replaced mid-job are deleted straight away.
+
+Set IMAGE_PIPELINE_WORKERS = 0 to process images inline after commit
+instead, e.g. in tests or one-off scripts.
+"""
+import logging
+import os
+import queue
+import threading
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .cards import invalidate_profile_card
+
+logger = logging.getLogger('profiles')
+
+# Longest side in pixels for each variant (images are never upscaled)
+VARIANT_SIZES = {
+    'thumbnail': 150,
+    'card': 400,
+    'full': 1080,
+}
+
+# (file extension, PIL format)
+VARIANT_FORMATS = (
+    ('webp', 'WEBP'),
+    ('jpeg', 'JPEG'),
+)
+
+VARIANT_QUALITY = 82
+
+# Every stored image in the project, for bulk media commands:
+# (model, image field, longest side in pixels when optimizing, field holding the profile id whose card shows it)
+IMAGE_TARGETS = [
+    ('profiles.Profile', 'profile_picture', 1080, 'pk'),
+    ('profiles.ProfilePhoto', 'image', 1080, 'profile_id'),
+    ('advertisements.Advertisement', 'flyer_image', 1600, None),
+    ('rewards.Reward', 'image', 800, None),
+]
+
+_jobs = queue.Queue()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def variants_field(field_name):
+    return f'{field_name}_variants'
+
+
+def generate_variants(image, name, storage):
+    """
+    Render every size variant of an open PIL image into storage next to name.
+
+    Returns {variant: {'width', 'height', 'webp', 'jpeg', 'names'}} with
+    storage URLs and the stored file names.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    root = os.path.splitext(name)[0]
+    variants = {}
+    for variant, max_side in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+        entry = {'width': resized.width, 'height': resized.height, 'names': []}
+        for extension, image_format in VARIANT_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, image_format, quality=VARIANT_QUALITY, optimize=True)
+            saved_name = storage.save(f'{root}_{variant}.{extension}', ContentFile(buffer.getvalue()))
+            entry[extension] = storage.url(saved_name)
+            entry['names'].append(saved_name)
+        variants[variant] = entry
+    return variants
+
+
+def variant_names(name, variants):
+    """
+    Stored file names behind a <field>_variants value. Variants rendered
+    before names were recorded fall back to the names generate_variants()
+    asks storage for, next to the original name.
+    """
+    root = os.path.splitext(name)[0] if name else None
+    names = []
+    for variant, entry in variants.items():
+        if 'names' in entry:
+            names += entry['names']
+        elif root:
+            names += [f'{root}_{variant}.{extension}' for extension, _ in VARIANT_FORMATS if extension in entry]
+    return names
+
+
+def delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except (NotImplementedError, FileNotFoundError):
+            # Storage without deletes, or the file is already gone
+            pass
+
+
+def delete_files_on_commit(storage, names):
+    """Delete names from storage once the current transaction commits"""
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(lambda: delete_files(storage, names))
+
+
+def process_image(model_label, pk, field_name):
+    """Generate and store the variants for one image field of one row"""
+    model = apps.get_model(model_label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return None
+
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return None
+
+    with field_file.open('rb') as source:
+        with Image.open(source) as image:
+            image.load()
+            variants = generate_variants(image, field_file.name, field_file.storage)
+
+    # Skip the write if the image was replaced while we were working, and drop what we rendered
+    if not model.objects.filter(pk=pk, **{field_name: field_file.name}).update(
+        **{variants_field(field_name): variants}
+    ):
+        delete_files(field_file.storage, variant_names(field_file.name, variants))
+        return None
+
+    if model_label == 'profiles.Profile':
+        invalidate_profile_card(pk)
+    elif model_label == 'profiles.ProfilePhoto':
+        invalidate_profile_card(instance.profile_id)
+    return variants
+
+
+def _run_job(job):
+    try:
+        process_image(*job)
+    except Exception:
+        logger.exception('Image processing failed - Model: %s, ID: %s, Field: %s', *job)
+
+
+def _worker():
+    while True:
+        job = _jobs.get()
+        try:
+            _run_job(job)
+        finally:
+            close_old_connections()
+            _jobs.task_done()
+
+
+def _ensure_workers(count):
+    with _workers_lock:
+        while len(_workers) < count:
+            worker = threading.Thread(target=_worker, name=f'image-worker-{len(_workers)}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def enqueue_image(instance, field_name):
+    """Queue variant generation for instance's image once the current transaction commits"""
+    enqueue_image_job(instance._meta.label, instance.pk, field_name)
+
+
+def enqueue_image_job(model_label, pk, field_name):
+    """enqueue_image() for a row that has not been loaded"""
+    job = (model_label, pk, field_name)
+    workers = getattr(settings, 'IMAGE_PIPELINE_WORKERS', 2)
+
+    def submit():
+        if workers <= 0:
+            _run_job(job)
+        else:
+            _ensure_workers(workers)
+            _jobs.put(job)
+
+    transaction.on_commit(submit)
+
+
+def wait_for_images():
+    """Block until every queued image job has been processed"""
+    _jobs.join()
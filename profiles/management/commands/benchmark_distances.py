@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from profiles.geo import ids_within_distance
+from profiles.models import Profile
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-profile vs vectorized distance filtering for discover'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help='Number of candidate profiles to benchmark (default: 1000 10000 100000)',
+        )
+        parser.add_argument(
+            '--max-distance',
+            type=int,
+            default=50,
+            help='Search radius in kilometers (default: 50)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per path; the best time is reported (default: 3)',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        max_distance = options['max_distance']
+
+        # Accra, with candidates scattered across Ghana
+        origin = Profile(latitude=Decimal('5.603700'), longitude=Decimal('-0.187000'))
+
+        self.stdout.write(f'Radius: {max_distance}km, best of {options["repeat"]} runs')
+        self.stdout.write(f'{"profiles":>10} {"threaded (ms)":>15} {"vectorized (ms)":>17} {"speedup":>9}')
+
+        for size in options['sizes']:
+            profiles = [
+                Profile(
+                    id=i,
+                    latitude=Decimal(f'{rng.uniform(4.7, 11.2):.6f}'),
+                    longitude=Decimal(f'{rng.uniform(-3.3, 1.2):.6f}'),
+                )
+                for i in range(size)
+            ]
+            rows = [(p.id, p.latitude, p.longitude) for p in profiles]
+
+            threaded_time, threaded_ids = self.best_of(
+                options['repeat'], lambda: self.threaded_path(origin, profiles, max_distance)
+            )
+            vectorized_time, vectorized_ids = self.best_of(
+                options['repeat'],
+                lambda: ids_within_distance(origin.latitude, origin.longitude, rows, max_distance),
+            )
+
+            if set(threaded_ids) != set(vectorized_ids):
+                self.stdout.write(self.style.ERROR(f'Result mismatch at {size} profiles'))
+
+            self.stdout.write(
+                f'{size:>10} {threaded_time * 1000:>15.1f} {vectorized_time * 1000:>17.1f} '
+                f'{threaded_time / vectorized_time:>8.1f}x'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark completed'))
+
+    def best_of(self, repeat, func):
+        best = None
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def threaded_path(self, origin, profiles, max_distance):
+        """The previous discover implementation: one haversine call per profile in a thread pool"""
+        def calc_distance(profile):
+            distance = origin.calculate_distance_to(profile)
+            if distance is not None and distance <= max_distance:
+                return profile.id
+            return None
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            return [pid for pid in executor.map(calc_distance, profiles) if pid is not None]
@@ -0,0 +1,109 @@
+from io import BytesIO
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+
+from profiles.models import Profile, ProfilePhoto
+from profiles.photos import MAX_PHOTOS, add_profile_photos, reorder_profile_photos
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-photo vs bulk gallery upload and reorder (nothing is kept: files go to memory, rows are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--photos',
+            type=int,
+            default=MAX_PHOTOS,
+            help=f'Photos per gallery (default: {MAX_PHOTOS})',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per path; the best time is reported (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        count = options['photos']
+        image = BytesIO()
+        Image.new('RGB', (1600, 1200), (200, 120, 40)).save(image, 'JPEG', quality=90)
+        self.image_bytes = image.getvalue()
+
+        storages = {**settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'}}
+        with override_settings(STORAGES=storages):
+            operations = [
+                ('upload', None, self.per_photo_upload, self.bulk_upload),
+                ('reorder', self.gallery, self.per_photo_reorder, self.bulk_reorder),
+            ]
+            self.stdout.write(f'{count} photos, best of {options["repeat"]} runs')
+            self.stdout.write(f'{"operation":>10} {"per-photo (ms)":>15} {"queries":>8} {"bulk (ms)":>10} {"queries":>8}')
+            for name, prepare, old_path, new_path in operations:
+                old_time, old_queries = self.best_of(options['repeat'], prepare, old_path, count)
+                new_time, new_queries = self.best_of(options['repeat'], prepare, new_path, count)
+                self.stdout.write(
+                    f'{name:>10} {old_time * 1000:>15.1f} {old_queries:>8} {new_time * 1000:>10.1f} {new_queries:>8}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark completed'))
+
+    def uploads(self, count):
+        return [
+            SimpleUploadedFile(f'photo{i}.jpg', self.image_bytes, content_type='image/jpeg')
+            for i in range(count)
+        ]
+
+    def best_of(self, repeat, prepare, path, count):
+        """Run path inside a transaction that is always rolled back; time and count only the measured part"""
+        best = None
+        queries = 0
+        for _ in range(repeat):
+            try:
+                with transaction.atomic():
+                    user = get_user_model().objects.create_user(
+                        username='photo-benchmark', email='photo-benchmark@example.com'
+                    )
+                    profile = Profile.objects.create(user=user)
+                    prepared = prepare(profile, count) if prepare else None
+
+                    with CaptureQueriesContext(connection) as captured:
+                        start = time.perf_counter()
+                        path(profile, count, prepared)
+                        elapsed = time.perf_counter() - start
+                    raise Rollback
+            except Rollback:
+                pass
+            best = elapsed if best is None else min(best, elapsed)
+            queries = len(captured)
+        return best, queries
+
+    def per_photo_upload(self, profile, count, prepared):
+        """The previous upload view: one create() per photo"""
+        for i, upload in enumerate(self.uploads(count)):
+            ProfilePhoto.objects.create(profile=profile, image=upload, order=i)
+
+    def bulk_upload(self, profile, count, prepared):
+        add_profile_photos(profile, self.uploads(count))
+
+    def gallery(self, profile, count):
+        """Set up a gallery to reorder; returns its photo ids reversed"""
+        photos = add_profile_photos(profile, self.uploads(count))
+        return [photo.id for photo in reversed(photos)]
+
+    def per_photo_reorder(self, profile, count, prepared):
+        """The previous reorder view: one UPDATE per photo id"""
+        for i, photo_id in enumerate(prepared):
+            ProfilePhoto.objects.filter(id=photo_id, profile=profile).update(order=i)
+
+    def bulk_reorder(self, profile, count, prepared):
+        reorder_profile_photos(profile, prepared)
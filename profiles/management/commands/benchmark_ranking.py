@@ -0,0 +1,263 @@
+from datetime import date, timedelta
+import math
+import random
+import time
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from profiles import ranking
+from profiles.geo import EARTH_RADIUS_KM
+from profiles.models import Interest, Profile, ProfileInterest
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+def previous_load_candidates(queryset, interest_ids):
+    """The previous load_candidates: each column converted one row at a time in Python"""
+    rows = list(queryset.order_by().values_list(
+        'id', 'school_name', 'study_field', 'birth_date', 'latitude', 'longitude'
+    ))
+    if not rows:
+        return None
+
+    ids, schools, study_fields, birth_dates, latitudes, longitudes = zip(*rows)
+    ids = np.asarray(ids, dtype=np.int64)
+
+    shared = np.zeros(len(ids), dtype=np.float64)
+    if interest_ids:
+        linked = np.fromiter(
+            ProfileInterest.objects.filter(
+                interest_id__in=interest_ids,
+                profile_id__in=queryset.order_by().values('id'),
+            ).values_list('profile_id', flat=True),
+            dtype=np.int64,
+        )
+        if linked.size:
+            order = np.argsort(ids)
+            positions = order[np.searchsorted(ids, linked, sorter=order)]
+            shared = np.bincount(positions, minlength=len(ids)).astype(np.float64)
+
+    return {
+        'ids': ids,
+        'shared': shared,
+        'school': np.asarray([(school or '').strip().lower() for school in schools], dtype=object),
+        'study_field': np.asarray(study_fields, dtype=object),
+        'birth_day': np.asarray(
+            [birth.toordinal() if birth else np.nan for birth in birth_dates], dtype=np.float64
+        ),
+        'latitude': np.asarray(
+            [np.nan if lat is None else float(lat) for lat in latitudes], dtype=np.float64
+        ),
+        'longitude': np.asarray(
+            [np.nan if lon is None else float(lon) for lon in longitudes], dtype=np.float64
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark per-profile vs vectorized compatibility scoring for ranked discover, '
+        'then the full load and rank path over real profile rows (rows are rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 50000],
+            help='Number of candidate profiles to benchmark (default: 1000 10000 50000)',
+        )
+        parser.add_argument(
+            '--budget-ms',
+            type=float,
+            default=50,
+            help='Latency budget for scoring and sorting one pool (default: 50)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per path; the best time is reported (default: 3)',
+        )
+        parser.add_argument(
+            '--skip-database',
+            action='store_true',
+            help='Only benchmark scoring on in-memory arrays',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        schools = ['University of Ghana', 'KNUST', 'UCC', 'Ashesi', 'UPSA']
+        study_fields = [choice for choice, _ in Profile.STUDY_CHOICES]
+
+        viewer = {
+            'school': 'knust',
+            'study_field': study_fields[0],
+            'birth_day': float(date(2003, 5, 17).toordinal()),
+            'latitude': 5.6037,
+            'longitude': -0.187,
+        }
+        interest_count = 5
+
+        self.stdout.write(f'Budget: {options["budget_ms"]:.0f}ms, best of {options["repeat"]} runs')
+        self.stdout.write(f'{"profiles":>10} {"per-row (ms)":>14} {"vectorized (ms)":>17} {"speedup":>9}')
+
+        over_budget = False
+        for size in options['sizes']:
+            candidates = {
+                'ids': np.arange(size, dtype=np.int64),
+                'shared': np.asarray([rng.randint(0, interest_count) for _ in range(size)], dtype=np.float64),
+                'school': np.asarray([rng.choice(schools).lower() for _ in range(size)], dtype=object),
+                'study_field': np.asarray([rng.choice(study_fields) for _ in range(size)], dtype=object),
+                'birth_day': np.asarray(
+                    [viewer['birth_day'] + rng.uniform(-3000, 3000) for _ in range(size)], dtype=np.float64
+                ),
+                'latitude': np.asarray([rng.uniform(4.7, 11.2) for _ in range(size)], dtype=np.float64),
+                'longitude': np.asarray([rng.uniform(-3.3, 1.2) for _ in range(size)], dtype=np.float64),
+            }
+
+            per_row_time, per_row_ids = self.best_of(
+                options['repeat'], lambda: self.per_row_path(viewer, candidates, interest_count)
+            )
+            vectorized_time, vectorized_ids = self.best_of(
+                options['repeat'],
+                lambda: ranking.rank_candidates(
+                    candidates, ranking.compatibility_scores(viewer, candidates, interest_count)
+                ),
+            )
+
+            if per_row_ids[:100] != vectorized_ids[:100]:
+                self.stdout.write(self.style.ERROR(f'Ranking mismatch at {size} profiles'))
+
+            self.stdout.write(
+                f'{size:>10} {per_row_time * 1000:>14.1f} {vectorized_time * 1000:>17.1f} '
+                f'{per_row_time / vectorized_time:>8.1f}x'
+            )
+            if vectorized_time * 1000 > options['budget_ms']:
+                over_budget = True
+                self.stdout.write(self.style.WARNING(f'{size} profiles is over the latency budget'))
+
+        if not options['skip_database']:
+            over_budget = self.benchmark_database(options, rng, schools, study_fields) or over_budget
+
+        if over_budget:
+            self.stdout.write(self.style.ERROR('Benchmark completed over budget'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Benchmark completed within budget'))
+
+    def benchmark_database(self, options, rng, schools, study_fields):
+        """
+        Time load_candidates + scoring + sorting (what ranked discover runs per
+        request) against profiles written to the database, with the previous
+        per-row loader for comparison. Returns whether any size was over budget.
+        """
+        self.stdout.write('')
+        self.stdout.write('Load and rank from the database')
+        self.stdout.write(f'{"profiles":>10} {"per-row (ms)":>14} {"vectorized (ms)":>17} {"speedup":>9}')
+
+        over_budget = False
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    viewer, queryset, interest_ids = self.create_profiles(size, rng, schools, study_fields)
+                    features = ranking.viewer_features(viewer)
+
+                    def rank(loader):
+                        candidates = loader(queryset, interest_ids)
+                        scores = ranking.compatibility_scores(features, candidates, len(interest_ids))
+                        return ranking.rank_candidates(candidates, scores)
+
+                    per_row_time, per_row_ids = self.best_of(
+                        options['repeat'], lambda: rank(previous_load_candidates)
+                    )
+                    vectorized_time, vectorized_ids = self.best_of(
+                        options['repeat'], lambda: rank(ranking.load_candidates)
+                    )
+                    raise Rollback
+            except Rollback:
+                pass
+
+            if per_row_ids != vectorized_ids:
+                self.stdout.write(self.style.ERROR(f'Ranking mismatch at {size} profiles'))
+
+            self.stdout.write(
+                f'{size:>10} {per_row_time * 1000:>14.1f} {vectorized_time * 1000:>17.1f} '
+                f'{per_row_time / vectorized_time:>8.1f}x'
+            )
+            if vectorized_time * 1000 > options['budget_ms']:
+                over_budget = True
+                self.stdout.write(self.style.WARNING(f'{size} profiles is over the latency budget'))
+        return over_budget
+
+    def create_profiles(self, size, rng, schools, study_fields):
+        """A viewer and size candidate profiles sharing some of the viewer's interests"""
+        users = User.objects.bulk_create([
+            User(username=f'rank-benchmark-{i}', email=f'rank-benchmark-{i}@example.com', referral_code=f'RB{i}')
+            for i in range(size + 1)
+        ])
+        profiles = Profile.objects.bulk_create([
+            Profile(
+                user=user,
+                is_complete=True,
+                school_name=rng.choice(schools + [' KNUST ', '']),
+                study_field=rng.choice(study_fields),
+                birth_date=date(2003, 5, 17) + timedelta(days=rng.randint(-3000, 3000)) if rng.random() < 0.9 else None,
+                latitude=round(rng.uniform(4.7, 11.2), 6) if rng.random() < 0.8 else None,
+                longitude=round(rng.uniform(-3.3, 1.2), 6),
+            )
+            for user in users
+        ])
+        interests = Interest.objects.bulk_create([Interest(name=f'rank-benchmark-{i}') for i in range(10)])
+        ProfileInterest.objects.bulk_create([
+            ProfileInterest(profile=profile, interest=interest)
+            for profile in profiles for interest in rng.sample(interests, 3)
+        ])
+
+        viewer = Profile.objects.get(pk=profiles[0].pk)
+        interest_ids = list(viewer.interest_links.values_list('interest_id', flat=True))
+        queryset = Profile.objects.filter(pk__range=(profiles[1].pk, profiles[-1].pk))
+        return viewer, queryset, interest_ids
+
+    def best_of(self, repeat, func):
+        best = None
+        result = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def per_row_path(self, viewer, candidates, interest_count):
+        """The same score computed one candidate at a time in plain Python"""
+        lat1 = math.radians(viewer['latitude'])
+        lon1 = math.radians(viewer['longitude'])
+        scored = []
+        for i in range(len(candidates['ids'])):
+            score = ranking.INTEREST_WEIGHT * candidates['shared'][i] / interest_count
+            if candidates['school'][i] == viewer['school']:
+                score += ranking.SCHOOL_WEIGHT
+            if candidates['study_field'][i] == viewer['study_field']:
+                score += ranking.STUDY_FIELD_WEIGHT
+
+            gap_years = abs(candidates['birth_day'][i] - viewer['birth_day']) / 365.25
+            score += ranking.AGE_WEIGHT * min(max(1 - gap_years / ranking.AGE_RANGE_YEARS, 0), 1)
+
+            lat2 = math.radians(candidates['latitude'][i])
+            lon2 = math.radians(candidates['longitude'][i])
+            a = (math.sin((lat2 - lat1) / 2) ** 2
+                 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+            distance = 2 * math.asin(math.sqrt(a)) * EARTH_RADIUS_KM
+            score += ranking.DISTANCE_WEIGHT * min(max(1 - distance / ranking.DISTANCE_RANGE_KM, 0), 1)
+
+            scored.append((-score, int(candidates['ids'][i])))
+        scored.sort()
+        return [candidate_id for _, candidate_id in scored]
@@ -5,6 +5,7 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
 from django.conf import settings
+from accounts.ledger import adjust_balances
 from profiles.models import Profile
 
 User = get_user_model()
@@ -129,8 +130,8 @@ class Command(BaseCommand):
                 is_verified=True,
                 likes_balance=random.randint(5, 50),
                 super_likes_balance=random.randint(1, 10),
-                points_balance=random.randint(0, 100)
             )
+            adjust_balances(user, 'admin', points=random.randint(0, 100))
             
             # Generate age between 18-28
             age = random.randint(18, 28)
@@ -0,0 +1,141 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, storages
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+from profiles.cards import invalidate_profile_card
+from profiles.images import IMAGE_TARGETS
+
+
+def _upload(source, destination, name):
+    """Copy one file from source to destination storage (runs in a worker thread)"""
+    with source.open(name, 'rb') as f:
+        new_name = destination.save(name, f)
+    return new_name, source.size(name)
+
+
+class Command(BaseCommand):
+    help = 'Upload local media files to a storage backend (Cloudinary by default) and repoint the rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--storage',
+            default='default',
+            help='Destination: a STORAGES alias or a dotted Storage class path (default: default)',
+        )
+        parser.add_argument(
+            '--storage-option',
+            action='append',
+            default=[],
+            metavar='KEY=VALUE',
+            help='Constructor argument for a dotted --storage class (repeatable)',
+        )
+        parser.add_argument(
+            '--source-root',
+            default=str(settings.MEDIA_ROOT),
+            help='Local directory holding the files to upload (default: MEDIA_ROOT)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent uploads (default: 8)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Rows fetched from the database per chunk (default: 500)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be uploaded without uploading anything',
+        )
+
+    def handle(self, *args, **options):
+        source = FileSystemStorage(location=options['source_root'])
+        destination = self.get_storage(options['storage'], options['storage_option'])
+        workers = max(1, options['workers'])
+
+        self.uploaded = self.missing = self.failed = self.bytes_uploaded = 0
+        self.started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for label, field_name, _, profile_field in IMAGE_TARGETS:
+                self.stdout.write(f'Migrating {label}.{field_name}...')
+                self.migrate_field(
+                    executor, workers, source, destination, label, field_name, profile_field, options
+                )
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Uploaded {self.uploaded} files ({self.bytes_uploaded / 1e6:.1f} MB) in {elapsed:.1f}s - '
+                f'{self.uploaded / elapsed if elapsed else 0:.1f} files/s, '
+                f'{self.bytes_uploaded / 1e6 / elapsed if elapsed else 0:.2f} MB/s; '
+                f'{self.missing} not found locally, {self.failed} failed'
+            )
+        )
+
+    def get_storage(self, name, raw_options):
+        if '.' not in name:
+            return storages[name]
+        storage_options = {}
+        for option in raw_options:
+            key, sep, value = option.partition('=')
+            if not sep:
+                raise CommandError(f'--storage-option must look like KEY=VALUE, got {option!r}')
+            storage_options[key] = value
+        return import_string(name)(**storage_options)
+
+    def migrate_field(self, executor, workers, source, destination, label, field_name, profile_field, options):
+        model = apps.get_model(label)
+        columns = ['pk', field_name] + ([profile_field] if profile_field and profile_field != 'pk' else [])
+        rows = model.objects.exclude(**{field_name: ''}).exclude(
+            **{f'{field_name}__isnull': True}
+        ).order_by('pk').values_list(*columns)
+
+        # Keep at most two uploads per worker in flight, so memory stays flat however many rows there are
+        pending = {}
+        for row in rows.iterator(chunk_size=options['chunk_size']):
+            pk, name = row[0], row[1]
+            profile_id = pk if profile_field == 'pk' else (row[2] if profile_field else None)
+
+            if not source.exists(name):
+                self.missing += 1
+                continue
+            if options['dry_run']:
+                self.stdout.write(f'  Would upload {name}')
+                continue
+
+            pending[executor.submit(_upload, source, destination, name)] = (pk, name, profile_id)
+            if len(pending) >= workers * 2:
+                self.collect(model, field_name, pending, wait(pending, return_when=FIRST_COMPLETED).done)
+
+        self.collect(model, field_name, pending, wait(pending).done)
+
+    def collect(self, model, field_name, pending, done):
+        """Record finished uploads; only the file column is written, no model save()"""
+        for future in done:
+            pk, name, profile_id = pending.pop(future)
+            try:
+                new_name, size = future.result()
+            except Exception as e:
+                self.failed += 1
+                self.stdout.write(self.style.ERROR(f'  Error uploading {name}: {e}'))
+                continue
+
+            model.objects.filter(pk=pk, **{field_name: name}).update(**{field_name: new_name})
+            if profile_id:
+                invalidate_profile_card(profile_id)
+
+            self.uploaded += 1
+            self.bytes_uploaded += size
+            if self.uploaded % 100 == 0:
+                elapsed = time.perf_counter() - self.started
+                self.stdout.write(f'  {self.uploaded} files uploaded ({self.uploaded / elapsed:.1f} files/s)')
@@ -1,12 +1,69 @@
 # profiles/management/commands/optimize_performance.py
+from django.apps import apps
 from django.core.management.base import BaseCommand
 from django.core.cache import cache
-from django.db import connection
+from django.core.files.base import ContentFile
+from django.db import connection, connections, transaction
+from profiles.cards import invalidate_profile_card
+from profiles.discover import discover_actions_cache_key, discover_actions_version_key
+from profiles.images import (
+    IMAGE_TARGETS, delete_files, enqueue_image_job, variant_names, variants_field, wait_for_images,
+)
 from profiles.models import Profile
+from profiles.versions import current_version
 from notifications.models import Notification
 from performance_optimizations import ImageOptimizer, CacheManager
+from multiprocessing import Pool
+import hashlib
+import json
 import os
-from PIL import Image
+
+# Content hashes of files that are already optimized, loaded in each worker process
+_optimized_hashes = set()
+
+
+def _init_worker(optimized_hashes):
+    global _optimized_hashes
+    _optimized_hashes = optimized_hashes
+    if not apps.ready:
+        # Spawned (not forked) workers start without Django configured
+        import django
+        django.setup()
+
+
+def _optimize_file(task):
+    """
+    Optimize one stored image in a worker process. Works purely through the
+    field's storage, never the database; returns what the parent should record.
+    """
+    label, pk, field_name, name, max_side = task
+    result = {'label': label, 'pk': pk, 'field': field_name, 'name': name}
+    try:
+        storage = apps.get_model(label)._meta.get_field(field_name).storage
+        with storage.open(name, 'rb') as source:
+            data = source.read()
+
+        digest = hashlib.sha256(data).hexdigest()
+        result.update(old_size=len(data), new_size=len(data), hash=digest)
+        if digest in _optimized_hashes:
+            result['status'] = 'skipped'
+            return result
+
+        optimized = ImageOptimizer.optimize_image_bytes(data, (max_side, max_side))
+        if len(optimized) >= len(data):
+            result['status'] = 'unchanged'
+            return result
+
+        root = os.path.splitext(name)[0]
+        result.update(
+            status='optimized',
+            new_size=len(optimized),
+            hash=hashlib.sha256(optimized).hexdigest(),
+            new_name=storage.save(f'{root}.jpg', ContentFile(optimized)),
+        )
+    except Exception as e:
+        result.update(status='error', error=str(e))
+    return result
 
 
 class Command(BaseCommand):
@@ -16,7 +73,23 @@ class Command(BaseCommand):
         parser.add_argument(
             '--optimize-images',
             action='store_true',
-            help='Optimize all profile images',
+            help='Optimize all stored images (profile pictures, photos, ad flyers, rewards)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Worker processes for --optimize-images (default: CPU count)',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default='optimize_images_checkpoint.json',
+            help='Checkpoint file so an interrupted --optimize-images run can resume',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Revisit every image instead of resuming (already-optimized files are still skipped by hash)',
         )
         parser.add_argument(
             '--warm-cache',
@@ -41,7 +114,11 @@ class Command(BaseCommand):
             options['analyze_queries'] = True
 
         if options['optimize_images']:
-            self.optimize_images()
+            self.optimize_images(
+                workers=options['workers'],
+                checkpoint_path=options['checkpoint'],
+                restart=options['restart'],
+            )
 
         if options['warm_cache']:
             self.warm_cache()
@@ -53,34 +130,117 @@ class Command(BaseCommand):
             self.style.SUCCESS('Performance optimization completed!')
         )
 
-    def optimize_images(self):
-        """Optimize all profile images"""
-        self.stdout.write('Optimizing profile images...')
-        
-        profiles = Profile.objects.exclude(profile_picture='')
-        optimized_count = 0
-        
-        for profile in profiles:
-            if profile.profile_picture and os.path.exists(profile.profile_picture.path):
-                try:
-                    original_size = os.path.getsize(profile.profile_picture.path)
-                    ImageOptimizer.optimize_profile_image(profile.profile_picture.path)
-                    new_size = os.path.getsize(profile.profile_picture.path)
-                    
-                    if new_size < original_size:
-                        optimized_count += 1
-                        savings = original_size - new_size
-                        self.stdout.write(f'Optimized {profile.user.username}: saved {savings} bytes')
-                        
-                except Exception as e:
+    def optimize_images(self, workers=None, checkpoint_path=None, restart=False):
+        """Optimize every stored image with a process pool, resumable from a checkpoint"""
+        self.stdout.write('Optimizing images...')
+
+        checkpoint = {'done': [], 'hashes': []}
+        if checkpoint_path and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+        if restart:
+            # Revisit every row; content hashes still skip files that are already optimized
+            checkpoint['done'] = []
+        elif checkpoint['done']:
+            self.stdout.write(
+                f'Resuming from {checkpoint_path}: {len(checkpoint["done"])} images already processed'
+            )
+        done = set(checkpoint['done'])
+        optimized_hashes = set(checkpoint['hashes'])
+
+        tasks = list(self.image_tasks(done))
+        self.stdout.write(f'{len(tasks)} images to process with {workers or os.cpu_count()} workers')
+
+        # Forked workers must not share the parent's database connections
+        # (workers never query, so a connection held open by a transaction can stay)
+        if not connection.in_atomic_block:
+            connections.close_all()
+
+        counts = {'optimized': 0, 'unchanged': 0, 'skipped': 0, 'error': 0}
+        saved_bytes = 0
+        with Pool(workers, initializer=_init_worker, initargs=(optimized_hashes,)) as pool:
+            for processed, result in enumerate(pool.imap_unordered(_optimize_file, tasks, chunksize=4), 1):
+                status = result['status']
+                counts[status] += 1
+                label = f'{result["label"]} #{result["pk"]}'
+
+                if status == 'error':
+                    self.stdout.write(self.style.ERROR(f'[{processed}/{len(tasks)}] Error optimizing {label}: {result["error"]}'))
+                    continue
+
+                if status == 'optimized':
+                    self.record_optimized(result)
+                    saved_bytes += result['old_size'] - result['new_size']
                     self.stdout.write(
-                        self.style.ERROR(f'Error optimizing {profile.user.username}: {e}')
+                        f'[{processed}/{len(tasks)}] Optimized {label}: saved {result["old_size"] - result["new_size"]} bytes'
                     )
-        
+
+                optimized_hashes.add(result['hash'])
+                done.add(f'{result["label"]}:{result["pk"]}')
+                if checkpoint_path and processed % 50 == 0:
+                    self.write_checkpoint(checkpoint_path, done, optimized_hashes)
+
+        if checkpoint_path:
+            self.write_checkpoint(checkpoint_path, done, optimized_hashes)
+
+        # Let the image pipeline finish rendering variants of the optimized files
+        wait_for_images()
+
         self.stdout.write(
-            self.style.SUCCESS(f'Optimized {optimized_count} profile images')
+            self.style.SUCCESS(
+                f'Optimized {counts["optimized"]} images ({saved_bytes} bytes saved), '
+                f'{counts["unchanged"]} already small, {counts["skipped"]} already optimized, '
+                f'{counts["error"]} errors'
+            )
         )
 
+    def image_tasks(self, done):
+        """(model, pk, field, file name, max side) for every stored image not yet processed"""
+        for label, field_name, max_side, _ in IMAGE_TARGETS:
+            model = apps.get_model(label)
+            rows = model.objects.exclude(**{field_name: ''}).exclude(
+                **{f'{field_name}__isnull': True}
+            ).order_by('pk').values_list('pk', field_name)
+            for pk, name in rows.iterator(chunk_size=2000):
+                if f'{label}:{pk}' not in done:
+                    yield (label, pk, field_name, name, max_side)
+
+    def record_optimized(self, result):
+        """
+        Point the row at the optimized file (only if it still holds the
+        original), drop the original and its size variants, and queue new
+        variants
+        """
+        label, field_name = result['label'], result['field']
+        profile_field = next(target[3] for target in IMAGE_TARGETS if target[0] == label and target[1] == field_name)
+        model = apps.get_model(label)
+        storage = model._meta.get_field(field_name).storage
+        variants = variants_field(field_name)
+        has_variants = any(field.name == variants for field in model._meta.concrete_fields)
+
+        rows = model.objects.filter(pk=result['pk'], **{field_name: result['name']})
+        changes = {field_name: result['new_name']}
+        old_variants = {}
+        with transaction.atomic():
+            if has_variants:
+                # Locked, so the pipeline cannot write variants of the original in between
+                old_variants = rows.select_for_update().values_list(variants, flat=True).first()
+                changes[variants] = {}
+            updated = old_variants is not None and rows.update(**changes)
+        if not updated:
+            storage.delete(result['new_name'])
+            return
+        delete_files(storage, [result['name'], *variant_names(result['name'], old_variants)])
+        if has_variants:
+            enqueue_image_job(label, result['pk'], field_name)
+        if profile_field:
+            profile_id = model.objects.filter(pk=result['pk']).values_list(profile_field, flat=True).first()
+            invalidate_profile_card(profile_id)
+
+    def write_checkpoint(self, path, done, optimized_hashes):
+        with open(path, 'w') as f:
+            json.dump({'done': sorted(done), 'hashes': sorted(optimized_hashes)}, f)
+
     def warm_cache(self):
         """Warm up cache for active users"""
         self.stdout.write('Warming up cache...')
@@ -148,7 +308,8 @@ class Command(BaseCommand):
                 self.stdout.write(f"  Time: {query['time']}s - {query['sql'][:100]}...")
         
         # Cache statistics
-        cache_info = cache.get_many(['user_likes_1', 'user_matches_1', 'user_requests_1'])
+        actions_key = discover_actions_cache_key(1, current_version(discover_actions_version_key(1)))
+        cache_info = cache.get_many([actions_key, 'user_matches_1', 'user_requests_1'])
         cached_items = len([k for k, v in cache_info.items() if v is not None])
         self.stdout.write(f'Cache hits: {cached_items}/3 for user 1')
         
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:18
+
+from django.db import migrations, models
+
+# Frozen copy of profiles.geo.encode_geohash as of this migration, so later
+# changes to the app code cannot change what this migration does
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geohash(latitude, longitude, precision=7):
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    latitude = float(latitude)
+    longitude = float(longitude)
+
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(geohash) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits = bits << 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits = bits << 1
+                lat_range[1] = mid
+
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(geohash)
+
+
+def populate_geohashes(apps, schema_editor):
+    """Compute the grid cell for every profile that already has coordinates"""
+    Profile = apps.get_model('profiles', 'Profile')
+
+    batch = []
+    located = Profile.objects.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).only('id', 'latitude', 'longitude')
+    for profile in located.iterator(chunk_size=1000):
+        profile.geohash = encode_geohash(profile.latitude, profile.longitude)
+        batch.append(profile)
+        if len(batch) >= 1000:
+            Profile.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Profile.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0008_profile_gender'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(populate_geohashes, migrations.RunPython.noop),
+    ]
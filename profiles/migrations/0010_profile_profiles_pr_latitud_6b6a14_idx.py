@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0009_profile_geohash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['latitude', 'longitude'], name='profiles_pr_latitud_6b6a14_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:22
+
+import random
+
+import profiles.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_random_keys(apps, schema_editor):
+    """AddField evaluates the default once, so give each existing profile its own key"""
+    Profile = apps.get_model('profiles', 'Profile')
+
+    batch = []
+    for profile in Profile.objects.only('id').iterator(chunk_size=1000):
+        profile.random_key = random.random()
+        batch.append(profile)
+        if len(batch) >= 1000:
+            Profile.objects.bulk_update(batch, ['random_key'])
+            batch = []
+    if batch:
+        Profile.objects.bulk_update(batch, ['random_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0010_profile_profiles_pr_latitud_6b6a14_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='random_key',
+            field=models.FloatField(default=profiles.models.generate_random_key, editable=False),
+        ),
+        migrations.RunPython(populate_random_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['is_complete', 'random_key', 'id'], name='profiles_pr_is_comp_16ef0a_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def normalize_interest(name):
+    """Frozen copy of profiles.models.normalize_interest as of this migration"""
+    return ' '.join(name.split()).lower()[:100]
+
+
+def populate_interest_tags(apps, schema_editor):
+    """Build Interest rows and links from the existing comma-separated interests"""
+    Profile = apps.get_model('profiles', 'Profile')
+    Interest = apps.get_model('profiles', 'Interest')
+    ProfileInterest = apps.get_model('profiles', 'ProfileInterest')
+
+    names_by_profile = {}
+    for profile_id, interests in Profile.objects.exclude(interests='').values_list('id', 'interests').iterator():
+        names = {normalize_interest(name) for name in interests.split(',') if name.strip()}
+        if names:
+            names_by_profile[profile_id] = names
+
+    all_names = set().union(*names_by_profile.values()) if names_by_profile else set()
+    Interest.objects.bulk_create([Interest(name=name) for name in all_names], ignore_conflicts=True)
+    interest_ids = dict(Interest.objects.values_list('name', 'id'))
+
+    ProfileInterest.objects.bulk_create([
+        ProfileInterest(profile_id=profile_id, interest_id=interest_ids[name])
+        for profile_id, names in names_by_profile.items()
+        for name in names
+    ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0011_profile_random_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Interest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfileInterest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('interest', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='profile_links', to='profiles.interest')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interest_links', to='profiles.profile')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='interest_tags',
+            field=models.ManyToManyField(blank=True, related_name='profiles', through='profiles.ProfileInterest', to='profiles.interest'),
+        ),
+        migrations.AddIndex(
+            model_name='profileinterest',
+            index=models.Index(fields=['interest', 'profile'], name='profiles_pr_interes_a5df5b_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='profileinterest',
+            unique_together={('profile', 'interest')},
+        ),
+        migrations.RunPython(populate_interest_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:26
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of the profiles.search helpers as of this migration
+USERNAME_WEIGHT = 3
+NAME_WEIGHT = 1
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    return _WORD_RE.findall((text or '').lower())
+
+
+def build_search_tokens(user):
+    """Return {token: weight} for a user's username and real name"""
+    tokens = {}
+    username = (user.username or '').lower()
+    for token in [username] + tokenize(username):
+        if token:
+            tokens[token[:150]] = USERNAME_WEIGHT
+    for token in tokenize(f'{user.first_name} {user.last_name}'):
+        tokens.setdefault(token[:150], NAME_WEIGHT)
+    return tokens
+
+
+def populate_search_tokens(apps, schema_editor):
+    """Index the usernames and real names of existing profiles"""
+    Profile = apps.get_model('profiles', 'Profile')
+    ProfileSearchToken = apps.get_model('profiles', 'ProfileSearchToken')
+
+    batch = []
+    for profile in Profile.objects.select_related('user').iterator(chunk_size=1000):
+        batch.extend(
+            ProfileSearchToken(profile_id=profile.id, token=token, weight=weight)
+            for token, weight in build_search_tokens(profile.user).items()
+        )
+        if len(batch) >= 1000:
+            ProfileSearchToken.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        ProfileSearchToken.objects.bulk_create(batch)
+
+
+def create_trigram_index(apps, schema_editor):
+    """On PostgreSQL, add a pg_trgm index so substring token matches are indexed too"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS profiles_searchtoken_token_trgm '
+        'ON profiles_profilesearchtoken USING gin (token gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS profiles_searchtoken_token_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0012_interest_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=150)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='profiles.profile')),
+            ],
+            options={
+                'unique_together': {('profile', 'token')},
+            },
+        ),
+        migrations.RunPython(populate_search_tokens, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
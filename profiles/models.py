@@ -1,11 +1,41 @@
 # profiles/models.py
 from django.db import models
 from django.contrib.auth import get_user_model
-from PIL import Image
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 import os
+import random
+from .cards import invalidate_profile_card
+from .discover import record_follow, record_like, record_pool_change, record_unlike
+from .facets import profile_facets, record_facet_change
+from .images import delete_files_on_commit, enqueue_image, variant_names
+from .geo import encode_geohash
+from .search import build_search_tokens
 
 User = get_user_model()
 
+
+def generate_random_key():
+    """Default for Profile.random_key (must be importable for migrations)"""
+    return random.random()
+
+
+def normalize_interest(name):
+    """Canonical form of an interest tag: lowercase with collapsed whitespace"""
+    return ' '.join(name.split()).lower()[:100]
+
+
+class Interest(models.Model):
+    """A normalized interest tag shared by all profiles that list it"""
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class Profile(models.Model):
     STUDY_CHOICES = [
         ('computer_science', 'Computer Science'),
@@ -42,12 +72,20 @@ class Profile(models.Model):
     study_year = models.IntegerField(choices=YEAR_CHOICES, null=True, blank=True)
     school_name = models.CharField(max_length=200, blank=True, help_text="Name of your school/university")
     interests = models.TextField(blank=True, help_text="Comma-separated interests")
+    # Normalized copy of interests, maintained on save for indexed search
+    interest_tags = models.ManyToManyField(Interest, through='ProfileInterest', related_name='profiles', blank=True)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True)
+    # Resized WebP/JPEG copies of profile_picture, filled in by the image pipeline
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     city = models.CharField(max_length=100, blank=True, help_text="Your city")
     location = models.CharField(max_length=100, blank=True, help_text="General location/region")
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, help_text="Latitude for location-based matching")
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, help_text="Longitude for location-based matching")
+    # Grid cell of latitude/longitude, maintained on save for radius prefiltering
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     is_complete = models.BooleanField(default=False)
+    # Fixed random sort key for stable shuffled discover paging
+    random_key = models.FloatField(default=generate_random_key, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -60,43 +98,153 @@ class Profile(models.Model):
             models.Index(fields=['location']),
             models.Index(fields=['birth_date']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['latitude', 'longitude']),
+            models.Index(fields=['is_complete', 'random_key', 'id']),
         ]
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored interests so save() only re-syncs tags when they change
+        instance._loaded_interests = instance.__dict__.get('interests')
+        # ...and which facet counts it currently contributes to
+        instance._loaded_facets = profile_facets(instance.__dict__)
+        # ...and every loaded column, so save() only writes what changed
+        instance._loaded_values = instance._current_values()
+        return instance
+
+    def _current_values(self):
+        values = {}
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__:
+                value = self.__dict__[field.attname]
+                # Compare files by stored name, not by FieldFile identity
+                values[field.attname] = getattr(value, 'name', value)
+        return values
+
+    def get_dirty_fields(self):
+        """
+        Names of fields changed since the profile was loaded, or None if it
+        wasn't loaded from the database (so everything must be written)
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        current = self._current_values()
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in current
+            and (field.attname not in loaded or loaded[field.attname] != current[field.attname])
+        ]
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        creating = self._state.adding
 
-        # Resize image (only for local storage, Cloudinary handles this via transformations)
-        if self.profile_picture:
-            try:
-                img = Image.open(self.profile_picture.path)
-                if img.height > 300 or img.width > 300:
-                    output_size = (300, 300)
-                    img.thumbnail(output_size)
-                    img.save(self.profile_picture.path)
-            except (NotImplementedError, AttributeError):
-                # Cloudinary storage doesn't support .path, skip resize
-                pass
-
-        # Check if profile is complete
-        old_is_complete = Profile.objects.filter(pk=self.pk).values_list('is_complete', flat=True).first() if self.pk else False
+        # Keep the grid cell in step with the coordinates
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+
+        # Work out completeness before writing, so it goes out in the same query
+        if creating:
+            was_complete = False
+        elif 'is_complete' in getattr(self, '_loaded_values', {}):
+            was_complete = self._loaded_values['is_complete']
+        else:
+            was_complete = Profile.objects.filter(pk=self.pk).values_list('is_complete', flat=True).first() or False
         self.is_complete = bool(
             self.bio and self.study_field and self.study_year and
             self.interests and self.profile_picture
         )
-        if self.is_complete != old_is_complete:
-            Profile.objects.filter(pk=self.pk).update(is_complete=self.is_complete)
 
-            # Auto-verify user when profile becomes complete
-            if self.is_complete and not self.user.is_verified:
-                self.user.is_verified = True
-                self.user.save()
+        # Only write the columns that changed (plus the auto_now timestamp)
+        dirty = None if creating else self.get_dirty_fields()
+        if dirty is not None and 'update_fields' not in kwargs:
+            kwargs['update_fields'] = dirty + ['updated_at'] if dirty else []
+        elif kwargs.get('update_fields'):
+            # Columns derived from the caller's fields have to be written with them
+            update_fields = list(kwargs['update_fields'])
+            if self.is_complete != was_complete:
+                update_fields.append('is_complete')
+            if {'latitude', 'longitude'} & set(update_fields) and 'geohash' not in update_fields:
+                update_fields.append('geohash')
+            kwargs['update_fields'] = update_fields
+        picture_changed = creating or dirty is None or 'profile_picture' in dirty
+        if picture_changed and self.profile_picture_variants:
+            # The old variants belong to the old picture; new ones are generated after the write
+            old_name = getattr(self, '_loaded_values', {}).get('profile_picture')
+            delete_files_on_commit(
+                self.profile_picture.storage, variant_names(old_name, self.profile_picture_variants)
+            )
+            self.profile_picture_variants = {}
+            if kwargs.get('update_fields'):
+                kwargs['update_fields'] = [*kwargs['update_fields'], 'profile_picture_variants']
+
+        super().save(*args, **kwargs)
+        self._loaded_values = self._current_values()
+
+        if self.interests != getattr(self, '_loaded_interests', None):
+            self.sync_interest_tags()
+            self._loaded_interests = self.interests
+
+        if creating:
+            self.sync_search_tokens()
+
+        # Size variants are rendered off the request by the image pipeline
+        if self.profile_picture and picture_changed:
+            enqueue_image(self, 'profile_picture')
+
+        if self.is_complete != was_complete:
+            record_pool_change(self.pk, self.user_id, self.random_key, self.is_complete)
+
+            # Auto-verify user when profile becomes complete (one UPDATE, no user fetch)
+            if self.is_complete:
+                User.objects.filter(pk=self.user_id, is_verified=False).update(is_verified=True)
+                if self._meta.get_field('user').is_cached(self):
+                    self.user.is_verified = True
+
+        facets = profile_facets(self.__dict__)
+        record_facet_change(getattr(self, '_loaded_facets', None), facets)
+        self._loaded_facets = facets
+
+        invalidate_profile_card(self.pk)
     
     def get_interests_list(self):
         return [interest.strip() for interest in self.interests.split(',') if interest.strip()]
 
+    def sync_interest_tags(self):
+        """Bring the Interest links in line with the comma-separated interests field"""
+        wanted = {normalize_interest(name) for name in self.get_interests_list()}
+        current = dict(
+            ProfileInterest.objects.filter(profile=self).values_list('interest__name', 'id')
+        )
+
+        stale = [link_id for name, link_id in current.items() if name not in wanted]
+        if stale:
+            ProfileInterest.objects.filter(id__in=stale).delete()
+
+        missing = wanted - current.keys()
+        if missing:
+            Interest.objects.bulk_create(
+                [Interest(name=name) for name in missing], ignore_conflicts=True
+            )
+            ProfileInterest.objects.bulk_create([
+                ProfileInterest(profile=self, interest=interest)
+                for interest in Interest.objects.filter(name__in=missing)
+            ], ignore_conflicts=True)
+
+    def sync_search_tokens(self):
+        """Rebuild the name search tokens from the user's username and real name"""
+        ProfileSearchToken.objects.filter(profile=self).delete()
+        ProfileSearchToken.objects.bulk_create([
+            ProfileSearchToken(profile=self, token=token, weight=weight)
+            for token, weight in build_search_tokens(self.user).items()
+        ])
+
     def calculate_distance_to(self, other_profile):
         """Calculate distance in kilometers to another profile using Haversine formula"""
         if not all([self.latitude, self.longitude, other_profile.latitude, other_profile.longitude]):
@@ -142,14 +290,53 @@ class Profile(models.Model):
         """Get all photos including profile_picture and additional photos"""
         photos = []
         if self.profile_picture:
-            photos.append({'url': self.profile_picture.url, 'is_primary': True})
+            photos.append({'url': self.profile_picture.url, 'is_primary': True, 'variants': self.profile_picture_variants})
         for photo in self.photos.all():
-            photos.append({'url': photo.image.url, 'is_primary': False})
+            photos.append({'url': photo.image.url, 'is_primary': False, 'variants': photo.image_variants})
         return photos
 
+class ProfileInterest(models.Model):
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='interest_links')
+    interest = models.ForeignKey(Interest, on_delete=models.CASCADE, related_name='profile_links')
+
+    class Meta:
+        unique_together = ['profile', 'interest']
+        indexes = [
+            models.Index(fields=['interest', 'profile']),
+        ]
+
+    def __str__(self):
+        return f"{self.profile.user.username} - {self.interest.name}"
+
+class ProfileSearchToken(models.Model):
+    """A normalized word from a profile's username or name, for indexed search"""
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=150, db_index=True)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        unique_together = ['profile', 'token']
+
+    def __str__(self):
+        return f"{self.profile.user.username} - {self.token}"
+
+@receiver(post_save, sender=User)
+def refresh_search_tokens(sender, instance, created, **kwargs):
+    """Re-index a user's profile when their username or real name changes"""
+    names = (instance.username, instance.first_name, instance.last_name)
+    if created or getattr(instance, '_loaded_names', None) == names:
+        return
+    instance._loaded_names = names
+    profile = Profile.objects.filter(user=instance).first()
+    if profile:
+        profile.sync_search_tokens()
+        invalidate_profile_card(profile.pk)
+
 class ProfilePhoto(models.Model):
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='photos')
     image = models.ImageField(upload_to='profile_photos/')
+    # Resized WebP/JPEG copies of image, filled in by the image pipeline
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     order = models.PositiveIntegerField(default=0)
 
@@ -159,28 +346,72 @@ class ProfilePhoto(models.Model):
     def __str__(self):
         return f"{self.profile.user.username} - Photo {self.id}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored image so save() only re-processes a replaced one
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
     def save(self, *args, **kwargs):
+        image_changed = self.image.name != getattr(self, '_loaded_image', None)
+        if image_changed:
+            if self.image_variants:
+                delete_files_on_commit(
+                    self.image.storage, variant_names(getattr(self, '_loaded_image', None), self.image_variants)
+                )
+            self.image_variants = {}
+
         super().save(*args, **kwargs)
+        invalidate_profile_card(self.profile_id)
 
-        # Resize image (only for local storage, Cloudinary handles this via transformations)
-        if self.image:
-            try:
-                img = Image.open(self.image.path)
-                if img.height > 800 or img.width > 800:
-                    output_size = (800, 800)
-                    img.thumbnail(output_size)
-                    img.save(self.image.path)
-            except (NotImplementedError, AttributeError):
-                # Cloudinary storage doesn't support .path, skip resize
-                pass
+        # Size variants are rendered off the request by the image pipeline
+        if self.image and image_changed:
+            self._loaded_image = self.image.name
+            enqueue_image(self, 'image')
 
     def delete(self, *args, **kwargs):
-        # Delete the image file (works for both local and Cloudinary)
+        # Delete the image file and its size variants once the row is gone
+        # (works for both local and Cloudinary storage)
         if self.image:
-            try:
-                # For Cloudinary storage, use storage delete
-                self.image.delete(save=False)
-            except (NotImplementedError, AttributeError, FileNotFoundError):
-                # If deletion fails, skip
-                pass
-        super().delete(*args, **kwargs)
\ No newline at end of file
+            delete_files_on_commit(
+                self.image.storage, [self.image.name, *variant_names(self.image.name, self.image_variants)]
+            )
+        super().delete(*args, **kwargs)
+        invalidate_profile_card(self.profile_id)
+
+
+# Keep cached discover pools and actions in step with profiles, likes, unlikes and follows
+@receiver(post_delete, sender=Profile)
+def remove_profile_from_discover(sender, instance, **kwargs):
+    if instance.is_complete:
+        record_pool_change(instance.pk, instance.user_id, instance.random_key, False)
+    record_facet_change(getattr(instance, '_loaded_facets', profile_facets(instance.__dict__)), None)
+    invalidate_profile_card(instance.pk)
+
+@receiver(post_save, sender='likes.Like')
+def record_like_for_discover(sender, instance, created, **kwargs):
+    if created:
+        record_like(instance.from_user_id, instance.to_user_id)
+
+@receiver(post_delete, sender='likes.Like')
+def forget_like_for_discover(sender, instance, **kwargs):
+    record_like(instance.from_user_id, instance.to_user_id, delta=-1)
+
+@receiver(post_save, sender='likes.Unlike')
+def record_unlike_for_discover(sender, instance, created, **kwargs):
+    if created:
+        record_unlike(instance.from_user_id, instance.to_user_id)
+
+@receiver(post_delete, sender='likes.Unlike')
+def forget_unlike_for_discover(sender, instance, **kwargs):
+    record_unlike(instance.from_user_id, instance.to_user_id, unliked=False)
+
+@receiver(post_save, sender='social.Follow')
+def record_follow_for_discover(sender, instance, created, **kwargs):
+    if created:
+        record_follow(instance.follower_id, instance.following_id)
+
+@receiver(post_delete, sender='social.Follow')
+def forget_follow_for_discover(sender, instance, **kwargs):
+    record_follow(instance.follower_id, instance.following_id, following=False)
@@ -0,0 +1,71 @@
+# profiles/photos.py
+"""
+Bulk operations on a profile's photo gallery.
+
+Reordering rewrites every photo's position with one bulk_update inside a
+transaction, and uploading stores the files, inserts all the rows in one
+batch and leaves resizing to the image pipeline, so neither costs a query
+(or a profile card invalidation) per photo.
+"""
+from django.db import transaction
+
+from .cards import invalidate_profile_card
+from .images import enqueue_image
+
+MAX_PHOTOS = 6
+
+
+def reorder_profile_photos(profile, photo_ids):
+    """
+    Put the profile's photos in the order of photo_ids. Photos not listed
+    keep their relative order after the listed ones; ids that are not the
+    profile's photos are ignored. Returns the photos in their new order.
+    """
+    from .models import ProfilePhoto
+
+    positions = {}
+    for photo_id in photo_ids:
+        positions.setdefault(int(photo_id), len(positions))
+
+    with transaction.atomic():
+        photos = list(ProfilePhoto.objects.select_for_update().filter(profile=profile).only('id', 'order', 'profile_id'))
+        photos.sort(key=lambda photo: (positions.get(photo.id, len(positions)), photo.order))
+        changed = []
+        for order, photo in enumerate(photos):
+            if photo.order != order:
+                photo.order = order
+                changed.append(photo)
+        if changed:
+            ProfilePhoto.objects.bulk_update(changed, ['order'])
+
+    if changed:
+        invalidate_profile_card(profile.id)
+    return photos
+
+
+def add_profile_photos(profile, files, start_order=0):
+    """
+    Store uploaded files as the profile's photos from position start_order on,
+    inserting every row with a single query. Size variants are generated
+    after commit by the image pipeline. Returns the new photos.
+    """
+    from .models import ProfilePhoto
+
+    photos = []
+    for i, upload in enumerate(files):
+        photo = ProfilePhoto(profile=profile, order=start_order + i)
+        # Writes the file to storage only; the row is inserted below with the others
+        photo.image.save(upload.name, upload, save=False)
+        photos.append(photo)
+
+    if not photos:
+        return photos
+
+    with transaction.atomic():
+        ProfilePhoto.objects.bulk_create(photos)
+        for photo in photos:
+            photo._loaded_image = photo.image.name
+            enqueue_image(photo, 'image')
+
+    invalidate_profile_card(profile.id)
+    return photos
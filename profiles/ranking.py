@@ -0,0 +1,142 @@
+# profiles/ranking.py
+"""
+Compatibility ranking for discover.
+
+Candidates are loaded as column arrays (one values_list over the filtered
+queryset, plus one query for the links to the viewer's own interests). The
+database hands the columns over in the form numpy takes in bulk: coordinates
+cast to floats (no Decimal per row), birth dates as ISO text parsed straight
+into datetime64, schools already trimmed and lowercased. Every score is then
+computed with whole-array operations, so neither loading nor scoring is a
+Python loop per profile.
+"""
+import numpy as np
+from django.db.models import CharField, FloatField, Value
+from django.db.models.functions import Cast, Coalesce, Lower, Trim
+
+from .geo import haversine_distances
+
+# Points for each signal; every signal is scaled to 0..1 before weighting
+INTEREST_WEIGHT = 4.0
+SCHOOL_WEIGHT = 2.0
+STUDY_FIELD_WEIGHT = 2.0
+AGE_WEIGHT = 1.0
+DISTANCE_WEIGHT = 1.0
+
+# Age gap (years) and distance (km) at which those signals reach zero
+AGE_RANGE_YEARS = 10
+DISTANCE_RANGE_KM = 100
+
+_DAYS_PER_YEAR = 365.25
+
+# date.toordinal() of the datetime64 epoch (1970-01-01)
+_EPOCH_ORDINAL = 719163
+
+
+def load_candidates(queryset, interest_ids):
+    """
+    Return candidate columns for a Profile queryset as a dict of numpy arrays:
+    ids, shared (interests in common with interest_ids), school, study_field,
+    birth_day (ordinal, NaN if unknown), latitude and longitude (NaN if unknown).
+    """
+    from .models import ProfileInterest
+
+    rows = list(queryset.order_by().values_list(
+        'id',
+        Lower(Trim(Coalesce('school_name', Value('')))),
+        'study_field',
+        Cast('birth_date', CharField()),
+        Cast('latitude', FloatField()),
+        Cast('longitude', FloatField()),
+    ))
+    if not rows:
+        return None
+
+    ids, schools, study_fields, birth_dates, latitudes, longitudes = zip(*rows)
+    ids = np.asarray(ids, dtype=np.int64)
+
+    shared = np.zeros(len(ids), dtype=np.float64)
+    if interest_ids:
+        linked = np.fromiter(
+            ProfileInterest.objects.filter(
+                interest_id__in=interest_ids,
+                profile_id__in=queryset.order_by().values('id'),
+            ).values_list('profile_id', flat=True),
+            dtype=np.int64,
+        )
+        if linked.size:
+            # Map each linked profile id onto its row and count links per row
+            order = np.argsort(ids)
+            positions = order[np.searchsorted(ids, linked, sorter=order)]
+            shared = np.bincount(positions, minlength=len(ids)).astype(np.float64)
+
+    # Missing dates (None) become NaT and missing coordinates NaN
+    births = np.asarray(birth_dates, dtype='datetime64[D]')
+    birth_day = births.astype(np.int64).astype(np.float64) + _EPOCH_ORDINAL
+    birth_day[np.isnat(births)] = np.nan
+
+    return {
+        'ids': ids,
+        'shared': shared,
+        'school': np.asarray(schools, dtype=object),
+        'study_field': np.asarray(study_fields, dtype=object),
+        'birth_day': birth_day,
+        'latitude': np.asarray(latitudes, dtype=np.float64),
+        'longitude': np.asarray(longitudes, dtype=np.float64),
+    }
+
+
+def compatibility_scores(viewer, candidates, interest_count):
+    """
+    Score every candidate against the viewer in one vectorized pass.
+
+    viewer is a dict with school, study_field, birth_day, latitude and
+    longitude (same encoding as load_candidates); interest_count is how many
+    interests the viewer has.
+    """
+    scores = INTEREST_WEIGHT * candidates['shared'] / max(interest_count, 1)
+
+    if viewer['school']:
+        scores += SCHOOL_WEIGHT * (candidates['school'] == viewer['school'])
+    if viewer['study_field']:
+        scores += STUDY_FIELD_WEIGHT * (candidates['study_field'] == viewer['study_field'])
+
+    if not np.isnan(viewer['birth_day']):
+        gap_years = np.abs(candidates['birth_day'] - viewer['birth_day']) / _DAYS_PER_YEAR
+        age_score = np.clip(1 - gap_years / AGE_RANGE_YEARS, 0, 1)
+        scores += AGE_WEIGHT * np.nan_to_num(age_score)
+
+    if not (np.isnan(viewer['latitude']) or np.isnan(viewer['longitude'])):
+        distances = haversine_distances(
+            viewer['latitude'], viewer['longitude'],
+            candidates['latitude'], candidates['longitude'],
+        )
+        distance_score = np.clip(1 - distances / DISTANCE_RANGE_KM, 0, 1)
+        scores += DISTANCE_WEIGHT * np.nan_to_num(distance_score)
+
+    return scores
+
+
+def rank_candidates(candidates, scores):
+    """Candidate ids ordered by score (best first), ties broken by id"""
+    return candidates['ids'][np.lexsort((candidates['ids'], -scores))].tolist()
+
+
+def viewer_features(profile):
+    return {
+        'school': (profile.school_name or '').strip().lower(),
+        'study_field': profile.study_field or '',
+        'birth_day': float(profile.birth_date.toordinal()) if profile.birth_date else np.nan,
+        'latitude': np.nan if profile.latitude is None else float(profile.latitude),
+        'longitude': np.nan if profile.longitude is None else float(profile.longitude),
+    }
+
+
+def rank_profiles(profile, queryset):
+    """Return the ids in queryset ordered by compatibility with profile"""
+    interest_ids = list(profile.interest_links.values_list('interest_id', flat=True))
+    candidates = load_candidates(queryset, interest_ids)
+    if candidates is None:
+        return []
+    scores = compatibility_scores(viewer_features(profile), candidates, len(interest_ids))
+    return rank_candidates(candidates, scores)
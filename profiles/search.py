@@ -0,0 +1,74 @@
+# profiles/search.py
+"""
+Name search for discover.
+
+Each profile keeps a small set of ProfileSearchToken rows (normalized words
+from the username and real name, weighted by where they came from). A search
+matches query words against the indexed token column and ranks profiles by
+the summed weight of the tokens they matched, so both filtering and ranking
+come from one index lookup instead of leading-wildcard scans over the user
+table. On PostgreSQL a pg_trgm index on the token column also serves
+substring matches.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+
+# Token weights by source field
+USERNAME_WEIGHT = 3
+NAME_WEIGHT = 1
+
+# Shortest query word worth a substring (trigram) match
+MIN_SUBSTRING_LENGTH = 3
+
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Split text into lowercase alphanumeric words"""
+    return _WORD_RE.findall((text or '').lower())
+
+
+def build_search_tokens(user):
+    """Return {token: weight} for a user's username and real name"""
+    tokens = {}
+    username = (user.username or '').lower()
+    for token in [username] + tokenize(username):
+        if token:
+            tokens[token[:150]] = USERNAME_WEIGHT
+    for token in tokenize(f'{user.first_name} {user.last_name}'):
+        tokens.setdefault(token[:150], NAME_WEIGHT)
+    return tokens
+
+
+def search_profiles(queryset, query):
+    """
+    Restrict a Profile queryset to name matches for query, annotated with a
+    search_rank (higher is better) computed from the matched tokens.
+    """
+    from .models import ProfileSearchToken
+
+    words = tokenize(query)
+    if not words:
+        return queryset.none()
+
+    match = Q()
+    exact_weight = []
+    for word in words:
+        match |= Q(token__startswith=word)
+        if connection.vendor == 'postgresql' and len(word) >= MIN_SUBSTRING_LENGTH:
+            # Served by the pg_trgm index created in migration 0013
+            match |= Q(token__contains=word)
+        exact_weight.append(When(token=word, then=F('weight') * 2))
+
+    matching_tokens = ProfileSearchToken.objects.filter(match)
+    scores = matching_tokens.filter(profile=OuterRef('pk')).values('profile').annotate(
+        score=Sum(Case(*exact_weight, default=F('weight'), output_field=IntegerField()))
+    ).values('score')
+
+    return queryset.filter(
+        id__in=matching_tokens.values('profile_id')
+    ).annotate(
+        search_rank=Subquery(scores, output_field=IntegerField())
+    )
@@ -0,0 +1,104 @@
+# profiles/stats.py
+"""
+Profile statistics for the profile pages and the feed sidebar.
+
+get_profile_stats() returns every count shown about a user that is not
+stored on the user row (likes and unlikes given, posts, likes received on
+and given to posts and comments) from a single query of correlated
+subqueries, cached briefly per user. Counters that do live on the user row
+(followers_count, likes_balance, ...) and the ledger balances
+(received_likes_count, points_balance) are read from the user itself so
+they are never stale.
+
+get_viewer_relation() answers the per-viewer questions for a profile page
+(does the viewer follow this user, is there a pending match request from
+them) in one more query.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Exists, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+PROFILE_STATS_CACHE_TIMEOUT = 60
+
+
+def profile_stats_cache_key(user_id):
+    return f'profile_stats_{user_id}'
+
+
+def _count(queryset, field):
+    """Number of rows of queryset whose field points at the outer user"""
+    rows = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def _sum(queryset, field, amount='amount'):
+    """Sum of amount over the rows of queryset whose field points at the outer user"""
+    rows = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Sum(amount)).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def build_profile_stats(user_id):
+    """Compute the statistics for one user with a single query"""
+    from django.contrib.auth import get_user_model
+    from likes.models import Like, Unlike
+    from social.models import CommentLike, Post, PostLike
+
+    stats = get_user_model().objects.filter(pk=user_id).annotate(
+        given_likes_count=_count(Like.objects.all(), 'from_user'),
+        given_unlikes_count=_count(Unlike.objects.all(), 'from_user'),
+        posts_count=_count(Post.objects.all(), 'author'),
+        post_likes_received=_sum(PostLike.objects.all(), 'post__author'),
+        comment_likes_received=_sum(CommentLike.objects.all(), 'comment__author'),
+        post_likes_given=_sum(PostLike.objects.all(), 'user'),
+        comment_likes_given=_sum(CommentLike.objects.all(), 'user'),
+    ).values(
+        'given_likes_count', 'given_unlikes_count', 'posts_count',
+        'post_likes_received', 'comment_likes_received', 'post_likes_given', 'comment_likes_given',
+    ).first()
+
+    if stats is None:
+        return None
+    stats['post_and_comment_likes_received'] = stats['post_likes_received'] + stats['comment_likes_received']
+    stats['post_and_comment_likes_given'] = stats['post_likes_given'] + stats['comment_likes_given']
+    return stats
+
+
+def get_profile_stats(user_id):
+    key = profile_stats_cache_key(user_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = build_profile_stats(user_id)
+        if stats is not None:
+            cache.set(key, stats, PROFILE_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def get_viewer_relation(viewer_id, user_id, notification_id=None):
+    """
+    Return {'is_following', 'incoming_request_id', 'notification_id'} for
+    viewer looking at user's profile. notification_id is echoed back only if
+    it is a pending match request from user to viewer.
+    """
+    from django.contrib.auth import get_user_model
+    from notifications.models import Notification
+    from social.models import Follow
+
+    pending = Notification.objects.filter(
+        sender=OuterRef('pk'),
+        receiver_id=viewer_id,
+        notification_type='match_request',
+        status='pending',
+    )
+    annotations = {
+        'is_following': Exists(Follow.objects.filter(follower_id=viewer_id, following=OuterRef('pk'))),
+        'incoming_request_id': Subquery(pending.order_by('-created_at').values('pk')[:1]),
+    }
+    if notification_id:
+        annotations['notification_id'] = Subquery(pending.filter(pk=notification_id).values('pk')[:1])
+
+    relation = get_user_model().objects.filter(pk=user_id).annotate(**annotations).values(*annotations).first() or {}
+    return {
+        'is_following': bool(relation.get('is_following')) and viewer_id != user_id,
+        'incoming_request_id': relation.get('incoming_request_id'),
+        'notification_id': relation.get('notification_id'),
+    }
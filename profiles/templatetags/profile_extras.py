@@ -25,3 +25,22 @@ def url_replace(request, field, value):
     dict_ = request.GET.copy()
     dict_[field] = value
     return dict_.urlencode()
+
+@register.simple_tag
+def url_without(request, *fields, **params):
+    """Drop GET parameters (and set any given ones) while preserving the others"""
+    dict_ = request.GET.copy()
+    for field in fields:
+        dict_.pop(field, None)
+    for field, value in params.items():
+        dict_[field] = value
+    return dict_.urlencode()
+
+@register.filter
+def variant_srcset(variants, image_format):
+    """srcset of every size variant in image_format, so the browser fetches the smallest adequate one"""
+    entries = sorted(
+        (variant for variant in (variants or {}).values() if image_format in variant),
+        key=lambda variant: variant['width'],
+    )
+    return ', '.join(f"{variant[image_format]} {variant['width']}w" for variant in entries)
@@ -1,7 +1,771 @@
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 
 class DiscoverPageTest(TestCase):
     def test_discover_page_status_code(self):
         response = self.client.get(reverse('profiles:discover'))
-        self.assertEqual(response.status_code, 200)
\ No newline at end of file
+        self.assertEqual(response.status_code, 200)
+
+class GeohashTest(TestCase):
+    def test_encode_known_point(self):
+        from .geo import encode_geohash
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_covering_cells_contain_nearby_points(self):
+        from .geo import covering_geohashes, encode_geohash
+        # Accra and a point ~20km away near Tema
+        cells = covering_geohashes(5.6037, -0.1870, 25)
+        tema = encode_geohash(5.6698, -0.0166)
+        self.assertTrue(any(tema.startswith(cell) for cell in cells))
+        self.assertLessEqual(len(cells), 9)
+
+    def test_profile_save_maintains_geohash(self):
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        user = get_user_model().objects.create_user(
+            username='geo', email='geo@example.com', password='pass'
+        )
+        profile = Profile.objects.create(user=user, latitude='5.603700', longitude='-0.187000')
+        self.assertTrue(profile.geohash)
+        profile.latitude = None
+        profile.save()
+        self.assertEqual(profile.geohash, '')
+
+    def test_explicit_update_fields_write_the_geohash(self):
+        from django.contrib.auth import get_user_model
+        from .geo import encode_geohash
+        from .models import Profile
+        user = get_user_model().objects.create_user(username='geo', email='geo@example.com')
+        profile = Profile.objects.create(user=user, latitude='5.603700', longitude='-0.187000')
+        profile.latitude, profile.longitude = 6.6885, -1.6244
+        profile.save(update_fields=['latitude', 'longitude'])
+        self.assertEqual(
+            Profile.objects.values_list('geohash', flat=True).get(pk=profile.pk), encode_geohash(6.6885, -1.6244)
+        )
+
+
+class DiscoverDistanceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        User = get_user_model()
+
+        def make_profile(username, lat, lon):
+            user = User.objects.create_user(
+                username=username, email=f'{username}@example.com', password='pass'
+            )
+            profile = Profile.objects.create(user=user, latitude=lat, longitude=lon)
+            Profile.objects.filter(pk=profile.pk).update(is_complete=True)
+            return user
+
+        self.viewer = make_profile('viewer', '5.603700', '-0.187000')    # Accra
+        self.near = make_profile('near', '5.669800', '-0.016600')        # Tema
+        self.far = make_profile('far', '6.688500', '-1.624400')          # Kumasi
+        self.client.force_login(self.viewer)
+
+    def test_max_distance_filters_by_radius(self):
+        response = self.client.get(reverse('profiles:discover'), {'max_distance': 50})
+        self.assertEqual(response.status_code, 200)
+        usernames = {profile.user.username for profile in response.context['profiles']}
+        self.assertEqual(usernames, {'near'})
+
+
+class HaversineBatchTest(TestCase):
+    def test_batch_matches_single_profile_distance(self):
+        from decimal import Decimal
+        from .geo import haversine_distances
+        from .models import Profile
+        origin = Profile(latitude=Decimal('5.603700'), longitude=Decimal('-0.187000'))
+        others = [
+            Profile(latitude=Decimal('6.688500'), longitude=Decimal('-1.624400')),
+            Profile(latitude=Decimal('5.105200'), longitude=Decimal('-1.246600')),
+        ]
+        distances = haversine_distances(
+            origin.latitude, origin.longitude,
+            [p.latitude for p in others], [p.longitude for p in others],
+        )
+        for profile, distance in zip(others, distances):
+            self.assertAlmostEqual(distance, origin.calculate_distance_to(profile), places=6)
+
+
+class BoundingBoxTest(TestCase):
+    def test_box_wraps_across_antimeridian(self):
+        from django.contrib.auth import get_user_model
+        from .geo import bounding_box_q
+        from .models import Profile
+        User = get_user_model()
+        for username, lon in [('east', '179.950000'), ('west', '-179.950000'), ('away', '170.000000')]:
+            user = User.objects.create_user(username=username, email=f'{username}@example.com', password='pass')
+            Profile.objects.create(user=user, latitude='-17.713400', longitude=lon)
+
+        inside = Profile.objects.filter(bounding_box_q(-17.7134, 179.9, 50))
+        self.assertEqual({p.user.username for p in inside}, {'east', 'west'})
+
+
+class ShuffledProfilesMixin:
+    def setUp(self):
+        cache.clear()
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        User = get_user_model()
+        for i in range(15):
+            user = User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com')
+            Profile.objects.create(user=user)
+        Profile.objects.update(is_complete=True)
+        self.viewer = User.objects.get(username='user0')
+        self.client.force_login(self.viewer)
+
+
+class TemporaryMediaMixin:
+    """Store uploads on the local filesystem in a throwaway MEDIA_ROOT"""
+    def setUp(self):
+        super().setUp()
+        import shutil
+        import tempfile
+        from django.test import override_settings
+        self.media_root = media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+            IMAGE_PIPELINE_WORKERS=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, name, size=(1200, 800)):
+        from io import BytesIO
+        from PIL import Image
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        buffer = BytesIO()
+        Image.new('RGB', size, 'orange').save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class DiscoverShuffleTest(ShuffledProfilesMixin, TestCase):
+    def walk_pages(self):
+        seen = []
+        params = {}
+        while True:
+            response = self.client.get(reverse('profiles:discover'), params)
+            seen.extend(profile.id for profile in response.context['profiles'])
+            if not response.context['next_cursor']:
+                return seen
+            params = {'after': response.context['next_cursor']}
+
+    def test_pages_cover_every_profile_once(self):
+        seen = self.walk_pages()
+        self.assertEqual(len(seen), 14)
+        self.assertEqual(len(set(seen)), 14)
+
+    def test_order_is_stable_within_a_session(self):
+        self.assertEqual(self.walk_pages(), self.walk_pages())
+
+    def test_restart_links_keep_the_filters(self):
+        from .models import Profile
+        Profile.objects.update(city='Kumasi')
+        cursor = self.client.get(reverse('profiles:discover'), {'city': 'Kumasi'}).context['next_cursor']
+        response = self.client.get(reverse('profiles:discover'), {'city': 'Kumasi', 'after': cursor})
+        self.assertContains(response, 'href="?city=Kumasi"')
+        self.assertContains(response, 'href="?city=Kumasi&amp;reshuffle=1"')
+
+
+class DiscoverAPITest(ShuffledProfilesMixin, TestCase):
+    def test_cursor_walk_returns_every_profile_once(self):
+        seen = []
+        url = reverse('profiles:discover_api') + '?page_size=4'
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data['results']), 4)
+            seen.extend(card['id'] for card in data['results'])
+            url = data['next_url']
+        self.assertEqual(len(seen), 14)
+        self.assertEqual(len(set(seen)), 14)
+
+
+class InterestTagTest(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        user = get_user_model().objects.create_user(username='tags', email='tags@example.com')
+        self.profile = Profile.objects.create(user=user, interests='Football,  Music , football')
+
+    def tag_names(self):
+        return set(self.profile.interest_tags.values_list('name', flat=True))
+
+    def test_save_creates_normalized_tags(self):
+        self.assertEqual(self.tag_names(), {'football', 'music'})
+
+    def test_save_replaces_changed_tags(self):
+        from .models import Profile
+        profile = Profile.objects.get(pk=self.profile.pk)
+        profile.interests = 'Music, Photography'
+        profile.save()
+        self.assertEqual(self.tag_names(), {'music', 'photography'})
+
+
+class ProfileSearchTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        User = get_user_model()
+        for username, first, last in [
+            ('viewer', '', ''),
+            ('ama_mensah', 'Ama', 'Mensah'),
+            ('kofi', 'Ama', 'Boateng'),
+            ('yaw', 'Yaw', 'Owusu'),
+        ]:
+            user = User.objects.create_user(
+                username=username, email=f'{username}@example.com', first_name=first, last_name=last
+            )
+            Profile.objects.create(user=user)
+        Profile.objects.update(is_complete=True)
+        self.client.force_login(User.objects.get(username='viewer'))
+
+    def search(self, query):
+        response = self.client.get(reverse('profiles:discover'), {'search_query': query})
+        return [profile.user.username for profile in response.context['profiles']]
+
+    def test_username_matches_rank_first(self):
+        self.assertEqual(self.search('ama'), ['ama_mensah', 'kofi'])
+
+    def test_name_change_reindexes_profile(self):
+        from django.contrib.auth import get_user_model
+        user = get_user_model().objects.get(username='yaw')
+        user.last_name = 'Asante'
+        user.save()
+        self.assertEqual(self.search('asan'), ['yaw'])
+        self.assertEqual(self.search('owusu'), [])
+
+
+class DiscoverActionsCacheTest(ShuffledProfilesMixin, TestCase):
+    def discovered_user_ids(self):
+        response = self.client.get(reverse('profiles:discover_api'), {'page_size': 30})
+        return {card['user_id'] for card in response.json()['results']}
+
+    def test_unlike_and_follow_patch_cached_actions(self):
+        from django.contrib.auth import get_user_model
+        from likes.models import Unlike
+        from social.models import Follow
+        from .discover import get_discover_actions
+        User = get_user_model()
+        target = User.objects.get(username='user3')
+        followed = User.objects.get(username='user4')
+
+        self.assertIn(target.id, self.discovered_user_ids())  # warms the cache
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Unlike.objects.create(from_user=self.viewer, to_user=target, amount=1)
+            Follow.objects.create(follower=self.viewer, following=followed)
+
+        with self.assertNumQueries(0):
+            actions = get_discover_actions(self.viewer.id)
+        self.assertIn(target.id, actions['unliked'])
+        self.assertIn(followed.id, actions['following'])
+        self.assertNotIn(target.id, self.discovered_user_ids())
+
+    def test_rolled_back_unlike_leaves_cache_alone(self):
+        from django.contrib.auth import get_user_model
+        from django.db import transaction
+        from likes.models import Unlike
+        from .discover import get_discover_actions
+        target = get_user_model().objects.get(username='user3')
+        get_discover_actions(self.viewer.id)  # warms the cache
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                Unlike.objects.create(from_user=self.viewer, to_user=target, amount=1)
+                transaction.set_rollback(True)
+
+        with self.assertNumQueries(0):
+            self.assertNotIn(target.id, get_discover_actions(self.viewer.id)['unliked'])
+
+    def test_invalidate_user_cache_drops_cached_actions(self):
+        from django.contrib.auth import get_user_model
+        from likes.models import Unlike
+        from performance_optimizations import CacheManager
+        from .discover import get_discover_actions
+        target = get_user_model().objects.get(username='user3')
+        get_discover_actions(self.viewer.id)  # warms the cache
+
+        # bulk_create skips the hooks that patch the cache, so only invalidation picks it up
+        Unlike.objects.bulk_create([Unlike(from_user=self.viewer, to_user=target, amount=1)])
+        self.assertNotIn(target.id, get_discover_actions(self.viewer.id)['unliked'])
+        CacheManager.invalidate_user_cache(self.viewer.id)
+        self.assertIn(target.id, get_discover_actions(self.viewer.id)['unliked'])
+
+
+class CandidatePoolTest(TemporaryMediaMixin, ShuffledProfilesMixin, TestCase):
+    def pool_user_ids(self):
+        from .discover import get_candidate_pool, get_discover_actions
+        unliked = get_discover_actions(self.viewer.id)['unliked']
+        return {user_id for _, _, user_id in get_candidate_pool(self.viewer.id, unliked)}
+
+    def test_new_and_deleted_profiles_are_replayed_without_a_rebuild(self):
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        User = get_user_model()
+        self.pool_user_ids()  # warms the cache
+
+        newcomer = User.objects.create_user(username='newcomer', email='newcomer@example.com')
+        profile = Profile.objects.create(user=newcomer)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.bio = 'Hi'
+            profile.study_field = 'business'
+            profile.study_year = 2
+            profile.interests = 'hiking'
+            profile.profile_picture = self.upload('newcomer.jpg')
+            profile.save()
+            Profile.objects.get(user__username='user5').delete()
+        self.assertTrue(profile.is_complete)
+
+        with self.assertNumQueries(0):
+            user_ids = self.pool_user_ids()
+        self.assertIn(newcomer.id, user_ids)
+        self.assertNotIn(User.objects.get(username='user5').id, user_ids)
+        self.assertNotIn(self.viewer.id, user_ids)
+
+    def test_unlike_patches_pool(self):
+        from django.contrib.auth import get_user_model
+        from likes.models import Unlike
+        target = get_user_model().objects.get(username='user3')
+        self.assertIn(target.id, self.pool_user_ids())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Unlike.objects.create(from_user=self.viewer, to_user=target, amount=1)
+
+        with self.assertNumQueries(0):
+            self.assertNotIn(target.id, self.pool_user_ids())
+
+
+class CompatibilityRankingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        User = get_user_model()
+
+        def make(username, **fields):
+            user = User.objects.create_user(username=username, email=f'{username}@example.com')
+            Profile.objects.create(user=user, **fields)
+            return user
+
+        self.viewer = make('viewer', interests='music, chess', school_name='KNUST', study_field='engineering')
+        make('stranger', interests='football', school_name='UCC', study_field='law')
+        make('classmate', interests='hiking', school_name='knust ', study_field='engineering')
+        make('soulmate', interests='Music, chess', school_name='KNUST', study_field='engineering')
+        Profile.objects.update(is_complete=True)
+        self.client.force_login(self.viewer)
+
+    def test_best_match_comes_first(self):
+        response = self.client.get(reverse('profiles:discover'), {'sort': 'compatibility'})
+        usernames = [profile.user.username for profile in response.context['profiles']]
+        self.assertEqual(usernames, ['soulmate', 'classmate', 'stranger'])
+
+
+class AgeBoundsTest(TestCase):
+    def test_bounds_match_calendar_birthdays(self):
+        from datetime import date
+        from .ages import birth_date_bounds
+        today = date(2024, 2, 29)
+        earliest, latest = birth_date_bounds(18, 22, today)
+        self.assertEqual(latest, date(2006, 2, 28))    # 18th birthday has passed
+        self.assertEqual(earliest, date(2001, 3, 1))   # one day short of turning 23
+
+    def test_bucket_counts_in_one_query(self):
+        from datetime import date
+        from django.contrib.auth import get_user_model
+        from .ages import age_bucket_counts
+        from .models import Profile
+        User = get_user_model()
+        today = date(2025, 6, 15)
+        for i, birth_date in enumerate([
+            date(2007, 6, 15),  # 18 today
+            date(2002, 6, 16),  # still 22
+            date(2002, 6, 15),  # 23 today
+            date(1980, 1, 1),   # 45
+            date(2010, 1, 1),   # 15, outside every bucket
+        ]):
+            user = User.objects.create_user(username=f'aged{i}', email=f'aged{i}@example.com')
+            Profile.objects.create(user=user, birth_date=birth_date)
+
+        with self.assertNumQueries(1):
+            counts = age_bucket_counts(Profile.objects.all(), today=today)
+        self.assertEqual(counts, {'18-22': 2, '23-27': 1, '28-32': 0, '33+': 1})
+
+
+class FacetIndexTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        User = get_user_model()
+        for i, city in enumerate(['Accra', 'Accra', 'Kumasi']):
+            user = User.objects.create_user(username=f'facet{i}', email=f'facet{i}@example.com')
+            Profile.objects.create(user=user, city=city, study_field='law')
+        Profile.objects.update(is_complete=True)
+
+    def test_index_is_patched_on_save_and_delete(self):
+        from .facets import get_facet_index
+        from .models import Profile
+        self.assertEqual(get_facet_index()['city'], {'Accra': 2, 'Kumasi': 1})
+
+        # Without a picture the profile drops out of discover, taking its counts with it
+        profile = Profile.objects.get(user__username='facet0')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.city = 'Kumasi'
+            profile.save()
+            Profile.objects.get(user__username='facet2').delete()
+
+        with self.assertNumQueries(0):
+            index = get_facet_index()
+        self.assertEqual(index['city'], {'Accra': 1})
+        self.assertEqual(index['study_field'], {'law': 1})
+
+    def test_counts_follow_the_active_filters(self):
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        viewer = get_user_model().objects.create_user(username='viewer', email='viewer@example.com')
+        Profile.objects.create(user=viewer)
+        other = get_user_model().objects.create_user(username='facet3', email='facet3@example.com')
+        Profile.objects.create(user=other, city='Kumasi', study_field='business')
+        Profile.objects.filter(user=other).update(is_complete=True)
+        self.client.force_login(viewer)
+
+        facets = self.client.get(reverse('profiles:discover')).context['facets']
+        self.assertEqual(facets['study_field'], {'law': 3, 'business': 1})
+
+        facets = self.client.get(reverse('profiles:discover'), {'city': 'Kumasi'}).context['facets']
+        self.assertEqual(facets['study_field'], {'law': 1, 'business': 1})
+        self.assertEqual([(facet['value'], facet['count']) for facet in facets['city']], [('Kumasi', 2)])
+
+
+class ProfileCardCacheTest(ShuffledProfilesMixin, TestCase):
+    def test_cards_are_cached_and_invalidated_on_save(self):
+        from .cards import get_profile_cards
+        from .models import Profile
+        profiles = list(Profile.objects.select_related('user').order_by('id')[:4])
+        get_profile_cards(profiles)
+
+        with self.assertNumQueries(0):
+            cards = get_profile_cards(profiles)
+        self.assertEqual([card['id'] for card in cards], [profile.id for profile in profiles])
+
+        profiles[0].bio = 'Updated bio'
+        profiles[0].save()
+        cards = get_profile_cards(profiles)
+        self.assertEqual(cards[0]['bio'], 'Updated bio')
+
+
+class ProfileSaveQueryTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        self.user = get_user_model().objects.create_user(username='editor', email='editor@example.com')
+        Profile.objects.create(user=self.user, interests='music', study_field='law')
+
+    def test_edit_profile_flow_is_one_read_and_one_write(self):
+        from .forms import ProfileForm
+        from .models import Profile
+        data = {
+            'bio': 'New bio', 'birth_date': '', 'study_field': 'law', 'study_year': '2',
+            'school_name': 'KNUST', 'interests': 'music', 'city': 'Kumasi', 'location': '',
+            'latitude': '', 'longitude': '',
+        }
+        with self.assertNumQueries(2):
+            profile, _ = Profile.objects.get_or_create(user=self.user)
+            form = ProfileForm(data, instance=profile)
+            self.assertTrue(form.is_valid(), form.errors)
+            form.save()
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.bio, profile.city, profile.study_year), ('New bio', 'Kumasi', 2))
+
+    def test_edit_profile_view_post(self):
+        from .models import Profile
+        data = {
+            'bio': 'New bio', 'birth_date': '', 'study_field': 'law', 'study_year': '2',
+            'school_name': 'KNUST', 'interests': 'music', 'city': 'Kumasi', 'location': '',
+            'latitude': '', 'longitude': '',
+        }
+        self.client.force_login(self.user)
+        # The request's user, then the profile read and its single UPDATE
+        with self.assertNumQueries(3):
+            response = self.client.post(reverse('profiles:edit_profile'), data)
+        self.assertRedirects(response, '/profiles/my-profile/', fetch_redirect_response=False)
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual((profile.bio, profile.city, profile.study_year), ('New bio', 'Kumasi', 2))
+
+    def test_explicit_update_fields_carry_completeness(self):
+        from .models import Profile
+        Profile.objects.filter(user=self.user).update(bio='Bio', study_year=2, profile_picture='pictures/editor.jpg')
+        profile = Profile.objects.get(user=self.user)
+        self.assertFalse(profile.is_complete)
+
+        profile.interests = ''
+        profile.save(update_fields=['interests'])
+        self.assertFalse(Profile.objects.get(user=self.user).is_complete)
+
+        profile.interests = 'music'
+        profile.save(update_fields=['interests'])
+        self.assertTrue(Profile.objects.get(user=self.user).is_complete)
+
+    def test_unchanged_save_writes_nothing(self):
+        from .models import Profile
+        profile = Profile.objects.get(user=self.user)
+        with self.assertNumQueries(0):
+            profile.save()
+
+
+class ProfileStatsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        from django.contrib.auth import get_user_model
+        from likes.models import Like, Unlike
+        from social.models import Comment, CommentLike, Post, PostLike
+        User = get_user_model()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com')
+        self.client.force_login(self.alice)
+        self.client.post(reverse('social:follow_user', args=[self.bob.id]))
+        Like.objects.create(from_user=User.objects.get(pk=self.alice.pk), to_user=self.bob, amount=2)
+        Unlike.objects.create(from_user=self.bob, to_user=self.alice)
+        post = Post.objects.create(author=self.bob, content='Hello')
+        comment = Comment.objects.create(post=post, author=self.bob, content='Hi')
+        PostLike.objects.create(post=post, user=User.objects.get(pk=self.alice.pk), amount=3)
+        CommentLike.objects.create(comment=comment, user=User.objects.get(pk=self.alice.pk), amount=1)
+
+    def test_stats_are_one_cached_query(self):
+        from .stats import get_profile_stats
+        with self.assertNumQueries(1):
+            bob = get_profile_stats(self.bob.id)
+        with self.assertNumQueries(0):
+            get_profile_stats(self.bob.id)
+
+        self.assertEqual((bob['posts_count'], bob['given_likes_count'], bob['given_unlikes_count']), (1, 0, 1))
+        self.assertEqual(bob['post_and_comment_likes_received'], 4)
+
+        alice = get_profile_stats(self.alice.id)
+        self.assertEqual(alice['given_likes_count'], 1)
+        self.assertEqual(alice['post_and_comment_likes_given'], 4)
+
+    def test_viewer_relation(self):
+        from notifications.models import Notification
+        from .stats import get_viewer_relation
+        notification = Notification.objects.create(
+            sender=self.bob, receiver=self.alice, notification_type='match_request', status='pending'
+        )
+        with self.assertNumQueries(1):
+            relation = get_viewer_relation(self.alice.id, self.bob.id, notification.id)
+        self.assertEqual(relation, {
+            'is_following': True,
+            'incoming_request_id': notification.id,
+            'notification_id': notification.id,
+        })
+        self.assertFalse(get_viewer_relation(self.bob.id, self.alice.id)['is_following'])
+
+    def test_pages_use_shared_stats(self):
+        from .models import Profile
+        profile = Profile.objects.create(user=self.bob)
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse('profiles:profile_detail', args=[profile.pk]))
+        self.assertEqual(response.context['followers_count'], 1)
+        self.assertEqual(response.context['total_post_and_comment_likes'], 4)
+        self.assertTrue(response.context['is_following'])
+
+        response = self.client.get(reverse('social:feed'))
+        self.assertEqual(response.context['user_stats']['following'], 1)
+        self.assertEqual(response.context['user_stats']['likes_given'], 4)
+
+
+class ImagePipelineTest(TemporaryMediaMixin, TestCase):
+    def test_photo_upload_gets_size_variants_after_commit(self):
+        from django.contrib.auth import get_user_model
+        from .models import Profile, ProfilePhoto
+        from .templatetags.profile_extras import variant_srcset
+        user = get_user_model().objects.create_user(username='photographer', email='photo@example.com')
+        profile = Profile.objects.create(user=user)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = ProfilePhoto.objects.create(profile=profile, image=self.upload('beach.jpg'))
+            self.assertEqual(photo.image_variants, {})  # nothing is resized in the request
+
+        photo.refresh_from_db()
+        self.assertEqual(
+            {name: variant['width'] for name, variant in photo.image_variants.items()},
+            {'thumbnail': 150, 'card': 400, 'full': 1080},
+        )
+        self.assertTrue(photo.image_variants['card']['webp'].endswith('_card.webp'))
+        self.assertTrue(variant_srcset(photo.image_variants, 'jpeg').startswith(
+            photo.image_variants['thumbnail']['jpeg'] + ' 150w, '
+        ))
+
+    def test_replaced_and_deleted_images_leave_no_files(self):
+        import os
+        from django.contrib.auth import get_user_model
+        from .models import Profile, ProfilePhoto
+        user = get_user_model().objects.create_user(username='tidy', email='tidy@example.com')
+        profile = Profile.objects.create(user=user)
+
+        def stored_files():
+            return sorted(
+                os.path.relpath(os.path.join(root, name), self.media_root)
+                for root, _, names in os.walk(self.media_root) for name in names
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_picture = self.upload('first.jpg')
+            profile.save()
+        first = stored_files()
+        self.assertEqual(len(first), 7)
+
+        profile = Profile.objects.get(pk=profile.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.profile_picture = self.upload('second.jpg')
+            profile.save()
+        # Only the replaced original is left from the first picture
+        self.assertEqual(
+            [name for name in stored_files() if name.startswith('profile_pics/first')],
+            ['profile_pics/first.jpg'],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = ProfilePhoto.objects.create(profile=profile, image=self.upload('gallery.jpg'))
+        photo = ProfilePhoto.objects.get(pk=photo.pk)
+        self.assertEqual(len([name for name in stored_files() if name.startswith('profile_photos/')]), 7)
+        with self.captureOnCommitCallbacks(execute=True):
+            photo.delete()
+        self.assertEqual([name for name in stored_files() if name.startswith('profile_photos/')], [])
+
+
+class BulkPhotoTest(TemporaryMediaMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        from django.contrib.auth import get_user_model
+        from .models import Profile
+        user = get_user_model().objects.create_user(username='gallery', email='gallery@example.com')
+        self.profile = Profile.objects.create(user=user)
+
+    def statements(self, captured, verb):
+        return [query['sql'] for query in captured if query['sql'].startswith(verb)]
+
+    def test_upload_inserts_one_batch_and_processes_after_commit(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .photos import add_profile_photos
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as captured:
+                photos = add_profile_photos(self.profile, [self.upload(f'p{i}.jpg') for i in range(3)], start_order=1)
+            self.assertEqual(len(self.statements(captured, 'INSERT')), 1)
+
+        self.assertEqual(
+            list(self.profile.photos.values_list('order', flat=True)), [1, 2, 3]
+        )
+        for photo in photos:
+            photo.refresh_from_db()
+            self.assertEqual(photo.image_variants['card']['width'], 400)
+
+    def test_reorder_is_one_update(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .photos import add_profile_photos, reorder_profile_photos
+
+        with self.captureOnCommitCallbacks():
+            first, second, third = add_profile_photos(self.profile, [self.upload(f'p{i}.jpg') for i in range(3)])
+
+        self.client.force_login(self.profile.user)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post(reverse('profiles:reorder_photos'), {'photo_ids[]': [third.id, first.id]})
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(len(self.statements(captured, 'UPDATE "profiles_profilephoto"')), 1)
+        self.assertEqual(list(self.profile.photos.values_list('id', flat=True)), [third.id, first.id, second.id])
+
+        # Ids of other profiles' photos are ignored and an unchanged order writes nothing
+        with CaptureQueriesContext(connection) as captured:
+            reorder_profile_photos(self.profile, [third.id, first.id, second.id, 999])
+        self.assertEqual(self.statements(captured, 'UPDATE'), [])
+
+
+class OptimizeImagesCommandTest(TemporaryMediaMixin, TestCase):
+    def test_optimizes_once_and_resumes_from_checkpoint(self):
+        import json
+        import os
+        from io import StringIO
+        from django.contrib.auth import get_user_model
+        from django.core.management import call_command
+        from .models import Profile, ProfilePhoto
+        user = get_user_model().objects.create_user(username='optimizer', email='optimizer@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = Profile.objects.create(user=user, profile_picture=self.upload('big.png', size=(2400, 1600)))
+            ProfilePhoto.objects.create(profile=profile, image=self.upload('small.jpg', size=(64, 64)))
+        original_name = profile.profile_picture.name
+        original_variants = Profile.objects.get(pk=profile.pk).profile_picture_variants['card']['names']
+        stale_variant = os.path.join(self.media_root, original_variants[0])
+        with open(stale_variant, 'wb') as f:
+            f.write(b'stale')
+        checkpoint = os.path.join(self.media_root, 'checkpoint.json')
+
+        def run(*args):
+            out = StringIO()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('optimize_performance', '--optimize-images', '--workers', '1',
+                             '--checkpoint', checkpoint, *args, stdout=out)
+            return out.getvalue()
+
+        output = run()
+        self.assertIn('Optimized 2 images', output)
+        profile.refresh_from_db()
+        self.assertNotEqual(profile.profile_picture.name, original_name)
+        self.assertTrue(profile.profile_picture.name.endswith('.jpg'))
+        # The variants were rendered again from the optimized file, and the old ones removed
+        # (under the same names, so nothing was left behind to make storage pick new ones)
+        self.assertEqual(profile.profile_picture_variants['card']['names'], original_variants)
+        with open(stale_variant, 'rb') as f:
+            self.assertNotEqual(f.read(), b'stale')
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, 'profile_pics'))), 7)
+        with open(checkpoint) as f:
+            self.assertEqual(len(json.load(f)['done']), 2)
+
+        self.assertIn('0 images to process', run())
+        self.assertIn('2 already optimized', run('--restart'))
+
+
+class MigrateMediaCommandTest(TemporaryMediaMixin, TestCase):
+    def test_uploads_files_and_updates_only_the_file_column(self):
+        import os
+        import shutil
+        import tempfile
+        from io import StringIO
+        from django.contrib.auth import get_user_model
+        from django.core.management import call_command
+        from .models import Profile, ProfilePhoto
+        user = get_user_model().objects.create_user(username='migrator', email='migrator@example.com')
+        profile = Profile.objects.create(user=user, profile_picture=self.upload('me.jpg'))
+        photo = ProfilePhoto.objects.create(profile=profile, image=self.upload('beach.jpg'))
+        ProfilePhoto.objects.filter(pk=photo.pk).update(image='profile_photos/gone.jpg')
+        updated_at = Profile.objects.get(pk=profile.pk).updated_at
+
+        destination = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, destination)
+        out = StringIO()
+        call_command(
+            'migrate_media', '--workers', '3',
+            '--storage', 'django.core.files.storage.FileSystemStorage',
+            '--storage-option', f'location={destination}',
+            stdout=out,
+        )
+
+        profile.refresh_from_db()
+        self.assertTrue(os.path.exists(os.path.join(destination, profile.profile_picture.name)))
+        self.assertEqual(profile.updated_at, updated_at)  # written with update(), not save()
+        self.assertIn('Uploaded 1 files', out.getvalue())
+        self.assertIn('1 not found locally', out.getvalue())
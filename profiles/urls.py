@@ -10,6 +10,7 @@ urlpatterns = [
     path('edit/', views.EditProfileView.as_view(), name='edit_profile'),
     path('discover/', views.DiscoverView.as_view(), name='discover'),
     path('search/', views.DiscoverView.as_view(), name='search'),  # Alias for search
+    path('api/discover/', views.DiscoverAPIView.as_view(), name='discover_api'),
     path('profile/<int:pk>/', views.ProfileDetailView.as_view(), name='profile_detail'),
     path('my-profile/', views.MyProfileView.as_view(), name='my_profile'),
     path('upload-photos/', views.PhotoUploadView.as_view(), name='upload_photos'),
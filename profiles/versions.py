@@ -0,0 +1,50 @@
+# profiles/versions.py
+"""
+Versioned cache entries that are changed without a read-modify-write race.
+
+A value lives under a key that includes a version number, and the current
+version is a separate counter. A change takes the next version with an
+atomic cache.incr() and stores a patched copy of the previous version under
+it with cache.add(). Concurrent changes therefore take different versions;
+when the previous version is not cached (evicted, or a concurrent change
+has not written it yet) nothing is stored, and the next read rebuilds the
+value from the database under the current version.
+"""
+import random
+
+from django.core.cache import cache
+
+
+def current_version(key):
+    """
+    Read a version counter, starting it at a random value if it is missing,
+    so a counter that was evicted never lands back on keys from before
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, random.getrandbits(48), None)
+        version = cache.get(key)
+    return version
+
+
+def next_version(key):
+    """Atomically take the next version of a counter"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        current_version(key)
+        return cache.incr(key)
+
+
+def patch_versioned(version_key, cache_key, timeout, patch):
+    """
+    Take the next version and store patch(copy of the previous version)
+    under it. If the previous version is not cached (evicted, or a
+    concurrent change has not written it yet) nothing is stored and the
+    next read rebuilds.
+    """
+    version = next_version(version_key)
+    value = cache.get(cache_key(version - 1))
+    if value is not None:
+        patch(value)
+        cache.add(cache_key(version), value, timeout)
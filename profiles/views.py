@@ -9,40 +9,27 @@ from django.db import models
 from django.core.cache import cache
 from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
-from datetime import date, timedelta
-from .models import Profile, ProfilePhoto
+from .models import Profile, ProfileInterest, ProfilePhoto, normalize_interest
 from .forms import ProfileForm, ProfileSearchForm, ProfilePhotoForm
+from .discover import get_candidate_pool, get_discover_actions, get_discover_seed, pool_page, shuffled_page
+from .ages import AGE_BUCKETS, age_q
+from .cards import get_profile_cards
+from .facets import count_facets, get_facet_index
+from .photos import MAX_PHOTOS, add_profile_photos, reorder_profile_photos
+from .ranking import rank_profiles
+from .search import search_profiles
+from .stats import get_profile_stats, get_viewer_relation
+from .geo import bounding_box_q, covering_geohashes, geohash_q, haversine_distances, ids_within_distance
 from django.conf import settings
 from likes.models import Like, Unlike
 from notifications.models import Notification
 from django.http import JsonResponse
+from django.urls import reverse
 from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from asgiref.sync import sync_to_async
 
-# Helper function for concurrent distance calculations
-def calculate_distance_concurrent(user_profile, profiles, max_distance):
-    """
-    Calculate distances concurrently using ThreadPoolExecutor
-    Returns list of profile IDs within max_distance
-    """
-    profiles_with_distance = []
-
-    def calc_distance(profile):
-        distance = user_profile.calculate_distance_to(profile)
-        if distance and distance <= max_distance:
-            return profile.id
-        return None
-
-    # Use ThreadPoolExecutor for concurrent calculations
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        results = executor.map(calc_distance, profiles)
-        profiles_with_distance = [pid for pid in results if pid is not None]
-
-    return profiles_with_distance
-
 class CreateProfileView(LoginRequiredMixin, CreateView):
     model = Profile
     form_class = ProfileForm
@@ -70,11 +57,15 @@ class DiscoverView(LoginRequiredMixin, ListView):
     context_object_name = 'profiles'
     paginate_by = 6
 
+    def get_discover_actions(self):
+        """Cached unliked/liked/followed ids for the current user, read once per request"""
+        if not hasattr(self, '_discover_actions'):
+            self._discover_actions = get_discover_actions(self.request.user.id)
+        return self._discover_actions
+
     def get_queryset(self):
         # Get users that have been unliked by current user
-        unliked_user_ids = Unlike.objects.filter(
-            from_user=self.request.user
-        ).values_list('to_user_id', flat=True)
+        unliked_user_ids = list(self.get_discover_actions()['unliked'])
 
         queryset = Profile.objects.filter(
             is_complete=True
@@ -94,14 +85,14 @@ class DiscoverView(LoginRequiredMixin, ListView):
         max_age = self.request.GET.get('max_age', '').strip()
         location = self.request.GET.get('location', '').strip()
         max_distance = self.request.GET.get('max_distance', '').strip()
+        self.filtered = any([
+            search_query, study_field, school_name, city, interests, min_age, max_age, location, max_distance,
+        ])
 
         # Apply search filters
         if search_query:
-            queryset = queryset.filter(
-                Q(user__username__icontains=search_query) |
-                Q(user__first_name__icontains=search_query) |
-                Q(user__last_name__icontains=search_query)
-            )
+            # Indexed token search, annotated with search_rank for ordering
+            queryset = search_profiles(queryset, search_query)
 
         if study_field:
             queryset = queryset.filter(study_field=study_field)
@@ -113,48 +104,55 @@ class DiscoverView(LoginRequiredMixin, ListView):
             queryset = queryset.filter(city__icontains=city)
 
         if interests:
-            # Split interests by comma and search for any of them
-            interest_list = [interest.strip() for interest in interests.split(',') if interest.strip()]
+            # Split interests by comma and match any of them against the normalized tags
+            interest_list = {normalize_interest(interest) for interest in interests.split(',') if interest.strip()}
             if interest_list:
                 interest_query = Q()
                 for interest in interest_list:
-                    interest_query |= Q(interests__icontains=interest)
-                queryset = queryset.filter(interest_query)
+                    interest_query |= Q(interest__name__startswith=interest)
+                queryset = queryset.filter(
+                    id__in=ProfileInterest.objects.filter(interest_query).values('profile_id')
+                )
 
         if location:
             queryset = queryset.filter(location__icontains=location)
 
         # Age filtering
         if min_age or max_age:
-            today = date.today()
-
-            if min_age:
-                try:
-                    min_age_int = int(min_age)
-                    max_birth_date = today - timedelta(days=min_age_int * 365.25)
-                    queryset = queryset.filter(birth_date__lte=max_birth_date)
-                except (ValueError, TypeError):
-                    pass
-
-            if max_age:
-                try:
-                    max_age_int = int(max_age)
-                    min_birth_date = today - timedelta(days=(max_age_int + 1) * 365.25)
-                    queryset = queryset.filter(birth_date__gte=min_birth_date)
-                except (ValueError, TypeError):
-                    pass
-
-        # Distance-based filtering (using concurrent processing for performance)
+            # Exact calendar birth-date bounds, so the filter is a range scan on the birth_date index
+            try:
+                min_age_int = int(min_age) if min_age else None
+            except (ValueError, TypeError):
+                min_age_int = None
+            try:
+                max_age_int = int(max_age) if max_age else None
+            except (ValueError, TypeError):
+                max_age_int = None
+            queryset = queryset.filter(age_q(min_age_int, max_age_int))
+
+        # Distance-based filtering (bounding box and grid cells narrow in SQL, exact check on survivors)
         if max_distance and self.request.user.profile.latitude and self.request.user.profile.longitude:
             try:
                 max_distance_int = int(max_distance)
-                # Get profiles with location data
-                profiles_to_check = list(queryset.filter(latitude__isnull=False, longitude__isnull=False))
+                user_profile = self.request.user.profile
+
+                # Range filters on latitude/longitude let the database skip far-away rows
+                nearby = queryset.filter(
+                    bounding_box_q(user_profile.latitude, user_profile.longitude, max_distance_int)
+                )
 
-                # Use concurrent processing for distance calculations
-                profiles_with_distance = calculate_distance_concurrent(
-                    self.request.user.profile,
-                    profiles_to_check,
+                # Only profiles in the geohash cells covering the radius can be in range
+                cells = covering_geohashes(user_profile.latitude, user_profile.longitude, max_distance_int)
+                if cells:
+                    nearby = nearby.filter(geohash_q(cells))
+
+                rows_to_check = list(nearby.values_list('id', 'latitude', 'longitude'))
+
+                # Exact haversine check for all survivors in one vectorized pass
+                profiles_with_distance = ids_within_distance(
+                    user_profile.latitude,
+                    user_profile.longitude,
+                    rows_to_check,
                     max_distance_int
                 )
 
@@ -162,49 +160,67 @@ class DiscoverView(LoginRequiredMixin, ListView):
             except (ValueError, TypeError):
                 pass
 
-        # If no search parameters, randomize order
-        if not any([search_query, study_field, interests, min_age, max_age, location]):
-            queryset = queryset.order_by('?')
+        # If no search parameters, page through a stable per-session shuffle
+        self.shuffled = not any([search_query, study_field, interests, min_age, max_age, location])
+        # With no filters at all, pages come straight from the cached candidate pool
+        self.use_candidate_pool = self.shuffled and not any([school_name, city, max_distance])
+
+        # ?sort=compatibility ranks the filtered candidates against the current user instead
+        self.ranked = self.request.GET.get('sort') == 'compatibility'
+        if self.ranked:
+            self.shuffled = self.use_candidate_pool = False
+        elif self.shuffled:
+            queryset = queryset.order_by('random_key', 'id')
         else:
-            # If searching, order by relevance (username match first, then others)
+            # If searching, order by relevance (best token matches first, then others)
             if search_query:
-                # Use Django ORM annotations instead of raw SQL
-                from django.db.models import Case, When, Value, IntegerField
-                from django.db.models.functions import Lower
-                
-                queryset = queryset.annotate(
-                    username_match=Case(
-                        When(user__username__icontains=search_query, then=Value(1)),
-                        default=Value(0),
-                        output_field=IntegerField()
-                    )
-                ).order_by('-username_match', 'user__username')
+                queryset = queryset.order_by('-search_rank', 'user__username')
             else:
                 queryset = queryset.order_by('user__username')
 
         return queryset
 
+    def paginate_queryset(self, queryset, page_size):
+        """Use keyset pages over the seeded shuffle instead of OFFSET pages"""
+        if self.ranked:
+            # Rank every candidate id in one batch, then load only the page's profiles
+            ranked_ids = rank_profiles(self.request.user.profile, queryset)
+            paginator, page, page_ids, is_paginated = super().paginate_queryset(ranked_ids, page_size)
+            profiles_by_id = {profile.id: profile for profile in queryset.filter(id__in=page_ids)}
+            page.object_list = [profiles_by_id[profile_id] for profile_id in page_ids if profile_id in profiles_by_id]
+            return (paginator, page, page.object_list, is_paginated)
+
+        if not self.shuffled:
+            return super().paginate_queryset(queryset, page_size)
+
+        cursor = self.request.GET.get('after')
+        reshuffle = 'reshuffle' in self.request.GET and not cursor
+        seed = get_discover_seed(self.request, reshuffle=reshuffle)
+
+        if self.use_candidate_pool:
+            pool = get_candidate_pool(self.request.user.id, self.get_discover_actions()['unliked'])
+            profile_ids, self.next_cursor = pool_page(pool, seed, cursor, page_size)
+            # The queryset still applies the base filters, so a stale pool entry is simply dropped
+            profiles_by_id = {profile.id: profile for profile in queryset.filter(id__in=profile_ids)}
+            profiles = [profiles_by_id[profile_id] for profile_id in profile_ids if profile_id in profiles_by_id]
+        else:
+            profiles, self.next_cursor = shuffled_page(queryset, seed, cursor, page_size)
+        return (None, None, profiles, False)
+
     def get_context_data(self, **kwargs):
+        self.next_cursor = None
         context = super().get_context_data(**kwargs)
+        context['is_shuffled'] = self.shuffled
+        context['next_cursor'] = self.next_cursor
+        # Cached card data for the whole page, read with one get_many
+        context['profile_cards'] = get_profile_cards(context['profiles'])
 
         # Cache user-specific data for 5 minutes
         user_id = self.request.user.id
-        cache_key_likes = f'user_likes_{user_id}'
         cache_key_matches = f'user_matches_{user_id}'
         cache_key_requests = f'user_requests_{user_id}'
 
-        # Get cached data or compute it
-        likes_count_dict = cache.get(cache_key_likes)
-        if likes_count_dict is None:
-            from django.db.models import Count
-            likes_given = Like.objects.filter(
-                from_user=self.request.user
-            ).values('to_user').annotate(
-                like_count=Count('id')
-            )
-            likes_count_dict = {item['to_user']: item['like_count'] for item in likes_given}
-            cache.set(cache_key_likes, likes_count_dict, 300)  # 5 minutes
-        context['likes_count_dict'] = likes_count_dict
+        context['likes_count_dict'] = self.get_likes_count_dict()
 
         # MATCHES REMOVED FROM SYSTEM
         # Check for mutual matches (cached)
@@ -233,6 +249,14 @@ class DiscoverView(LoginRequiredMixin, ListView):
         search_form = ProfileSearchForm(self.request.GET or None)
         context['search_form'] = search_form
 
+        # Facet counts so users can see how many profiles each filter value has
+        context['facets'] = self.get_facets()
+        # Only the rendered options get counts; the field's own choices keep their plain labels
+        search_form.fields['study_field'].widget.choices = [
+            (value, f"{label} ({context['facets']['study_field'].get(value, 0)})" if value else label)
+            for value, label in search_form.fields['study_field'].choices
+        ]
+
         # Add search parameters to context for display
         context['search_params'] = {
             'search_query': self.request.GET.get('search_query', ''),
@@ -244,37 +268,19 @@ class DiscoverView(LoginRequiredMixin, ListView):
             'max_age': self.request.GET.get('max_age', ''),
             'location': self.request.GET.get('location', ''),
             'max_distance': self.request.GET.get('max_distance', ''),
+            'sort': self.request.GET.get('sort', ''),
         }
 
         # Check if any search is active
         context['is_searching'] = any(context['search_params'].values())
 
-        # Add distance information for each profile if user has location (concurrent processing)
-        if self.request.user.profile.latitude and self.request.user.profile.longitude:
-            profile_distances = {}
-            profiles_list = list(context['profiles'])
-
-            def calc_distance_for_display(profile):
-                distance = self.request.user.profile.calculate_distance_to(profile)
-                if distance:
-                    return (profile.id, round(distance, 1))
-                return None
-
-            # Use ThreadPoolExecutor for concurrent distance calculations
-            with ThreadPoolExecutor(max_workers=10) as executor:
-                results = executor.map(calc_distance_for_display, profiles_list)
-                for result in results:
-                    if result:
-                        profile_distances[result[0]] = result[1]
-
+        # Add distance information for each profile if user has location (batch computation)
+        profile_distances = self.get_profile_distances(context['profile_cards'])
+        if profile_distances is not None:
             context['profile_distances'] = profile_distances
 
         # Add following status for each profile
-        from social.models import Follow
-        following_ids = set(Follow.objects.filter(
-            follower=self.request.user
-        ).values_list('following_id', flat=True))
-        context['following_ids'] = following_ids
+        context['following_ids'] = self.get_following_ids()
 
         # Advertisement flags controlled via settings or environment
         context['show_in_grid_ad'] = getattr(settings, 'SHOW_IN_GRID_AD', False)
@@ -287,6 +293,140 @@ class DiscoverView(LoginRequiredMixin, ListView):
 
         return context
 
+    def get_likes_count_dict(self):
+        """Number of likes the current user has given to each user (cached)"""
+        return self.get_discover_actions()['likes']
+
+    def get_profile_distances(self, cards):
+        """
+        Map profile id -> distance in km from the current user for a page of
+        profile cards, or None if the current user has no location
+        """
+        user_profile = self.request.user.profile
+        if not (user_profile.latitude and user_profile.longitude):
+            return None
+
+        located = [
+            card for card in cards
+            if card['latitude'] is not None and card['longitude'] is not None
+        ]
+        if not located:
+            return {}
+
+        distances = haversine_distances(
+            user_profile.latitude,
+            user_profile.longitude,
+            [card['latitude'] for card in located],
+            [card['longitude'] for card in located],
+        )
+        return {
+            card['id']: round(float(distance), 1)
+            for card, distance in zip(located, distances)
+        }
+
+    def get_following_ids(self):
+        return self.get_discover_actions()['following']
+
+    def get_facets(self, limit=10):
+        """
+        Facet counts among the profiles the active filters leave (the cached
+        facet index when there are none), each with the query string that applies it
+        """
+        index = count_facets(self.object_list) if self.filtered else get_facet_index()
+
+        def query_for(**params):
+            query = self.request.GET.copy()
+            for param in ('page', 'after'):
+                query.pop(param, None)
+            for name, value in params.items():
+                query[name] = value
+            return query.urlencode()
+
+        def top(facet):
+            ranked = sorted(index[facet].items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [{'value': value, 'count': count, 'query': query_for(**{facet: value})} for value, count in ranked]
+
+        return {
+            'study_field': index['study_field'],
+            'city': top('city'),
+            'school_name': top('school_name'),
+            'age': [
+                {
+                    'value': label,
+                    'count': index['age'].get(label, 0),
+                    'query': query_for(min_age=youngest, max_age=oldest or ''),
+                }
+                for label, youngest, oldest in AGE_BUCKETS
+            ],
+        }
+
+class DiscoverAPIView(DiscoverView):
+    """
+    JSON discover feed for swipe-style clients.
+
+    Accepts the same filters as DiscoverView but always pages through the
+    session shuffle with an opaque cursor, so each page costs the same no
+    matter how deep the client goes. Clients fetch next_url in the background
+    while the user is still on the current page.
+    """
+    max_page_size = 30
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        self.shuffled = True
+        self.ranked = False
+        return queryset.order_by('random_key', 'id')
+
+    def get_page_size(self):
+        try:
+            page_size = int(self.request.GET.get('page_size', self.paginate_by))
+        except (ValueError, TypeError):
+            page_size = self.paginate_by
+        return max(1, min(page_size, self.max_page_size))
+
+    def get(self, request, *args, **kwargs):
+        _, _, profiles, _ = self.paginate_queryset(self.get_queryset(), self.get_page_size())
+        cards = get_profile_cards(profiles)
+
+        likes_count_dict = self.get_likes_count_dict()
+        profile_distances = self.get_profile_distances(cards) or {}
+        following_ids = self.get_following_ids()
+
+        results = [
+            {
+                'id': card['id'],
+                'user_id': card['user']['id'],
+                'username': card['user']['username'],
+                'age': card['age'],
+                'bio': card['bio'],
+                'study_field': card['study_field_display'],
+                'study_year': card['study_year'],
+                'school_name': card['school_name'],
+                'city': card['city'],
+                'interests': card['interests'],
+                'photo': card['primary_photo'],
+                'photo_variants': card['primary_photo_variants'],
+                'distance_km': profile_distances.get(card['id']),
+                'likes_given': likes_count_dict.get(card['user']['id'], 0),
+                'is_following': card['user']['id'] in following_ids,
+                'url': reverse('profiles:profile_detail', args=[card['id']]),
+            }
+            for card in cards
+        ]
+
+        next_url = None
+        if self.next_cursor:
+            params = request.GET.copy()
+            params.pop('reshuffle', None)
+            params['after'] = self.next_cursor
+            next_url = f"{request.path}?{params.urlencode()}"
+
+        return JsonResponse({
+            'results': results,
+            'next_cursor': self.next_cursor,
+            'next_url': next_url,
+        })
+
 class ProfileDetailView(LoginRequiredMixin, DetailView):
     model = Profile
     template_name = 'profiles/profile_detail.html'
@@ -315,63 +455,31 @@ class ProfileDetailView(LoginRequiredMixin, DetailView):
         # ).values_list('receiver', flat=True)
         # context['pending_requests'] = list(pending_requests)
 
-        # Check if viewing this profile from a match request notification
-        notification_id = self.request.GET.get('notification_id')
-        if notification_id:
-            try:
-                notification = Notification.objects.get(
-                    id=notification_id,
-                    receiver=self.request.user,
-                    sender=self.object.user,
-                    notification_type='match_request',
-                    status='pending'
-                )
-                context['match_request_notification'] = notification
-            except Notification.DoesNotExist:
-                pass
-
-        # Check if there's a pending match request from this profile's user to current user
-        incoming_request = Notification.objects.filter(
-            sender=self.object.user,
-            receiver=self.request.user,
-            notification_type='match_request',
-            status='pending'
-        ).first()
-        context['incoming_match_request'] = incoming_request
-
-        # Add statistics for received likes and dislikes from the user model fields
+        # Follow state and pending match requests from this profile's user (one query),
+        # including whether the notification we came from is still pending
+        notification_id = self.request.GET.get('notification_id', '')
+        relation = get_viewer_relation(
+            self.request.user.id,
+            self.object.user_id,
+            int(notification_id) if notification_id.isdigit() else None,
+        )
+        context['match_request_notification_id'] = relation['notification_id']
+        context['incoming_match_request_id'] = relation['incoming_request_id']
+        context['is_following'] = relation['is_following']
+
+        # Received and follow counts and the balances are read from the user (row and ledger); everything else is one cached query
         context['received_likes_count'] = self.object.user.received_likes_count
         context['received_dislikes_count'] = self.object.user.received_unlikes_count
+        context['followers_count'] = self.object.user.followers_count
+        context['following_count'] = self.object.user.following_count
 
-        # Add statistics for given likes and dislikes (what this user has given to others)
-        context['given_likes_count'] = self.object.user.likes_given.count()
-        context['given_dislikes_count'] = self.object.user.unlikes_given.count()
-
-        # Add bank balances if viewing own profile
         if self.request.user == self.object.user:
             context['likes_bank_balance'] = self.object.user.likes_balance
 
-        # Add social features: following/followers counts
-        from social.models import Follow, PostLike, CommentLike
-        context['followers_count'] = Follow.objects.filter(following=self.object.user).count()
-        context['following_count'] = Follow.objects.filter(follower=self.object.user).count()
-
-        # Check if current user is following this profile
-        context['is_following'] = Follow.objects.filter(
-            follower=self.request.user,
-            following=self.object.user
-        ).exists() if self.request.user != self.object.user else False
-
-        # Calculate total likes from posts and comments
-        post_likes = PostLike.objects.filter(post__author=self.object.user).aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-
-        comment_likes = CommentLike.objects.filter(comment__author=self.object.user).aggregate(
-            total=models.Sum('amount')
-        )['total'] or 0
-
-        context['total_post_and_comment_likes'] = post_likes + comment_likes
+        stats = get_profile_stats(self.object.user_id)
+        context['given_likes_count'] = stats['given_likes_count']
+        context['given_dislikes_count'] = stats['given_unlikes_count']
+        context['total_post_and_comment_likes'] = stats['post_and_comment_likes_received']
 
         # Get recent posts by this user
         from social.models import Post
@@ -406,17 +514,15 @@ class MyProfileView(LoginRequiredMixin, DetailView):
         context['received_likes_count'] = self.object.user.received_likes_count
         context['received_dislikes_count'] = self.object.user.received_unlikes_count
 
-        # Add statistics for given likes and dislikes (what user has given to others)
-        context['given_likes_count'] = self.object.user.likes_given.count()
-        context['given_dislikes_count'] = self.object.user.unlikes_given.count()
-
-        # Add bank balances for my profile
+        # Add bank balances and follow counts for my profile
         context['likes_bank_balance'] = self.object.user.likes_balance
+        context['followers_count'] = self.object.user.followers_count
+        context['following_count'] = self.object.user.following_count
 
-        # Add social features: following/followers counts
-        from social.models import Follow
-        context['followers_count'] = Follow.objects.filter(following=self.object.user).count()
-        context['following_count'] = Follow.objects.filter(follower=self.object.user).count()
+        # Given likes/dislikes (one cached query)
+        stats = get_profile_stats(self.object.user_id)
+        context['given_likes_count'] = stats['given_likes_count']
+        context['given_dislikes_count'] = stats['given_unlikes_count']
 
         return context
 
@@ -436,21 +542,16 @@ class PhotoUploadView(LoginRequiredMixin, FormView):
         profile, created = Profile.objects.get_or_create(user=self.request.user)
         photos = self.request.FILES.getlist('photos')
 
-        # Limit to 6 photos total
+        # Limit to MAX_PHOTOS photos total
         existing_count = profile.photos.count()
-        max_new_photos = 6 - existing_count
+        max_new_photos = MAX_PHOTOS - existing_count
 
         if len(photos) > max_new_photos:
-            messages.error(self.request, f'You can only upload {max_new_photos} more photos. Maximum is 6 photos total.')
+            messages.error(self.request, f'You can only upload {max_new_photos} more photos. Maximum is {MAX_PHOTOS} photos total.')
             return self.form_invalid(form)
 
-        # Save each photo
-        for i, photo in enumerate(photos):
-            ProfilePhoto.objects.create(
-                profile=profile,
-                image=photo,
-                order=existing_count + i
-            )
+        # Insert all photos in one batch; resizing happens in the image pipeline
+        add_profile_photos(profile, photos, start_order=existing_count)
 
         messages.success(self.request, f'{len(photos)} photo(s) uploaded successfully!')
         return redirect(self.success_url)
@@ -475,8 +576,8 @@ def reorder_photos(request):
         profile = Profile.objects.get(user=request.user)
         photo_ids = request.POST.getlist('photo_ids[]')
 
-        for i, photo_id in enumerate(photo_ids):
-            ProfilePhoto.objects.filter(id=photo_id, profile=profile).update(order=i)
+        # One bulk_update for the whole new order
+        reorder_profile_photos(profile, photo_ids)
 
         return JsonResponse({'success': True, 'message': 'Photos reordered successfully'})
     except Exception as e:
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from accounts.ledger import adjust_balances
+
 User = get_user_model()
 
 class Question(models.Model):
@@ -85,8 +87,7 @@ class UserQuizResponse(models.Model):
             else:
                 self.points_earned = self.question.points_value  # fallback
             
-            self.user.points_balance += self.points_earned
-            self.user.save()
+            adjust_balances(self.user, 'quiz', points=self.points_earned)
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -5,8 +5,10 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import ListView
+from django.db import transaction
 from django.db.models import Q
 import logging
+from accounts.ledger import InsufficientBalance, adjust_balances
 from .models import Reward, RewardClaim, Like
 
 logger = logging.getLogger('rewards')
@@ -89,24 +91,24 @@ def claim_reward(request, reward_id):
             messages.error(request, 'This reward is out of stock!')
             return redirect('rewards:list')
 
-        # Create reward claim
-        claim = RewardClaim.objects.create(
-            user=request.user,
-            reward=reward,
-            points_spent=reward.points_cost
-        )
-
-        # Deduct points and update stock
-        old_points = request.user.points_balance
+        # Deduct points (refused if a concurrent claim spent them), create the claim and update stock
         old_stock = reward.stock_quantity
-
-        request.user.points_balance -= reward.points_cost
-        request.user.save()
+        try:
+            with transaction.atomic():
+                adjust_balances(request.user, 'reward_claim', points=-reward.points_cost)
+                claim = RewardClaim.objects.create(
+                    user=request.user,
+                    reward=reward,
+                    points_spent=reward.points_cost
+                )
+        except InsufficientBalance:
+            messages.error(request, 'You don\'t have enough points for this reward!')
+            return redirect('rewards:list')
 
         reward.stock_quantity -= 1
         reward.save()
 
-        logger.info(f"Points-based reward claimed - User: {request.user.id}, Reward: {reward_id}, ClaimID: {claim.id}, PointsDeducted: {reward.points_cost}, OldPoints: {old_points}, NewPoints: {request.user.points_balance}, OldStock: {old_stock}, NewStock: {reward.stock_quantity}")
+        logger.info(f"Points-based reward claimed - User: {request.user.id}, Reward: {reward_id}, ClaimID: {claim.id}, PointsDeducted: {reward.points_cost}, NewPoints: {request.user.points_balance}, OldStock: {old_stock}, NewStock: {reward.stock_quantity}")
 
         messages.success(request, f'Successfully claimed {reward.name}! Check your claims for delivery status.')
         return redirect('rewards:my_claims')
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from social.models import Follow
+
+
+def follow_count(field):
+    """Number of Follow rows whose field points at the outer user"""
+    rows = Follow.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized followers_count/following_count on every user from the follow table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Users checked per batch (default: 5000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many users are out of step without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        batch_size = max(1, options['batch_size'])
+
+        checked = repaired = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            checked += len(batch)
+
+            # Only users whose stored counters disagree with the follow table are rewritten
+            stale = list(
+                User.objects.filter(pk__in=batch).annotate(
+                    actual_followers=follow_count('following'),
+                    actual_following=follow_count('follower'),
+                ).filter(
+                    ~Q(followers_count=F('actual_followers')) | ~Q(following_count=F('actual_following'))
+                ).values_list('pk', flat=True)
+            )
+            if stale and not options['dry_run']:
+                with transaction.atomic():
+                    User.objects.filter(pk__in=stale).update(
+                        followers_count=follow_count('following'),
+                        following_count=follow_count('follower'),
+                    )
+            repaired += len(stale)
+
+        verb = 'Would repair' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} follow counts for {repaired} of {checked} users'))
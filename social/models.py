@@ -4,7 +4,10 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import F, Sum
+
+from likes.balances import transfer_likes
 
 User = get_user_model()
 
@@ -117,25 +120,18 @@ class PostLike(models.Model):
         return f"{self.user.username} liked post {self.post.id} with {self.amount} like(s)"
 
     def save(self, *args, **kwargs):
-        # Check if user has enough bank balance before saving
-        if not self.pk:  # Only check on creation
-            if self.user.likes_balance < self.amount:
-                raise ValueError(f"Insufficient likes balance. Required: {self.amount}, Available: {self.user.likes_balance}")
-
-            # Deduct from user's bank
-            self.user.likes_balance -= self.amount
-
-            # Add to post author's received likes count
-            self.post.author.received_likes_count += self.amount
+        if self.pk:
+            return super().save(*args, **kwargs)
 
-            # Save the users with updated balances
-            self.user.save()
-            self.post.author.save()
+        with transaction.atomic():
+            # Move the likes from the user's bank to the post author's received count;
+            # raises InsufficientBalance (a ValueError) if the bank does not cover it
+            transfer_likes(self.user, self.post.author, self.amount, 'post_like')
+            super().save(*args, **kwargs)
 
-        super().save(*args, **kwargs)
-
-        # Update post's like count
-        self.post.update_likes_count()
+            # Update post's like count
+            Post.objects.filter(pk=self.post_id).update(likes_count=F('likes_count') + self.amount)
+        self.post.refresh_from_db(fields=['likes_count'])
 
 
 class CommentLike(models.Model):
@@ -156,25 +152,18 @@ class CommentLike(models.Model):
         return f"{self.user.username} liked comment {self.comment.id} with {self.amount} like(s)"
 
     def save(self, *args, **kwargs):
-        # Check if user has enough bank balance before saving
-        if not self.pk:  # Only check on creation
-            if self.user.likes_balance < self.amount:
-                raise ValueError(f"Insufficient likes balance. Required: {self.amount}, Available: {self.user.likes_balance}")
-
-            # Deduct from user's bank
-            self.user.likes_balance -= self.amount
-
-            # Add to comment author's received likes count
-            self.comment.author.received_likes_count += self.amount
-
-            # Save the users with updated balances
-            self.user.save()
-            self.comment.author.save()
-
-        super().save(*args, **kwargs)
-
-        # Update comment's like count
-        self.comment.update_likes_count()
+        if self.pk:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            # Move the likes from the user's bank to the comment author's received count;
+            # raises InsufficientBalance (a ValueError) if the bank does not cover it
+            transfer_likes(self.user, self.comment.author, self.amount, 'comment_like')
+            super().save(*args, **kwargs)
+
+            # Update comment's like count
+            Comment.objects.filter(pk=self.comment_id).update(likes_count=F('likes_count') + self.amount)
+        self.comment.refresh_from_db(fields=['likes_count'])
 
 
 # Signals to update comment counts
@@ -1,3 +1,50 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+
+from .models import Follow
+
+
+class FollowCountsTest(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com')
+        self.client.force_login(self.alice)
+
+    def counts(self, user):
+        user.refresh_from_db(fields=['followers_count', 'following_count'])
+        return user.followers_count, user.following_count
+
+    def test_follow_and_unfollow_move_counters(self):
+        self.client.post(reverse('social:follow_user', args=[self.bob.id]))
+        self.assertEqual(self.counts(self.alice), (0, 1))
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+        # Following twice is rejected and counts nothing
+        response = self.client.post(reverse('social:follow_user', args=[self.bob.id]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+        self.client.post(reverse('social:unfollow_user', args=[self.bob.id]))
+        response = self.client.post(reverse('social:unfollow_user', args=[self.bob.id]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.counts(self.alice), (0, 0))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+
+    def test_repair_command_recomputes_counters(self):
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        get_user_model().objects.filter(pk=self.alice.pk).update(followers_count=7)
+
+        out = StringIO()
+        call_command('repair_follow_counts', '--dry-run', stdout=out)
+        self.assertIn('Would repair follow counts for 2 of 2 users', out.getvalue())
+        self.assertEqual(self.counts(self.alice), (7, 0))
 
-# Create your tests here.
+        call_command('repair_follow_counts', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(self.counts(self.alice), (1, 1))
+        self.assertEqual(self.counts(self.bob), (1, 1))
@@ -6,12 +6,15 @@ from django.views.generic import ListView, DetailView, CreateView, UpdateView
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from django.contrib import messages
-from django.db.models import Q, Exists, OuterRef, Count, Sum
+from django.db import transaction
+from django.db.models import Q, Exists, OuterRef, Count, Sum, F
 from django.urls import reverse_lazy
 from django.contrib.auth import get_user_model
 
 from .models import Follow, Post, Comment, PostLike, CommentLike
 from .forms import PostForm, CommentForm, LikeAmountForm
+from accounts.ledger import ledger_balance_expressions
+from profiles.stats import get_profile_stats
 from django.conf import settings
 
 User = get_user_model()
@@ -21,6 +24,12 @@ User = get_user_model()
 # FOLLOW/UNFOLLOW VIEWS
 # ============================================================================
 
+def update_follow_counts(follower_id, following_id, delta):
+    """Move both users' follow counters by delta in the database (no read-modify-write)"""
+    User.objects.filter(pk=follower_id).update(following_count=F('following_count') + delta)
+    User.objects.filter(pk=following_id).update(followers_count=F('followers_count') + delta)
+
+
 @login_required
 @require_POST
 def follow_user(request, user_id):
@@ -30,10 +39,13 @@ def follow_user(request, user_id):
     if user_to_follow == request.user:
         return JsonResponse({'success': False, 'error': 'Cannot follow yourself'}, status=400)
 
-    follow, created = Follow.objects.get_or_create(
-        follower=request.user,
-        following=user_to_follow
-    )
+    with transaction.atomic():
+        follow, created = Follow.objects.get_or_create(
+            follower=request.user,
+            following=user_to_follow
+        )
+        if created:
+            update_follow_counts(request.user.id, user_to_follow.id, 1)
 
     if created:
         return JsonResponse({
@@ -54,15 +66,18 @@ def unfollow_user(request, user_id):
     """Unfollow a user"""
     user_to_unfollow = get_object_or_404(User, id=user_id)
 
-    try:
-        follow = Follow.objects.get(follower=request.user, following=user_to_unfollow)
-        follow.delete()
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(follower=request.user, following=user_to_unfollow).delete()
+        if deleted:
+            update_follow_counts(request.user.id, user_to_unfollow.id, -1)
+
+    if deleted:
         return JsonResponse({
             'success': True,
             'message': f'You unfollowed {user_to_unfollow.username}',
             'following': False
         })
-    except Follow.DoesNotExist:
+    else:
         return JsonResponse({
             'success': False,
             'error': 'Not following this user'
@@ -106,38 +121,19 @@ class FeedView(LoginRequiredMixin, ListView):
             from advertisements.models import Advertisement
             context['advertisements'] = Advertisement.get_active_ads(limit=3)
 
-        # Get user stats for left sidebar (cached)
-        from django.core.cache import cache
-        cache_key = f'user_stats_{self.request.user.id}'
-        user_stats = cache.get(cache_key)
-
-        if user_stats is None:
-            following_count = Follow.objects.filter(follower=self.request.user).count()
-            followers_count = Follow.objects.filter(following=self.request.user).count()
-            posts_count = Post.objects.filter(author=self.request.user).count()
-
-            # Get likes given and received
-            likes_received = self.request.user.received_likes_count
-            likes_given = PostLike.objects.filter(user=self.request.user).aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            likes_given += CommentLike.objects.filter(user=self.request.user).aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-
-            user_stats = {
-                'following': following_count,
-                'followers': followers_count,
-                'posts': posts_count,
-                'likes_received': likes_received,
-                'likes_given': likes_given,
-            }
-            # Cache for 5 minutes
-            cache.set(cache_key, user_stats, 60 * 5)
-
+        # Get user stats for left sidebar (one cached query shared with the profile pages)
+        stats = get_profile_stats(self.request.user.id)
+        user_stats = {
+            'following': self.request.user.following_count,
+            'followers': self.request.user.followers_count,
+            'posts': stats['posts_count'],
+            'likes_received': self.request.user.received_likes_count,
+            'likes_given': stats['post_and_comment_likes_given'],
+        }
         context['user_stats'] = user_stats
 
         # Get suggested profiles (users not followed yet, excluding self)
+        from django.core.cache import cache
         cache_key_suggestions = f'suggested_profiles_{self.request.user.id}'
         suggested_profiles = cache.get(cache_key_suggestions)
 
@@ -153,7 +149,9 @@ class FeedView(LoginRequiredMixin, ListView):
                 id=self.request.user.id
             ).filter(
                 profile__isnull=False  # Ensure user has a profile
-            ).select_related('profile').order_by('-id')[:5]  # Latest users instead of random
+            ).select_related('profile').annotate(
+                **ledger_balance_expressions()  # received likes shown on each card
+            ).order_by('-id')[:5]  # Latest users instead of random
 
             suggested_profiles = list(suggested_profiles)
             # Cache for 15 minutes